@@ -0,0 +1,171 @@
+"""Laying out addresses.txt in columns over as many pages as it needs.
+
+addresses.txt is a list of entries separated by blank lines, usually one per
+household, starting with an "@name:" line:
+
+    @name:John & Mary Doe
+    123 Main Street
+    Anytown, US 12345
+    @email:johndoe@gmail.com
+
+Lines starting with "@<tag>:" are set in the Addresses-<tag> style, other
+lines in the Addresses style, and "@comment:" lines are left out.
+
+The file is read one entry at a time and every entry is measured once.  An
+entry is never split between columns unless it is taller than a whole
+column.  The entries of each page are spread over its columns so that the
+columns end up about equally long, and entries that don't fit go on to the
+next page.  Only the entries of one page are held at a time, and laying out
+takes time linear in the number of entries.
+"""
+
+from collections import namedtuple
+
+from textmetrics import text_metrics
+
+
+class AddressLine(namedtuple("AddressLine", "style text height")):
+    """A line of an entry; ``height`` is that of the text wrapped to a column."""
+
+    __slots__ = ()
+
+
+class Entry(namedtuple("Entry", "lines gap height")):
+    """An entry of the address book.
+
+    ``gap`` is the room left above it (for the blank lines before it) unless
+    it starts a column, and ``height`` is that of its lines.
+    """
+
+    __slots__ = ()
+
+
+def _line_style(theme, line):
+    if line.startswith("@"):
+        tag, colon, line = line.partition(":")
+        if not colon:
+            raise ValueError(f"Expected @<tag>:<text>, got {tag!r}")
+        name = "Addresses-" + tag[1:]
+    else:
+        name = "Addresses"
+    style = theme.style(name)
+    if style is None:
+        raise ValueError(f"No font for {name!r} in calendar.ini")
+    return style, line
+
+
+def check_addresses(path, theme):
+    """Check that every line of the addresses file ``path`` has a style.
+
+    Raises ValueError naming the first line that hasn't; a missing file is
+    fine (the address book is left empty).
+    """
+    try:
+        addresses = open(path)
+    except FileNotFoundError:
+        return
+    with addresses:
+        for lineno, line in enumerate(addresses, start=1):
+            if line.startswith("@comment:"):
+                continue
+            try:
+                _line_style(theme, line.rstrip("\r\n"))
+            except ValueError as e:
+                raise ValueError(f"{path}:{lineno}: {e}") from None
+
+
+def _split(lines, gap, column_height):
+    """Yield the Entries of the lines of one entry, split to fit in a column."""
+    piece = []
+    height = 0
+    for line in lines:
+        if piece and height + line.height > column_height:
+            yield Entry(tuple(piece), gap, height)
+            piece, height, gap = [], 0, 0
+        piece.append(line)
+        height += line.height
+    yield Entry(tuple(piece), gap, height)
+
+
+def read_entries(lines, theme, column_width, column_height):
+    """Yield the Entries of the lines of an addresses file.
+
+    Entries taller than ``column_height`` are split into pieces that are not.
+    """
+    entry = []
+    gap = 0
+    for line in lines:
+        if line.startswith("@comment:"):
+            continue
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            if entry:
+                yield from _split(entry, gap, column_height)
+                entry, gap = [], 0
+            gap += theme.styles.addresses.font.height
+            continue
+        if line.startswith("@name:") and entry:
+            yield from _split(entry, gap, column_height)
+            entry, gap = [], 0
+        style, text = _line_style(theme, line)
+        wrapped = text_metrics(style.font).wrap(text, column_width)
+        entry.append(AddressLine(style, text, len(wrapped) * style.font.height))
+    if entry:
+        yield from _split(entry, gap, column_height)
+
+
+def _columns(entries, height):
+    """Return where the columns start if entries fill columns ``height`` long."""
+    starts = [0]
+    y = 0
+    for i, entry in enumerate(entries):
+        if y and y + entry.gap + entry.height <= height:
+            y += entry.gap + entry.height
+        elif y:
+            starts.append(i)
+            y = entry.height
+        else:
+            y = entry.height
+    return starts
+
+
+def balance(entries, columns, height):
+    """Split a page's entries into columns of about equal length.
+
+    The entries must fit into ``columns`` columns ``height`` long.  Returns
+    a list of at most ``columns`` lists of entries.
+    """
+    # The shortest column length the entries fit in, by bisection
+    low = max((entry.height for entry in entries), default=0)
+    high = height
+    while low < high:
+        middle = (low + high) // 2
+        if len(_columns(entries, middle)) <= columns:
+            high = middle
+        else:
+            low = middle + 1
+    starts = _columns(entries, low) + [len(entries)]
+    return [entries[start:end] for start, end in zip(starts, starts[1:])]
+
+
+def paginate(entries, columns, height):
+    """Yield the pages of ``entries`` as lists of columns (lists of entries).
+
+    There is always at least one page, which is empty if there are no entries.
+    """
+    page = []
+    column = 1
+    y = 0
+    for entry in entries:
+        if y and y + entry.gap + entry.height <= height:
+            y += entry.gap + entry.height
+        elif not y:
+            y = entry.height
+        elif column < columns:
+            column += 1
+            y = entry.height
+        else:
+            yield balance(page, columns, height)
+            page, column, y = [], 1, entry.height
+        page.append(entry)
+    yield balance(page, columns, height)
@@ -0,0 +1,96 @@
+"""The backends a calendar can be output through, by name.
+
+A backend's module is only imported when the backend is used, so making a
+PDF file never loads the Windows DLLs of the printer backend, and commands
+that output nothing (like ``makecalendar.py --check``) load no backend.
+
+    pdf       a PDF file (pdfwriter.py)
+    printer   a Windows printer (gdi.py)
+    png       a PNG file per page, for previews (raster.py)
+
+Other backends can be added with register_backend().  A backend is a class
+with a ``from_config(cfg, setup, output=None, pages=None)`` classmethod
+returning an instance set up from calendar.ini, the PageSetup, where to
+output to (a file, directory or printer name; None for the configured
+default) and the set of page numbers to output (None for all).  Unless the
+class has ``selects_pages`` set, which means the backend skips the other
+pages itself, it is only given the selected pages.
+"""
+
+import importlib
+import sys
+
+# Highest page number a page selection can name; far more than any calendar
+# has, and small enough that selections are cheap to hold as sets
+MAX_PAGES = 10000
+
+# Backend name -> "module:class"
+BACKENDS = {
+    "pdf": "pdfwriter:PDFWriter",
+    "printer": "gdi:GDIRenderer",
+    "png": "raster:RasterRenderer",
+}
+
+
+# Backends that only work on one platform: name -> (sys.platform, its name)
+PLATFORMS = {"printer": ("win32", "Windows")}
+
+
+def register_backend(name, target):
+    """Make the class ``target`` ("module:class") available as backend ``name``."""
+    BACKENDS[name.lower()] = target
+
+
+def backend_class(name):
+    """Import and return the class of backend ``name``.
+
+    Raises ValueError if there is no such backend, or if it doesn't work on
+    this platform (see PLATFORMS).
+    """
+    try:
+        target = BACKENDS[name.lower()]
+    except KeyError:
+        raise ValueError(
+            f"Unknown output: {name} (expected one of {', '.join(sorted(BACKENDS))})"
+        ) from None
+    platform = PLATFORMS.get(name.lower())
+    if platform is not None and sys.platform != platform[0]:
+        raise ValueError(f"Output {name} is only available on {platform[1]}")
+    module, _, cls = target.partition(":")
+    return getattr(importlib.import_module(module), cls)
+
+
+def open_backend(name, cfg, setup, output=None, pages=None):
+    """Return backend ``name`` set up for outputting a calendar."""
+    return backend_class(name).from_config(cfg, setup, output, pages)
+
+
+def parse_pages(text):
+    """Parse a page selection like "3-4,7" into a set of page numbers.
+
+    Raises ValueError for ranges that are reversed, start before page 1 or
+    end after page MAX_PAGES.
+    """
+    pages = set()
+    for part in text.split(","):
+        part = part.strip()
+        first, _, last = part.partition("-")
+        try:
+            first = int(first)
+            last = int(last) if last else first
+        except ValueError:
+            raise ValueError(f"bad page range {part!r}") from None
+        if first < 1 or last < first:
+            raise ValueError(f"bad page range {part!r}")
+        if last > MAX_PAGES:
+            raise ValueError(f"bad page range {part!r} (pages go up to {MAX_PAGES})")
+        pages.update(range(first, last + 1))
+    return pages
+
+
+def check_selection(selected, count):
+    """Raise ValueError if page selection ``selected`` goes past page ``count``."""
+    if selected and max(selected) > count:
+        raise ValueError(
+            f"Page {max(selected)} was selected, but the calendar has {count} pages"
+        )
@@ -0,0 +1,159 @@
+"""Generate many calendars at once from a manifest.
+
+The manifest is a CSV file with a header row and one row per calendar:
+
+    name,config,birthdays,deaths,addresses,credits,holidays,images,output
+    doe,families/doe/calendar.ini,,,,,,,out/doe.pdf
+    smith,families/smith/calendar.ini,,,,,shared/holidays.txt,shared/pictures,
+
+Only ``config`` is required.  Empty data file and ``images`` columns default
+to the usual file names in the config file's directory, ``name`` defaults to
+the name of that directory and ``output`` to "<name>.pdf".  Relative paths are
+relative to the manifest.  Batch jobs always write PDF files.
+
+Jobs run in parallel in a pool of worker processes; a failing job does not
+stop the others.  Run ``python batch.py manifest.csv``.
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import os
+import sys
+import time
+import traceback
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from compose import Sources
+from pipeline import load_config, make_calendar
+
+
+class Job(namedtuple("Job", "name config sources output")):
+    __slots__ = ()
+
+
+class Result(namedtuple("Result", "job ok seconds log error")):
+    __slots__ = ()
+
+
+class ManifestError(ValueError):
+    pass
+
+
+def read_manifest(path):
+    """Return the list of Jobs in a manifest file."""
+    base = os.path.dirname(os.path.abspath(path))
+
+    def resolve(value, default):
+        value = (value or "").strip()
+        return os.path.join(base, value) if value else default
+
+    jobs = []
+    names = set()
+    with open(path, newline="") as f:
+        for lineno, row in enumerate(csv.DictReader(f), start=2):
+            if not (row.get("config") or "").strip():
+                raise ManifestError(f"{path}:{lineno}: no config file given")
+            config = resolve(row["config"], None)
+            directory = os.path.dirname(config)
+            defaults = Sources.in_directory(directory)
+            name = (row.get("name") or "").strip() or os.path.basename(directory)
+            if name in names:
+                raise ManifestError(f"{path}:{lineno}: duplicate job name {name!r}")
+            names.add(name)
+            sources = Sources(
+                *(
+                    resolve(row.get(field), default)
+                    for field, default in zip(Sources._fields, defaults)
+                )
+            )
+            output = resolve(row.get("output"), os.path.join(base, name + ".pdf"))
+            jobs.append(Job(name, config, sources, output))
+    return jobs
+
+
+def run_job(job):
+    """Make one calendar, capturing its output; never raises."""
+    log = io.StringIO()
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(log):
+            cfg = load_config(job.config)
+            os.makedirs(os.path.dirname(os.path.abspath(job.output)), exist_ok=True)
+            # The jobs are already spread over the CPUs
+            make_calendar(cfg, job.sources, job.output, processes=1)
+    except Exception:
+        return Result(
+            job,
+            False,
+            time.perf_counter() - start,
+            log.getvalue(),
+            traceback.format_exc(),
+        )
+    return Result(job, True, time.perf_counter() - start, log.getvalue(), None)
+
+
+def run_batch(jobs, workers=None, verbose=False):
+    """Run all jobs in a process pool, reporting each one as it finishes.
+
+    Returns the list of Results in manifest order.
+    """
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_job, job): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                result = Result(job, False, 0.0, "", "worker process died\n")
+            results[job.name] = result
+            if result.ok:
+                print(f"[ok]     {job.name} ({result.seconds:.1f}s) -> {job.output}")
+            else:
+                print(f"[FAILED] {job.name} ({result.seconds:.1f}s)")
+            if verbose or not result.ok:
+                for line in (result.log + (result.error or "")).splitlines():
+                    print("         " + line)
+    return [results[job.name] for job in jobs]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("manifest", help="CSV file listing the calendars to make")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="number of worker processes (default: one per CPU)",
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="show the output of every job"
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        jobs = read_manifest(args.manifest)
+    except (OSError, ManifestError) as e:
+        print(f"Cannot read manifest: {e}")
+        return 2
+    print(f"Making {len(jobs)} calendars...")
+    start = time.perf_counter()
+    results = run_batch(jobs, args.jobs, args.verbose)
+    failed = [r.job.name for r in results if not r.ok]
+    print(
+        f"{len(results) - len(failed)} succeeded, {len(failed)} failed"
+        f" in {time.perf_counter() - start:.1f}s"
+    )
+    if failed:
+        print("Failed: " + ", ".join(failed))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
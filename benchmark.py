@@ -0,0 +1,380 @@
+"""Benchmarks of making calendars from generated data.
+
+Each benchmark case generates a calendar (or many) with the given numbers of
+birthdays and address lines, composes its pages and replays them onto a
+backend that only counts the drawing operations, so the numbers measure
+this program and not a printer driver or a disk.  For each phase it reports
+the wall time, the peak memory allocated by Python and the drawing
+operations produced:
+
+    config      reading calendar.ini and compiling the theme
+    birthdays   loading birthdays.txt into an EventStore
+    <section>   composing the pages of each section (see compose.SECTIONS)
+    pictures    identifying the placed pictures (content hash, JPEG header)
+    render      replaying the pages onto the counting backend
+
+Times are the sums over all calendars of a case; memory is measured in a
+second run with tracemalloc (which slows everything down), unless
+--no-memory is given.
+
+    python benchmark.py                        # all cases
+    python benchmark.py roster-1k batch-100    # some of them
+    python benchmark.py --json results.json    # save the results
+    python benchmark.py --baseline results.json --tolerance 1.5
+
+With --baseline, the exit status is 1 if any phase got slower than the
+baseline by more than the tolerance factor.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter, namedtuple
+
+import fonts
+from compose import MONTHS, SECTIONS, Sources, get_page_setup, load_events
+from displaylist import render
+from imagecache import file_hash
+from jpeginfo import read_jpeg_info
+from pipeline import load_config
+from theme import compile_theme
+
+
+class Case(namedtuple("Case", "name birthdays addresses calendars")):
+    __slots__ = ()
+
+
+CASES = (
+    Case("small", 10, 20, 1),
+    Case("roster-1k", 1000, 20, 1),
+    Case("roster-50k", 50000, 20, 1),
+    Case("addresses-5k", 10, 5000, 1),
+    Case("batch-100", 10, 20, 100),
+)
+
+PHASES = ("config", "birthdays") + tuple(name for name, _ in SECTIONS)
+PHASES += ("pictures", "render")
+
+# Size of the generated pictures, which is what hashing them costs
+PICTURE_BYTES = 512 * 1024
+
+# Phases faster than this are not reported as regressions
+NOISE_SECONDS = 0.005
+
+FIRST_NAMES = ("Ann", "Bob", "Christopher", "Dorothea", "Eli", "Francesca")
+LAST_NAMES = ("Doe", "Smith", "Washington", "Nguyen", "Okafor", "Schneider")
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "calendar.ini")
+
+
+################################################################################
+#   Generated inputs
+################################################################################
+
+
+def _name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def write_picture(path, width=3300, height=2550):
+    """Write a JPEG file header (with filler) that identifies as a picture."""
+    filler = b"\0" * 65000
+    comments = b"".join(
+        b"\xff\xfe" + struct.pack(">H", len(filler) + 2) + filler
+        for _ in range(PICTURE_BYTES // len(filler))
+    )
+    frame = struct.pack(">BHHB", 8, height, width, 3) + b"\x01\x22\x00" * 3
+    with open(path, "wb") as f:
+        f.write(b"\xff\xd8" + comments)
+        f.write(b"\xff\xc0" + struct.pack(">H", len(frame) + 2) + frame)
+        f.write(b"\xff\xd9")
+
+
+def write_pictures(directory):
+    os.makedirs(directory, exist_ok=True)
+    names = ["front-cover.jpg", "in-memory.jpg"]
+    names += ["%i %s.jpg" % (n, month) for n, month in enumerate(MONTHS, start=1)]
+    for name in names:
+        write_picture(os.path.join(directory, name))
+
+
+def write_calendar(directory, case, seed):
+    """Write the configuration and data files of one calendar of a case."""
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    shutil.copy(TEMPLATE, os.path.join(directory, "calendar.ini"))
+    with open(os.path.join(directory, "birthdays.txt"), "w") as f:
+        f.write("# Generated\n")
+        for _ in range(case.birthdays):
+            name = _name(rng)
+            if rng.random() < 0.1:
+                name += " & " + _name(rng)
+            month = rng.randint(1, 12)
+            day = rng.randint(1, 29 if month == 2 else 30)
+            f.write(f"{month}/{day}/{rng.randint(1920, 2024)} {name}\n")
+    with open(os.path.join(directory, "addresses.txt"), "w") as f:
+        lines = 0
+        while lines < case.addresses:
+            block = [
+                "@name:" + _name(rng),
+                f"{rng.randint(1, 9999)} Main Street",
+                f"Anytown, US {rng.randint(10000, 99999)}",
+                f"Cell: {rng.randint(200, 999)}-555-{rng.randint(1000, 9999)}",
+                "",
+            ]
+            block = block[: case.addresses - lines]
+            f.write("\n".join(block) + "\n")
+            lines += len(block)
+    with open(os.path.join(directory, "deaths.txt"), "w") as f:
+        f.write(f"{_name(rng)}: January 1, 1900 - December 31, 1999\n")
+    with open(os.path.join(directory, "picture-credits.txt"), "w") as f:
+        f.write("".join(f"{month}: Somewhere\n" for month in MONTHS))
+
+
+################################################################################
+#   Measuring
+################################################################################
+
+
+class CountingBackend:
+    """A backend that only counts what it is asked to draw."""
+
+    def __init__(self):
+        self.ops = Counter()
+
+    def start_document(self, title):
+        pass
+
+    def end_document(self):
+        pass
+
+    def start_page(self, width, height):
+        self.ops["page"] += 1
+
+    def end_page(self):
+        pass
+
+    def set_font(self, font):
+        self.ops["set_font"] += 1
+
+    def set_text_color(self, color):
+        self.ops["set_text_color"] += 1
+
+    def set_pen(self, width, color):
+        self.ops["set_pen"] += 1
+
+    def set_brush(self, color):
+        self.ops["set_brush"] += 1
+
+    def text(self, left, top, right, bottom, text, align, clip):
+        self.ops["text"] += 1
+
+    def rectangle(self, left, top, right, bottom):
+        self.ops["rectangle"] += 1
+
+    def line(self, x1, y1, x2, y2):
+        self.ops["line"] += 1
+
+    def image(self, left, top, right, bottom, path):
+        self.ops["image"] += 1
+
+
+class Stats:
+    """Time, memory and drawing operations of the phases of a case."""
+
+    def __init__(self, memory):
+        self.memory = memory
+        self.seconds = Counter()
+        self.peak = Counter()
+        self.ops = {phase: Counter() for phase in PHASES}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        if self.memory:
+            tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        yield self.ops[name]
+        self.seconds[name] += time.perf_counter() - start
+        if self.memory:
+            peak = tracemalloc.get_traced_memory()[1] - start_memory
+            self.peak[name] = max(self.peak[name], peak)
+
+
+def _count_ops(pages, counter):
+    for page in pages:
+        counter["page"] += 1
+        counter.update(op.kind for op in page.ops)
+
+
+def make_one(directory, pictures, stats):
+    """Make the calendar in ``directory``, recording its phases in ``stats``."""
+    sources = Sources.in_directory(directory)._replace(images=pictures)
+    with stats.phase("config"):
+        cfg = load_config(os.path.join(directory, "calendar.ini"))
+        theme = compile_theme(cfg, get_page_setup(cfg))
+    with stats.phase("birthdays"):
+        events = load_events(theme, sources)
+    pages = []
+    for name, section in SECTIONS:
+        with stats.phase(name) as ops:
+            section_pages = list(section(theme, sources, events))
+            _count_ops(section_pages, ops)
+        pages += section_pages
+    with stats.phase("pictures") as ops:
+        for page in pages:
+            for op in page.ops:
+                if op.kind == "image":
+                    file_hash(op.path)
+                    read_jpeg_info(op.path)
+                    ops["image"] += 1
+    with stats.phase("render") as ops:
+        backend = CountingBackend()
+        render(pages, backend)
+        ops.update(backend.ops)
+
+
+def run_case(case, directory, memory=False):
+    """Run a benchmark case on inputs in ``directory``; returns its Stats."""
+    stats = Stats(memory)
+    calendars = [
+        os.path.join(directory, case.name, "calendar-%03i" % i)
+        for i in range(case.calendars)
+    ]
+    pictures = os.path.join(directory, "pictures")
+    if memory:
+        tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for calendar_dir in calendars:
+                make_one(calendar_dir, pictures, stats)
+    finally:
+        if memory:
+            tracemalloc.stop()
+    return stats
+
+
+def prepare(cases, directory):
+    """Generate the inputs of ``cases`` in ``directory``."""
+    write_pictures(os.path.join(directory, "pictures"))
+    for case in cases:
+        for i in range(case.calendars):
+            calendar_dir = os.path.join(directory, case.name, "calendar-%03i" % i)
+            write_calendar(calendar_dir, case, seed=i)
+
+
+################################################################################
+#   Reporting
+################################################################################
+
+
+def case_results(stats, memory_stats):
+    results = {}
+    for phase in PHASES:
+        results[phase] = {
+            "seconds": round(stats.seconds[phase], 6),
+            "ops": dict(stats.ops[phase]),
+        }
+        if memory_stats is not None:
+            results[phase]["peak_bytes"] = memory_stats.peak[phase]
+    return results
+
+
+def print_case(case, results):
+    print(
+        f"{case.name}: {case.birthdays} birthdays, {case.addresses} address"
+        f" lines, {case.calendars} calendar(s)"
+    )
+    print("  %-16s %10s %12s %10s" % ("phase", "time (ms)", "peak (KiB)", "ops"))
+    for phase, result in results.items():
+        peak = result.get("peak_bytes")
+        ops = sum(n for kind, n in result["ops"].items() if kind != "page")
+        print(
+            "  %-16s %10.1f %12s %10s"
+            % (
+                phase,
+                result["seconds"] * 1000,
+                "-" if peak is None else "%.0f" % (peak / 1024),
+                ops or "-",
+            )
+        )
+    total = sum(result["seconds"] for result in results.values())
+    print("  %-16s %10.1f" % ("total", total * 1000))
+
+
+def compare(results, baseline, tolerance):
+    """Return descriptions of the phases slower than in ``baseline``."""
+    regressions = []
+    for case, phases in results.items():
+        for phase, result in phases.items():
+            old = baseline.get(case, {}).get(phase)
+            if old is None:
+                continue
+            new_seconds, old_seconds = result["seconds"], old["seconds"]
+            if (
+                new_seconds > old_seconds * tolerance
+                and new_seconds - old_seconds > NOISE_SECONDS
+            ):
+                regressions.append(
+                    f"{case} / {phase}: {old_seconds * 1000:.1f} ms"
+                    f" -> {new_seconds * 1000:.1f} ms"
+                )
+    return regressions
+
+
+def main(argv=None):
+    names = [case.name for case in CASES]
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("cases", nargs="*", metavar="case", help=", ".join(names))
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare with results in this file")
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    parser.add_argument(
+        "--no-memory", action="store_true", help="don't measure peak memory"
+    )
+    args = parser.parse_args(argv)
+    for name in args.cases:
+        if name not in names:
+            parser.error(f"unknown case {name!r} (choose from {', '.join(names)})")
+    cases = [case for case in CASES if not args.cases or case.name in args.cases]
+
+    # Find the installed fonts before measuring anything
+    with contextlib.redirect_stdout(io.StringIO()):
+        fonts.font_index()
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="calendar-benchmark-") as directory:
+        prepare(cases, directory)
+        for case in cases:
+            stats = run_case(case, directory)
+            memory_stats = None
+            if not args.no_memory:
+                memory_stats = run_case(case, directory, memory=True)
+            results[case.name] = case_results(stats, memory_stats)
+            print_case(case, results[case.name])
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Slower than the baseline:")
+            for regression in regressions:
+                print("  " + regression)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
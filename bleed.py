@@ -0,0 +1,83 @@
+"""Bleed and crop marks for commercial printing.
+
+Printers print on larger sheets and cut them down to the page size (the
+trim size), so anything meant to reach the edge of the page has to extend a
+little beyond it (the bleed), and crop marks outside the bleed show where
+to cut.  With ``Bleed`` and/or ``Crop-marks`` set in calendar.ini, each
+composed page is placed in the middle of a larger page (the media), with
+pictures that reach an edge of the page extended into the bleed and crop
+marks drawn around it.  The PDF writer marks the trim and bleed areas of
+each page (TrimBox and BleedBox) for the printer.
+"""
+
+from displaylist import DisplayList
+
+# Crop marks start at least MARK_OFFSET outside the trimmed page (and always
+# outside the bleed) and are MARK_LENGTH long and MARK_WIDTH thick, in mils
+MARK_OFFSET = 125
+MARK_LENGTH = 250
+MARK_WIDTH = 3
+MARK_COLOR = 0x000000
+
+
+def mark_offset(bleed):
+    return max(bleed, MARK_OFFSET)
+
+
+def media_margin(bleed, crop_marks):
+    """Return how much larger than the page the media is on each side."""
+    if crop_marks:
+        return mark_offset(bleed) + MARK_LENGTH
+    return bleed
+
+
+def _extend(op, width, height, bleed):
+    left, top, right, bottom, path = op
+    if left <= 0:
+        left = min(left, -bleed)
+    if top <= 0:
+        top = min(top, -bleed)
+    if right >= width:
+        right = max(right, width + bleed)
+    if bottom >= height:
+        bottom = max(bottom, height + bleed)
+    return op._replace(left=left, top=top, right=right, bottom=bottom)
+
+
+def _shift(op, dx, dy):
+    if op.kind == "line":
+        return op._replace(x1=op.x1 + dx, y1=op.y1 + dy, x2=op.x2 + dx, y2=op.y2 + dy)
+    if op.kind in ("text", "rectangle", "image"):
+        return op._replace(
+            left=op.left + dx,
+            top=op.top + dy,
+            right=op.right + dx,
+            bottom=op.bottom + dy,
+        )
+    return op
+
+
+def draw_crop_marks(out, left, top, right, bottom, bleed):
+    """Draw crop marks around the trimmed page ``left, top, right, bottom``."""
+    near = mark_offset(bleed)
+    far = near + MARK_LENGTH
+    out.set_pen(MARK_WIDTH, MARK_COLOR)
+    for x, sx in ((left, -1), (right, 1)):
+        for y, sy in ((top, -1), (bottom, 1)):
+            out.line(x + sx * near, y, x + sx * far, y)
+            out.line(x, y + sy * near, x, y + sy * far)
+
+
+def add_bleed(page, bleed, crop_marks):
+    """Return a DisplayList placing ``page`` on media with bleed and crop marks."""
+    margin = media_margin(bleed, crop_marks)
+    out = DisplayList(page.width + 2 * margin, page.height + 2 * margin)
+    for op in page.ops:
+        if op.kind == "image" and bleed:
+            op = _extend(op, page.width, page.height, bleed)
+        out.ops.append(_shift(op, margin, margin))
+    if crop_marks:
+        draw_crop_marks(
+            out, margin, margin, margin + page.width, margin + page.height, bleed
+        )
+    return out
@@ -0,0 +1,533 @@
+"""Calendar page composition.
+
+Builds the pages of the calendar from calendar.ini and the data files as
+backend-neutral display lists (see displaylist.py).  Nothing in here touches
+Windows APIs, so the layout can be produced and inspected on any platform.
+"""
+
+import os
+from collections import namedtuple
+
+from addressbook import paginate, read_entries
+from bleed import media_margin
+from displaylist import ALIGN_CENTER, ALIGN_LEFT, DisplayList
+from events import ANNIVERSARY, BIRTHDAY, HOLIDAY, EventStore
+from grid import month_grids
+from imposition import IMPOSITIONS
+from lengths import parse_length
+from observances import load_rules
+from textmetrics import fit_stack
+from tracing import NULL_TRACER
+
+MONTHS = (
+    "January",
+    "February",
+    "March",
+    "April",
+    "May",
+    "June",
+    "July",
+    "August",
+    "September",
+    "October",
+    "November",
+    "December",
+)
+WEEKDAYS = (
+    "Sunday",
+    "Monday",
+    "Tuesday",
+    "Wednesday",
+    "Thursday",
+    "Friday",
+    "Saturday",
+)
+
+# Standard paper sizes (portrait dimensions: width x height, in inches)
+PAPER_SIZES = {
+    "LETTER": (8.5, 11.0),
+    "LEGAL": (8.5, 14.0),
+    "TABLOID": (11.0, 17.0),
+    "LEDGER": (11.0, 17.0),
+    "A3": (11.693, 16.535),
+    "A4": (8.268, 11.693),
+    "A5": (5.827, 8.268),
+}
+
+
+class PageSetup(
+    namedtuple(
+        "PageSetup",
+        "paper paper_width paper_height landscape bleed crop_marks imposition",
+        defaults=(0, False, "none"),
+    )
+):
+    """The paper and orientation to print on.
+
+    ``paper`` is the name of a standard paper size from PAPER_SIZES, or None
+    for a custom size.  The paper dimensions are in inches.  ``bleed`` (in
+    mils) and ``crop_marks`` make the pages larger for commercial printing
+    (see bleed.py); ``imposition`` is how pages are arranged on the printed
+    pages, "none" or "booklet" (two side by side, see imposition.py).
+    """
+
+    __slots__ = ()
+
+    @property
+    def margin(self):
+        """How much larger the printed pages are than the page on each side."""
+        return media_margin(self.bleed, self.crop_marks)
+
+    @property
+    def media_size(self):
+        """The (width, height) in mils of the printed pages."""
+        width, height = self.size
+        if self.imposition == "booklet":
+            width *= 2
+        return width + 2 * self.margin, height + 2 * self.margin
+
+    @property
+    def size(self):
+        """The page (width, height) in mils, taking orientation into account."""
+        page_width = int(self.paper_height * 1000)
+        page_height = int(self.paper_width * 1000)
+        if self.landscape:
+            return max(page_width, page_height), min(page_width, page_height)
+        return min(page_width, page_height), max(page_width, page_height)
+
+
+def get_page_setup(cfg):
+    # Get orientation setting
+    orientation = (
+        cfg.get("General", "Orientation", fallback="Landscape").strip().upper()
+    )
+    is_landscape = orientation == "LANDSCAPE"
+    print(f"Orientation: {'Landscape' if is_landscape else 'Portrait'}")
+
+    if cfg.has_option("General", "Paper-size"):
+        paper_size = cfg.get("General", "Paper-size").strip().upper()
+        if paper_size in PAPER_SIZES:
+            paper_width, paper_height = PAPER_SIZES[paper_size]
+            print(f"Paper size: {paper_size} ({paper_width} x {paper_height} inches)")
+        elif "X" in paper_size:
+            width, height = paper_size.split("X")
+            paper_width = float(width.strip())
+            paper_height = float(height.strip())
+            paper_size = None
+            print(f"Custom paper size: {paper_width} x {paper_height} inches")
+        else:
+            raise ValueError(f"Unknown paper size: {paper_size}")
+    else:
+        # Default to Letter size
+        paper_size = "LETTER"
+        paper_width = 8.5
+        paper_height = 11.0
+        print("Paper size not specified; defaulting to Letter.")
+
+    # Bleed and crop marks for commercial printing
+    bleed = parse_length(cfg.get("General", "Bleed", fallback="0"), 0)
+    crop_marks = cfg.getboolean("General", "Crop-marks", fallback=False)
+    imposition = cfg.get("General", "Imposition", fallback="none").strip().lower()
+    if imposition not in IMPOSITIONS:
+        raise ValueError(f"Unknown imposition: {imposition}")
+
+    setup = PageSetup(
+        paper_size,
+        paper_width,
+        paper_height,
+        is_landscape,
+        bleed,
+        crop_marks,
+        imposition,
+    )
+    print("Page size in mils: %i x %i" % setup.size)
+    if setup.margin:
+        print("Bleed: %i mils%s" % (bleed, ", with crop marks" if crop_marks else ""))
+    if imposition != "none":
+        print(f"Imposition: {imposition}")
+    if setup.media_size != setup.size:
+        print("Printed page size in mils: %i x %i" % setup.media_size)
+    return setup
+
+
+class Sources(
+    namedtuple("Sources", "birthdays deaths addresses credits holidays images")
+):
+    """Where the data files and the pictures of a calendar are.
+
+    The first five are file paths; ``images`` is the directory with the
+    pictures.  Missing deaths, addresses, credits and holidays files are
+    allowed.
+    """
+
+    __slots__ = ()
+
+    @property
+    def data_files(self):
+        """The paths of the data files (all but ``images``)."""
+        return self[:-1]
+
+    @classmethod
+    def in_directory(cls, directory="."):
+        """Return the sources with their usual file names in ``directory``."""
+        return cls(
+            birthdays=os.path.join(directory, "birthdays.txt"),
+            deaths=os.path.join(directory, "deaths.txt"),
+            addresses=os.path.join(directory, "addresses.txt"),
+            credits=os.path.join(directory, "picture-credits.txt"),
+            holidays=os.path.join(directory, "holidays.txt"),
+            images=directory,
+        )
+
+
+def weekday_names(week_start):
+    """Return the names of the days of the week, starting at ``week_start``.
+
+    ``week_start`` is a weekday number (Monday = 0 ... Sunday = 6).
+    """
+    # WEEKDAYS starts on Sunday
+    return tuple(WEEKDAYS[(week_start + 1 + i) % 7] for i in range(7))
+
+
+def find_file(filename):
+    """Return the path of ``filename``, matching its name case-insensitively.
+
+    The pictures are looked up by names like "front-cover.jpg", which Windows
+    also finds as "front-cover.JPG"; do the same on case-sensitive systems.
+    Returns None if there is no such file.
+    """
+    if os.path.isfile(filename):
+        return filename
+    directory, name = os.path.split(filename)
+    try:
+        entries = os.listdir(directory or ".")
+    except OSError:
+        return None
+    for entry in entries:
+        if entry.lower() == name.lower():
+            path = os.path.join(directory, entry)
+            if os.path.isfile(path):
+                return path
+    return None
+
+
+def load_events(theme, sources):
+    """Return the EventStore of the birthdays and holidays files of ``sources``."""
+    events = EventStore(leap_day=theme.leap_day, order=theme.birthday_order)
+    events.load(sources.birthdays)
+    print(f"Loaded {len(events)} birthdays.")
+    if os.path.isfile(sources.holidays):
+        events.holidays = load_rules(sources.holidays)
+        print(f"Loaded {len(events.holidays)} holidays.")
+    return events
+
+
+def _new_page(theme):
+    return DisplayList(theme.page_width, theme.page_height)
+
+
+def _text_left(out, x, y, text, width=None):
+    if width is None:
+        width = out.width
+    out.text(x, y, x + width, y, text, ALIGN_LEFT)
+
+
+def _text_center(out, x, y, text):
+    out.text(x - out.width, y, x + out.width, y, text, ALIGN_CENTER)
+
+
+def month_picture_names(month_theme):
+    """Return the file names a month's picture is looked up by, in order.
+
+    "9 September 2026.jpg" allows different pictures for the same month of
+    different years; "9 September.jpg" is used for any year.
+    """
+    number, name, year = month_theme.number, month_theme.name, month_theme.year
+    return ("%i %s %i.jpg" % (number, name, year), "%i %s.jpg" % (number, name))
+
+
+def find_picture(directory, names):
+    """Return the path of the first picture called one of ``names``, or None."""
+    for name in names:
+        path = find_file(os.path.join(directory, name))
+        if path is not None:
+            return path
+    return None
+
+
+def _bitmap(out, theme, sources, box, *names):
+    bmpfn = find_picture(sources.images, names)
+    if not theme.skip_bitmaps and bmpfn:
+        out.image(*box, os.path.realpath(bmpfn))
+
+
+def _set_style(out, style):
+    out.set_font(style.font)
+    out.set_text_color(style.color)
+    return style.font.height
+
+
+def _set_pen(out, pen):
+    out.set_pen(width=pen.width, color=pen.color)
+
+
+################################################################################
+#   Front Cover
+################################################################################
+
+
+def compose_front_cover(theme, sources, events):
+    layout = theme.layout
+    year = theme.year_label
+    out = _new_page(theme)
+    _bitmap(out, theme, sources, layout.front_cover_image, "front-cover.jpg")
+    _set_style(out, theme.styles.front_cover)
+    x, y = layout.front_cover_text
+    _text_center(out, x, y, theme.front_cover_text.format(year=year, nl="\n"))
+    x, y = layout.front_cover_year
+    _text_center(out, x, y, year)
+    yield out
+
+
+################################################################################
+#   Month Pages
+################################################################################
+
+
+def compose_month_pages(theme, sources, events):
+    """Yield the picture page and the calendar page of every month."""
+    page_width, page_height = theme.page_width, theme.page_height
+    layout = theme.layout
+    styles = theme.styles
+    # The grid area, from the margins
+    grid_left, grid_top, grid_right, grid_bottom = layout.grid_margins
+    grid_box = (grid_left, grid_top, page_width - grid_right, page_height - grid_bottom)
+    weekdays = weekday_names(theme.week_start)
+
+    (weekday_y,) = layout.weekdays
+    bd_format = theme.birthday_format
+    day_x, day_y = layout.day
+    birthday_x, birthday_y = layout.birthday
+    # The room for birthdays in a cell, between its sides and below the number
+    day_bottom = day_y + styles.day.font.height
+    event_styles = {
+        BIRTHDAY: styles.birthday,
+        ANNIVERSARY: styles.anniversary,
+        HOLIDAY: theme.style("Holiday") or styles.birthday,
+    }
+
+    for month_theme in theme.months:
+        month_n, month = month_theme.number, month_theme.name
+        year = str(month_theme.year)
+        grids = month_grids(
+            month_theme.year, theme.week_start, grid_box, theme.fit_rows
+        )
+        grid = grids[month_n - 1]
+        cellwidth = grid.cell_width
+        birthday_width = cellwidth - 2 * birthday_x
+        birthday_height = grid.cell_height - birthday_y - day_bottom
+        # Picture Page
+        out = _new_page(theme)
+        names = month_picture_names(month_theme)
+        _bitmap(out, theme, sources, layout.month_image, *names)
+        yield out
+        # Calendar Page
+        out = _new_page(theme)
+        # Box
+        _set_pen(out, theme.pens.box_outline)
+        out.set_brush(color=month_theme.box_color)
+        lm, t, rm, b = layout.box
+        r = page_width - rm
+        out.rectangle(lm, t, r, b)
+        # Month & year
+        _set_style(out, styles.month)
+        x, y = layout.month
+        _text_left(out, x, y, month)
+        _set_style(out, styles.year)
+        x, y = layout.year
+        _text_left(out, x, y, year)
+        # Quote
+        _set_style(out, styles.quote)
+        out.text(*layout.quote, month_theme.quote, ALIGN_LEFT, clip=True)
+        # Days of the week
+        _set_style(out, styles.weekdays)
+        x = cellwidth // 2 + grid.left
+        for day in weekdays:
+            # Day Number
+            _text_center(out, x, weekday_y, day)
+            x += cellwidth
+        # Grid
+        _set_pen(out, theme.pens.grid)
+        for line in grid.lines:
+            out.line(*line)
+        # Days
+        for cell in grid.cells:
+            X, Y = cell.left, cell.top
+            # Day Number
+            _set_style(out, styles.day)
+            _text_left(out, X + day_x, Y + day_y, str(cell.day))
+            # Holidays and birthdays, stacked upwards from the bottom of the
+            # cell (last one lowest) and made smaller if needed to stay below
+            # the number
+            day_events = events.on(month_n, cell.day, month_theme.year)
+            if not day_events:
+                continue
+            cell_styles = [event_styles[event.kind] for event in day_events]
+            texts = [
+                (
+                    event.name
+                    if event.kind == HOLIDAY
+                    else bd_format.format(
+                        name=event.name,
+                        year=event.year,
+                        shortyear=f"{event.year % 100:0>2}",
+                        month=event.month,
+                        day=event.day,
+                    )
+                )
+                for event in day_events
+            ]
+            fitted, fits = fit_stack(
+                [(style.font, text) for style, text in zip(cell_styles, texts)],
+                birthday_width,
+                birthday_height,
+                theme.birthday_fit,
+            )
+            if not fits:
+                print(
+                    f"Warning: the birthdays on {month} {cell.day} do not fit"
+                    " in their cell"
+                )
+            Y = cell.bottom - birthday_y
+            for style, text in reversed(list(zip(cell_styles, fitted))):
+                out.set_font(text.font)
+                out.set_text_color(style.color)
+                Y -= text.height
+                _text_left(out, X + birthday_x, Y, text.text, width=birthday_width)
+        yield out
+
+
+################################################################################
+#   Last Page (Deaths)
+################################################################################
+
+
+def compose_deaths_page(theme, sources, events):
+    layout = theme.layout
+    styles = theme.styles
+    out = _new_page(theme)
+    _bitmap(out, theme, sources, layout.deaths_image, "in-memory.jpg")
+    try:
+        with open(sources.deaths) as f:
+            deaths = f.read()
+    except FileNotFoundError:
+        pass
+    else:
+        _set_style(out, styles.deaths_title)
+        x, y = layout.deaths_title
+        _text_center(out, x, y, theme.deaths_title)
+        _set_style(out, styles.deaths)
+        x, y = layout.deaths
+        _text_left(out, x, y, deaths)
+    yield out
+
+
+################################################################################
+#   Inside Back Cover (Addresses, on more pages if needed)
+################################################################################
+
+
+def compose_address_pages(theme, sources, events):
+    """Yield the address book, on as many pages as it takes."""
+    layout = theme.layout
+    left, top = layout.addresses
+    column_width, bottom = layout.addresses_wrap
+    # As many columns as fit on the page
+    columns = max(1, (theme.page_width - left) // column_width)
+    try:
+        addresses = open(sources.addresses)
+    except FileNotFoundError:
+        yield _new_page(theme)
+        return
+    with addresses:
+        entries = read_entries(addresses, theme, column_width, bottom - top)
+        for page in paginate(entries, columns, bottom - top):
+            out = _new_page(theme)
+            _set_style(out, theme.styles.addresses_title)
+            x, y = layout.addresses_title
+            _text_center(out, x, y, theme.addresses_title)
+            style = None
+            for n, column in enumerate(page):
+                x = left + n * column_width
+                y = top
+                for entry in column:
+                    if y != top:
+                        y += entry.gap
+                    for line in entry.lines:
+                        if line.style != style:
+                            style = line.style
+                            _set_style(out, style)
+                        _text_left(out, x, y, line.text, width=column_width)
+                        y += line.height
+            yield out
+
+
+################################################################################
+#   Back Cover (Picture Credits)
+################################################################################
+
+
+def compose_credits_page(theme, sources, events):
+    layout = theme.layout
+    styles = theme.styles
+    out = _new_page(theme)
+    _set_style(out, styles.credits_title)
+    x, y = layout.credits_title
+    _text_left(out, x, y, theme.credits_title)
+    _set_style(out, styles.credits)
+    x, y = layout.credits
+    try:
+        with open(sources.credits) as f:
+            _text_left(out, x, y, f.read())
+    except FileNotFoundError:
+        pass
+    yield out
+
+
+# The parts of the calendar, in page order.  Each is called with the theme,
+# the sources and the EventStore and yields its pages one at a time.
+SECTIONS = (
+    ("front cover", compose_front_cover),
+    ("month pages", compose_month_pages),
+    ("deaths page", compose_deaths_page),
+    ("address pages", compose_address_pages),
+    ("credits page", compose_credits_page),
+)
+
+
+def compose_pages(theme, sources=None, events=None, tracer=NULL_TRACER):
+    """Lay out the calendar, yielding its pages (DisplayLists) one at a time.
+
+    ``theme`` is the compiled calendar.ini (see theme.py).  ``events`` is an
+    EventStore to use instead of loading the birthdays file of ``sources``.
+    Nothing is kept of a page once it has been yielded, so the pages can be
+    streamed into render() in constant memory however many there are.
+
+    Each section is recorded as a phase of ``tracer`` (see tracing.py); when
+    the pages are streamed, that includes drawing them.
+    """
+    if sources is None:
+        sources = Sources.in_directory()
+    if events is None:
+        events = load_events(theme, sources)
+    for name, section in SECTIONS:
+        with tracer.phase(name):
+            yield from section(theme, sources, events)
+
+
+def compose_document(theme, sources=None, events=None, tracer=NULL_TRACER):
+    """Lay out the whole calendar, returning a list of DisplayLists.
+
+    See compose_pages(), which this collects.
+    """
+    return list(compose_pages(theme, sources, events, tracer))
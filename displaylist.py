@@ -0,0 +1,170 @@
+"""Backend-neutral display lists for calendar pages.
+
+Page composition code draws into a DisplayList instead of a live device
+context.  The list records compact, typed drawing operations that can be
+replayed any number of times onto any backend implementing the same methods
+(the GDI printer DC, a file writer, a previewer, another DisplayList, ...).
+
+All coordinates are in mils (0.001 inch) measured from the top left corner of
+the page, with Y increasing downwards.  Colors are Windows COLORREF integers
+(0xBBGGRR), exactly as they are written in calendar.ini.
+"""
+
+import contextlib
+from collections import namedtuple
+
+# Font weights
+FW_NORMAL = 400
+FW_BOLD = 700
+
+# Text alignment
+ALIGN_LEFT = "left"
+ALIGN_CENTER = "center"
+
+
+class Font(namedtuple("Font", "name height width weight underline")):
+    """A font description; height and width are in mils (width 0 = natural)."""
+
+    __slots__ = ()
+
+
+# Drawing operations.  Each op's ``kind`` is the name of the backend method it
+# is replayed with, and its fields are that method's positional arguments.
+
+
+class SetFont(namedtuple("SetFont", "font")):
+    __slots__ = ()
+    kind = "set_font"
+
+
+class SetTextColor(namedtuple("SetTextColor", "color")):
+    __slots__ = ()
+    kind = "set_text_color"
+
+
+class SetPen(namedtuple("SetPen", "width color")):
+    __slots__ = ()
+    kind = "set_pen"
+
+
+class SetBrush(namedtuple("SetBrush", "color")):
+    __slots__ = ()
+    kind = "set_brush"
+
+
+class Text(namedtuple("Text", "left top right bottom text align clip")):
+    """Text word-wrapped to ``right - left``; clipped to the box if ``clip``."""
+
+    __slots__ = ()
+    kind = "text"
+
+
+class Rectangle(namedtuple("Rectangle", "left top right bottom")):
+    """A rectangle outlined with the current pen and filled with the brush."""
+
+    __slots__ = ()
+    kind = "rectangle"
+
+
+class Line(namedtuple("Line", "x1 y1 x2 y2")):
+    __slots__ = ()
+    kind = "line"
+
+
+class Image(namedtuple("Image", "left top right bottom path")):
+    """An image file stretched to fill the box."""
+
+    __slots__ = ()
+    kind = "image"
+
+
+class DisplayList:
+    """The recorded drawing operations of one page."""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.ops = []
+
+    def __len__(self):
+        return len(self.ops)
+
+    def __iter__(self):
+        return iter(self.ops)
+
+    def __eq__(self, other):
+        if not isinstance(other, DisplayList):
+            return NotImplemented
+        return (self.width, self.height, self.ops) == (
+            other.width,
+            other.height,
+            other.ops,
+        )
+
+    def __repr__(self):
+        return f"<DisplayList {self.width}x{self.height}, {len(self.ops)} ops>"
+
+    def set_font(self, font):
+        self.ops.append(SetFont(font))
+
+    def set_text_color(self, color):
+        self.ops.append(SetTextColor(color))
+
+    def set_pen(self, width, color):
+        self.ops.append(SetPen(width, color))
+
+    def set_brush(self, color):
+        self.ops.append(SetBrush(color))
+
+    def text(self, left, top, right, bottom, text, align=ALIGN_LEFT, clip=False):
+        self.ops.append(Text(left, top, right, bottom, text, align, clip))
+
+    def rectangle(self, left, top, right, bottom):
+        self.ops.append(Rectangle(left, top, right, bottom))
+
+    def line(self, x1, y1, x2, y2):
+        self.ops.append(Line(x1, y1, x2, y2))
+
+    def image(self, left, top, right, bottom, path):
+        self.ops.append(Image(left, top, right, bottom, path))
+
+    def replay(self, target):
+        """Draw this page onto ``target`` as one page."""
+        target.start_page(self.width, self.height)
+        for op in self.ops:
+            getattr(target, op.kind)(*op)
+        target.end_page()
+
+
+def render(pages, target, title="Calendar"):
+    """Replay a sequence of pages onto ``target`` as one document.
+
+    ``pages`` may be a generator like compose.compose_pages(); each page is
+    drawn as soon as it is produced and let go of before the next one.
+
+    Backends with a ``reuse_page(page)`` method may output a page without
+    having it replayed, e.g. from a cache; the method returns True if so.
+    """
+    reuse_page = getattr(target, "reuse_page", None)
+    with document(target, title):
+        for page in pages:
+            if reuse_page is None or not reuse_page(page):
+                page.replay(target)
+
+
+@contextlib.contextmanager
+def document(target, title):
+    """Start a document on ``target`` and end it after the block.
+
+    If the block raises, backends with an ``abort_document()`` method are
+    told to throw away what they output instead, e.g. a partial file.
+    """
+    target.start_document(title)
+    try:
+        yield target
+        target.end_document()
+    except BaseException:
+        abort_document = getattr(target, "abort_document", None)
+        if abort_document is not None:
+            abort_document()
+        raise
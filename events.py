@@ -0,0 +1,147 @@
+"""Birthdays and anniversaries, indexed by day of the year.
+
+An EventStore is loaded once from birthdays.txt and can then be asked for
+the events of any date, any number of times and for any year.  Given the
+HolidayRules of holidays.txt (see observances.py), it also returns the
+holidays of the date, before the birthdays.
+
+Events on February 29 are shown on another day in non-leap years, depending
+on the leap-day policy: "feb28" (the default) or "mar1" show them on that
+day, before the day's own events; "skip" leaves them out.
+
+Within a day, events are in the store's order: "file" (the order of
+birthdays.txt), "age" (oldest first) or "name".
+"""
+
+from collections import namedtuple
+
+LEAP_DAY_POLICIES = ("feb28", "mar1", "skip")
+EVENT_ORDERS = ("file", "age", "name")
+
+BIRTHDAY = "birthday"
+ANNIVERSARY = "anniversary"
+HOLIDAY = "holiday"
+
+
+class Event(namedtuple("Event", "month day year name kind")):
+    """One birthday or anniversary; ``name`` has its line breaks resolved."""
+
+    __slots__ = ()
+
+
+def is_leap_year(year):
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+
+def parse_event(line):
+    """Parse a "<month>/<day>/<year> <name>" line into an Event."""
+    date, name = line.split(" ", 1)
+    month, day, year = date.split("/")
+    name = name.strip()
+    # Anniversaries will be recognized by the "&" in the name
+    kind = ANNIVERSARY if "&" in name else BIRTHDAY
+    return Event(int(month), int(day), int(year), name.replace("\\n", "\n"), kind)
+
+
+class EventStore:
+    def __init__(self, leap_day="feb28", order="file", holidays=None):
+        if leap_day not in LEAP_DAY_POLICIES:
+            raise ValueError(f"Unknown leap day policy: {leap_day}")
+        if order not in EVENT_ORDERS:
+            raise ValueError(f"Unknown event order: {order}")
+        self.leap_day = leap_day
+        self.order = order
+        # HolidayRules, or None
+        self.holidays = holidays
+        # (month, day) -> list of events
+        self._days = {}
+        self._count = 0
+        self._sorted = True
+
+    def __len__(self):
+        return self._count
+
+    def add(self, event):
+        self._days.setdefault((event.month, event.day), []).append(event)
+        self._count += 1
+        self._sorted = False
+
+    def load_lines(self, lines, filename="<lines>"):
+        """Add the events in lines of birthdays.txt format; returns the count."""
+        days = self._days
+        count = 0
+        for lineno, line in enumerate(lines, start=1):
+            stripped = line.lstrip()
+            # Any line that starts with a "#" will be ignored
+            if not stripped or stripped[0] == "#":
+                continue
+            try:
+                event = parse_event(stripped)
+            except ValueError:
+                raise ValueError(
+                    f"{filename}:{lineno}: expected <month>/<day>/<year> <name>,"
+                    f" got {line.strip()!r}"
+                ) from None
+            key = (event.month, event.day)
+            if key in days:
+                days[key].append(event)
+            else:
+                days[key] = [event]
+            count += 1
+        self._count += count
+        self._sorted = False
+        return count
+
+    def load(self, path):
+        """Add the events in a birthdays.txt file; returns the count."""
+        with open(path) as f:
+            return self.load_lines(f, path)
+
+    def _sort(self):
+        if self.order == "age":
+            key = lambda e: e.year  # noqa: E731
+        elif self.order == "name":
+            key = lambda e: e.name.lower()  # noqa: E731
+        else:
+            key = None
+        if key is not None:
+            for events in self._days.values():
+                events.sort(key=key)
+        self._sorted = True
+
+    def on(self, month, day, year=None):
+        """Return the events to show on a date, in display order.
+
+        Without a year, only the birthdays and anniversaries of exactly that
+        day are returned.
+        """
+        if year is None or self.holidays is None:
+            return self._on(month, day, year)
+        holidays = tuple(
+            Event(month, day, year, name, HOLIDAY)
+            for name in self.holidays.on(month, day, year)
+        )
+        return holidays + self._on(month, day, year)
+
+    def _on(self, month, day, year):
+        if not self._sorted:
+            self._sort()
+        events = self._days.get((month, day), ())
+        if year is None or is_leap_year(year) or (2, 29) not in self._days:
+            return tuple(events)
+        if self.leap_day == "feb28" and (month, day) == (2, 28):
+            return tuple(self._days[2, 29]) + tuple(events)
+        if self.leap_day == "mar1" and (month, day) == (3, 1):
+            return tuple(self._days[2, 29]) + tuple(events)
+        return tuple(events)
+
+    def in_month(self, month):
+        """Return the events of a month, by day, ignoring leap-day moves."""
+        if not self._sorted:
+            self._sort()
+        return [
+            event
+            for (m, d), events in sorted(self._days.items())
+            if m == month
+            for event in events
+        ]
@@ -0,0 +1,115 @@
+"""A size-bounded, least-recently-used cache of files on disk.
+
+Entries are addressed by hex keys (normally content hashes) and stored one
+file per entry.  Reading an entry marks it as recently used by touching its
+modification time; when the cache grows past its size limit, the least
+recently used entries are deleted.  Entries are written atomically, so
+several processes (e.g. batch jobs) can share one cache directory.
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+
+MEGABYTE = 1024 * 1024
+
+
+def default_cache_dir(name):
+    """Return the per-user cache directory for the cache called ``name``."""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "calendar-creator", name)
+
+
+def make_key(*parts):
+    """Return a hex key for the given strings/numbers/bytes."""
+    h = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = str(part).encode("utf-8")
+        h.update(b"%i:" % len(part))
+        h.update(part)
+    return h.hexdigest()
+
+
+class FileCache:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._total = None
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        """Return the data stored under ``key``, or None."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key, data):
+        """Store ``data`` under ``key``, evicting old entries if needed."""
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        if self._total is None:
+            self._total = sum(size for _, size, _ in self._entries())
+        else:
+            self._total += len(data)
+        if self._total > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        """Yield (path, size, mtime) for all entries."""
+        try:
+            subdirs = list(os.scandir(self.directory))
+        except OSError:
+            return
+        for subdir in subdirs:
+            if not subdir.is_dir():
+                continue
+            for entry in os.scandir(subdir.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                yield entry.path, st.st_size, st.st_mtime
+
+    def evict(self):
+        """Delete least recently used entries until within the size limit."""
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        self._total = total
@@ -0,0 +1,626 @@
+"""Font lookup and metrics for backends that lay out text themselves.
+
+GDI finds fonts by family name and measures text for us; file writers have to
+do both on their own.  This module finds installed TrueType/OpenType fonts by
+family name, reads the metrics needed to place and wrap text, and falls back
+to the PDF standard fonts (Helvetica, Times, Courier) when a font is missing.
+
+Font heights follow GDI: the height passed to CreateFontW is the height of
+the character cell (ascent + descent), not the em size.
+"""
+
+import os
+import re
+import struct
+import sys
+
+from displaylist import FW_BOLD, FW_NORMAL
+
+FONT_EXTENSIONS = (".ttf", ".otf", ".ttc")
+
+# Runs of spaces and of non-spaces, for word wrapping
+_TOKENS = re.compile(r"\s+|\S+")
+
+# Advance widths of the printable ASCII characters (" " to "~") of the
+# standard fonts, in 1/1000 em.  Other characters use the average width.
+# The bold standard fonts are approximated with the regular widths.
+# fmt: off
+HELVETICA_WIDTHS = (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278,
+    278, 556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584,
+    584, 556, 1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556,
+    833, 722, 778, 667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278,
+    278, 278, 469, 556, 333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222,
+    500, 222, 833, 556, 556, 556, 556, 333, 500, 278, 556, 500, 722, 500, 500,
+    500, 334, 260, 334, 584,
+)
+TIMES_WIDTHS = (
+    250, 333, 408, 500, 500, 833, 778, 180, 333, 333, 500, 564, 250, 333, 250,
+    278, 500, 500, 500, 500, 500, 500, 500, 500, 500, 500, 278, 278, 564, 564,
+    564, 444, 921, 722, 667, 667, 722, 611, 556, 722, 722, 333, 389, 722, 611,
+    889, 722, 722, 556, 722, 667, 556, 611, 722, 722, 944, 722, 722, 611, 333,
+    278, 333, 469, 500, 333, 444, 500, 444, 500, 444, 333, 500, 500, 278, 278,
+    500, 278, 778, 500, 500, 500, 500, 333, 389, 278, 500, 500, 722, 500, 500,
+    444, 480, 200, 480, 541,
+)
+COURIER_WIDTHS = (600,) * 95
+# fmt: on
+
+# Words in a family name that pick the standard font to fall back to
+SERIF_HINTS = (
+    "serif",
+    "times",
+    "roman",
+    "georgia",
+    "garamond",
+    "constantia",
+    "cambria",
+    "caladea",
+    "book",
+    "script",
+    "palatino",
+)
+MONO_HINTS = ("mono", "courier", "consol", "typewriter")
+
+
+class StandardFace:
+    """One of the PDF standard fonts, which need no font file."""
+
+    embeddable = False
+    data = None
+    units_per_em = 1000
+
+    def __init__(self, ps_name, widths, ascent, descent, cap_height, bold):
+        self.ps_name = ps_name
+        self.family = ps_name.split("-")[0]
+        self.bold = bold
+        self._widths = widths
+        self.ascent = ascent
+        self.descent = descent
+        self.cap_height = cap_height
+        self.avg_width = sum(widths) // len(widths)
+        self.bbox = (-200, -descent, 1000, ascent)
+        self.italic_angle = 0
+        self.underline_position = -100
+        self.underline_thickness = 50
+        self.fixed_pitch = widths is COURIER_WIDTHS
+
+    def char_width(self, char):
+        code = ord(char)
+        if 32 <= code <= 126:
+            return self._widths[code - 32]
+        return self.avg_width
+
+
+def standard_face(name, bold=False):
+    """Return the standard font that best stands in for family ``name``."""
+    lname = name.lower()
+    if any(hint in lname for hint in MONO_HINTS):
+        ps_name, widths, metrics = "Courier", COURIER_WIDTHS, (833, 300, 571)
+    elif any(hint in lname for hint in SERIF_HINTS):
+        ps_name, widths, metrics = "Times", TIMES_WIDTHS, (891, 216, 662)
+    else:
+        ps_name, widths, metrics = "Helvetica", HELVETICA_WIDTHS, (905, 212, 718)
+    if ps_name == "Times":
+        ps_name += "-Bold" if bold else "-Roman"
+    elif bold:
+        ps_name += "-Bold"
+    return StandardFace(ps_name, widths, *metrics, bold=bold)
+
+
+class FontError(Exception):
+    pass
+
+
+def _read_table_directory(data, offset):
+    """Return {tag: (offset, length, checksum)} for the sfnt at ``offset``."""
+    (num_tables,) = struct.unpack_from(">H", data, offset + 4)
+    tables = {}
+    for i in range(num_tables):
+        tag, checksum, toffset, length = struct.unpack_from(
+            ">4sIII", data, offset + 12 + 16 * i
+        )
+        tables[tag.decode("latin-1")] = (toffset, length, checksum)
+    return tables
+
+
+def _face_offsets(data):
+    """Return the offsets of the table directories of all faces in a font file."""
+    tag = data[:4]
+    if tag == b"ttcf":
+        (count,) = struct.unpack_from(">I", data, 8)
+        return list(struct.unpack_from(">%iI" % count, data, 12))
+    if tag in (b"\x00\x01\x00\x00", b"OTTO", b"true"):
+        return [0]
+    raise FontError("not a TrueType/OpenType font")
+
+
+def _decode_name(platform, encoding, raw):
+    if platform == 3 or platform == 0:
+        return raw.decode("utf-16-be", errors="replace")
+    if platform == 1 and encoding == 0:
+        return raw.decode("mac-roman", errors="replace")
+    return None
+
+
+def _read_names(data, offset):
+    """Return {name id: string}, preferring US English Windows names."""
+    count, string_offset = struct.unpack_from(">2xHH", data, offset)
+    names = {}
+    priorities = {}
+    for i in range(count):
+        platform, encoding, language, name_id, length, noffset = struct.unpack_from(
+            ">6H", data, offset + 6 + 12 * i
+        )
+        if name_id not in (1, 2, 4, 6, 16, 17):
+            continue
+        priority = (platform == 3, language == 0x409)
+        if name_id in priorities and priorities[name_id] >= priority:
+            continue
+        start = offset + string_offset + noffset
+        value = _decode_name(platform, encoding, data[start : start + length])
+        if value is not None:
+            names[name_id] = value
+            priorities[name_id] = priority
+    return names
+
+
+class TrueTypeFace:
+    """Metrics of one face of an installed TrueType/OpenType font file."""
+
+    def __init__(self, path, index=0):
+        self.path = path
+        self.index = index
+        with open(path, "rb") as f:
+            self.file_data = f.read()
+        data = self.file_data
+        self.offset = _face_offsets(data)[index]
+        self.tables = tables = _read_table_directory(data, self.offset)
+        for tag in ("head", "hhea", "hmtx", "cmap", "name"):
+            if tag not in tables:
+                raise FontError(f"{path}: missing {tag!r} table")
+
+        head = tables["head"][0]
+        (self.units_per_em,) = struct.unpack_from(">H", data, head + 18)
+        self.bbox = struct.unpack_from(">4h", data, head + 36)
+
+        hhea = tables["hhea"][0]
+        ascender, descender = struct.unpack_from(">hh", data, hhea + 4)
+        (num_hmetrics,) = struct.unpack_from(">H", data, hhea + 34)
+        hmtx = tables["hmtx"][0]
+        self._advances = struct.unpack_from(">%s" % ("H2x" * num_hmetrics), data, hmtx)
+
+        names = _read_names(data, tables["name"][0])
+        self.family = names.get(16) or names.get(1) or os.path.basename(path)
+        self.subfamily = names.get(17) or names.get(2) or "Regular"
+        ps_name = names.get(6) or self.family + "-" + self.subfamily
+        self.ps_name = "".join(c for c in ps_name if c.isalnum() or c in "-_")
+
+        # Windows uses the OS/2 win ascent/descent for the character cell
+        self.ascent, self.descent = ascender, -descender
+        self.cap_height = ascender * 7 // 10
+        self.avg_width = self.units_per_em // 2
+        self.weight = FW_NORMAL
+        self.italic = False
+        fs_type = 0
+        if "OS/2" in tables:
+            os2, length, _ = tables["OS/2"]
+            version, avg_width, weight, fs_type = struct.unpack_from(
+                ">HhHxxH", data, os2
+            )
+            (fs_selection,) = struct.unpack_from(">H", data, os2 + 62)
+            win_ascent, win_descent = struct.unpack_from(">HH", data, os2 + 74)
+            if win_ascent + win_descent:
+                self.ascent, self.descent = win_ascent, win_descent
+            if avg_width > 0:
+                self.avg_width = avg_width
+            if version >= 2 and length >= 90:
+                (self.cap_height,) = struct.unpack_from(">h", data, os2 + 88)
+            self.weight = weight
+            self.italic = bool(fs_selection & 1)
+        self.bold = self.weight >= 600 or "bold" in self.subfamily.lower()
+
+        self.italic_angle = 0
+        self.underline_position = -self.units_per_em // 10
+        self.underline_thickness = self.units_per_em // 20
+        self.fixed_pitch = False
+        if "post" in tables:
+            post = tables["post"][0]
+            angle, upos, uthick, fixed = struct.unpack_from(">ihhI", data, post + 4)
+            self.italic_angle = angle / 65536
+            self.underline_position = upos
+            self.underline_thickness = uthick or self.underline_thickness
+            self.fixed_pitch = bool(fixed)
+
+        # Restricted-license fonts (fsType 2) must not be embedded
+        self.embeddable = fs_type & 0x000F != 0x0002
+        self.cff = "CFF " in tables
+        self._cmap = self._read_cmap()
+
+    def _read_cmap(self):
+        data = self.file_data
+        cmap = self.tables["cmap"][0]
+        (count,) = struct.unpack_from(">2xH", data, cmap)
+        subtables = {}
+        for i in range(count):
+            platform, encoding, offset = struct.unpack_from(
+                ">HHI", data, cmap + 4 + 8 * i
+            )
+            subtables[platform, encoding] = cmap + offset
+        for key in ((3, 10), (0, 4), (3, 1), (0, 3), (0, 1), (0, 0), (3, 0)):
+            if key in subtables:
+                offset = subtables[key]
+                break
+        else:
+            raise FontError(f"{self.path}: no Unicode character map")
+        (fmt,) = struct.unpack_from(">H", data, offset)
+        mapping = {}
+        if fmt == 4:
+            (segcount2,) = struct.unpack_from(">H", data, offset + 6)
+            n = segcount2 // 2
+            ends = struct.unpack_from(">%iH" % n, data, offset + 14)
+            starts = struct.unpack_from(">%iH" % n, data, offset + 16 + segcount2)
+            deltas = struct.unpack_from(">%ih" % n, data, offset + 16 + 2 * segcount2)
+            ro_base = offset + 16 + 3 * segcount2
+            range_offsets = struct.unpack_from(">%iH" % n, data, ro_base)
+            for i in range(n):
+                start, end, delta, ro = starts[i], ends[i], deltas[i], range_offsets[i]
+                for code in range(start, min(end, 0xFFFE) + 1):
+                    if ro == 0:
+                        glyph = (code + delta) & 0xFFFF
+                    else:
+                        addr = ro_base + 2 * i + ro + 2 * (code - start)
+                        (glyph,) = struct.unpack_from(">H", data, addr)
+                        if glyph:
+                            glyph = (glyph + delta) & 0xFFFF
+                    if glyph:
+                        mapping[code] = glyph
+        elif fmt == 12:
+            (ngroups,) = struct.unpack_from(">I", data, offset + 12)
+            for i in range(ngroups):
+                start, end, glyph = struct.unpack_from(
+                    ">III", data, offset + 16 + 12 * i
+                )
+                for code in range(start, end + 1):
+                    mapping[code] = glyph + code - start
+        elif fmt == 0:
+            glyphs = struct.unpack_from(">256B", data, offset + 6)
+            mapping = {code: glyph for code, glyph in enumerate(glyphs) if glyph}
+        else:
+            raise FontError(f"{self.path}: unsupported cmap format {fmt}")
+        # Symbol fonts map their characters into the private use area
+        if key == (3, 0):
+            for code, glyph in list(mapping.items()):
+                if 0xF000 <= code <= 0xF0FF:
+                    mapping.setdefault(code - 0xF000, glyph)
+        return mapping
+
+    def glyph_index(self, char):
+        return self._cmap.get(ord(char), 0)
+
+    def glyph_advance(self, glyph):
+        advances = self._advances
+        return advances[glyph] if glyph < len(advances) else advances[-1]
+
+    def char_width(self, char):
+        return self.glyph_advance(self._cmap.get(ord(char), 0))
+
+    def glyph_outline(self, glyph):
+        """Return the contours of a glyph, or None for a font without them.
+
+        Each contour is a list of (x, y, on_curve) points in font units, as
+        in the glyf table; off-curve points are quadratic control points.
+        """
+        if "glyf" not in self.tables or "loca" not in self.tables:
+            return None
+        outlines = self.__dict__.setdefault("_outlines", {})
+        if glyph not in outlines:
+            outlines[glyph] = self._read_outline(glyph, 0)
+        return outlines[glyph]
+
+    def _glyph_data(self, glyph):
+        data = self.file_data
+        (long_offsets,) = struct.unpack_from(">h", data, self.tables["head"][0] + 50)
+        loca = self.tables["loca"][0]
+        if long_offsets:
+            start, end = struct.unpack_from(">II", data, loca + 4 * glyph)
+        else:
+            start, end = struct.unpack_from(">HH", data, loca + 2 * glyph)
+            start, end = start * 2, end * 2
+        glyf = self.tables["glyf"][0]
+        return glyf + start, end - start
+
+    def _read_outline(self, glyph, depth):
+        data = self.file_data
+        offset, length = self._glyph_data(glyph)
+        if length <= 0:
+            return []
+        (num_contours,) = struct.unpack_from(">h", data, offset)
+        offset += 10
+        if num_contours >= 0:
+            ends = struct.unpack_from(">%iH" % num_contours, data, offset)
+            offset += 2 * num_contours
+            (instructions,) = struct.unpack_from(">H", data, offset)
+            offset += 2 + instructions
+            num_points = ends[-1] + 1 if ends else 0
+            flags = []
+            while len(flags) < num_points:
+                flag = data[offset]
+                offset += 1
+                repeat = 1
+                if flag & 8:
+                    repeat += data[offset]
+                    offset += 1
+                flags.extend([flag] * repeat)
+            coordinates = []
+            for short, same in ((2, 16), (4, 32)):
+                value = 0
+                values = []
+                for flag in flags[:num_points]:
+                    if flag & short:
+                        delta = data[offset]
+                        offset += 1
+                        value += delta if flag & same else -delta
+                    elif not flag & same:
+                        (delta,) = struct.unpack_from(">h", data, offset)
+                        offset += 2
+                        value += delta
+                    values.append(value)
+                coordinates.append(values)
+            points = [
+                (x, y, bool(flag & 1))
+                for x, y, flag in zip(coordinates[0], coordinates[1], flags)
+            ]
+            contours = []
+            start = 0
+            for end in ends:
+                contours.append(points[start : end + 1])
+                start = end + 1
+            return contours
+        # A composite glyph, made of transformed other glyphs
+        if depth > 8:
+            raise FontError(f"{self.path}: composite glyph {glyph} nests too deep")
+        contours = []
+        more = True
+        while more:
+            flags, component = struct.unpack_from(">HH", data, offset)
+            offset += 4
+            if flags & 0x0001:
+                dx, dy = struct.unpack_from(">hh", data, offset)
+                offset += 4
+            else:
+                dx, dy = struct.unpack_from(">bb", data, offset)
+                offset += 2
+            if not flags & 0x0002:
+                dx = dy = 0  # Point matching; rare and not worth supporting
+            a, b, c, d = 1.0, 0.0, 0.0, 1.0
+            if flags & 0x0008:
+                (a,) = struct.unpack_from(">h", data, offset)
+                a = d = a / 16384
+                offset += 2
+            elif flags & 0x0040:
+                a, d = (v / 16384 for v in struct.unpack_from(">hh", data, offset))
+                offset += 4
+            elif flags & 0x0080:
+                a, b, c, d = (
+                    v / 16384 for v in struct.unpack_from(">4h", data, offset)
+                )
+                offset += 8
+            for contour in self._read_outline(component, depth + 1):
+                contours.append(
+                    [
+                        (a * x + c * y + dx, b * x + d * y + dy, on)
+                        for x, y, on in contour
+                    ]
+                )
+            more = flags & 0x0020
+        return contours
+
+    @property
+    def data(self):
+        """The font program of this face as a standalone font file."""
+        if self.offset == 0 and self.file_data[:4] != b"ttcf":
+            return self.file_data
+        # Copy the face's tables out of the font collection
+        tables = sorted(self.tables.items())
+        num_tables = len(tables)
+        search_range = 16
+        entry_selector = 0
+        while search_range * 2 <= num_tables * 16:
+            search_range *= 2
+            entry_selector += 1
+        header = self.file_data[self.offset : self.offset + 4] + struct.pack(
+            ">4H",
+            num_tables,
+            search_range,
+            entry_selector,
+            num_tables * 16 - search_range,
+        )
+        directory = []
+        body = []
+        offset = 12 + 16 * num_tables
+        for tag, (toffset, length, checksum) in tables:
+            table = self.file_data[toffset : toffset + length]
+            table += b"\0" * (-length % 4)
+            directory.append(
+                struct.pack(">4sIII", tag.encode("latin-1"), checksum, offset, length)
+            )
+            body.append(table)
+            offset += len(table)
+        return header + b"".join(directory) + b"".join(body)
+
+
+def font_directories():
+    """Return the directories to search for installed fonts."""
+    dirs = []
+    if sys.platform == "win32":
+        windir = os.environ.get("WINDIR", r"C:\Windows")
+        dirs.append(os.path.join(windir, "Fonts"))
+        localappdata = os.environ.get("LOCALAPPDATA")
+        if localappdata:
+            dirs.append(os.path.join(localappdata, "Microsoft", "Windows", "Fonts"))
+    elif sys.platform == "darwin":
+        dirs += [
+            "/System/Library/Fonts",
+            "/Library/Fonts",
+            os.path.expanduser("~/Library/Fonts"),
+        ]
+    else:
+        dirs += [
+            "/usr/share/fonts",
+            "/usr/local/share/fonts",
+            os.path.expanduser("~/.fonts"),
+            os.path.expanduser("~/.local/share/fonts"),
+        ]
+    extra = os.environ.get("CALENDAR_FONT_PATH")
+    if extra:
+        dirs = extra.split(os.pathsep) + dirs
+    return [d for d in dirs if os.path.isdir(d)]
+
+
+def _scan_font_file(path):
+    """Yield (family, index, weight, italic) for each face in a font file."""
+    with open(path, "rb") as f:
+        data = f.read(65536)
+        offsets = _face_offsets(data)
+        for index, offset in enumerate(offsets):
+            # The tables we need are usually near the start of the file, but
+            # read them from wherever they are
+            f.seek(offset)
+            head = f.read(12)
+            (num_tables,) = struct.unpack_from(">H", head, 4)
+            directory = head + f.read(16 * num_tables)
+            tables = _read_table_directory(directory, 0)
+            if "name" not in tables:
+                continue
+            f.seek(tables["name"][0])
+            names = _read_names(f.read(tables["name"][1]), 0)
+            weight, italic = FW_NORMAL, False
+            if "OS/2" in tables:
+                f.seek(tables["OS/2"][0])
+                os2 = f.read(64)
+                if len(os2) >= 64:
+                    (weight,) = struct.unpack_from(">H", os2, 4)
+                    (fs_selection,) = struct.unpack_from(">H", os2, 62)
+                    italic = bool(fs_selection & 1)
+            subfamily = (names.get(17) or names.get(2) or "").lower()
+            if "bold" in subfamily:
+                weight = max(weight, FW_BOLD)
+            italic = italic or "italic" in subfamily or "oblique" in subfamily
+            for name_id in (1, 4, 16):
+                if name_id in names:
+                    yield names[name_id], index, weight, italic
+
+
+_font_index = None
+
+
+def font_index():
+    """Return {lowercase family name: [(path, index, weight, italic), ...]}."""
+    global _font_index
+    if _font_index is None:
+        index = {}
+        for directory in font_directories():
+            for root, _, files in os.walk(directory):
+                for filename in files:
+                    if not filename.lower().endswith(FONT_EXTENSIONS):
+                        continue
+                    path = os.path.join(root, filename)
+                    try:
+                        faces = set(_scan_font_file(path))
+                    except (OSError, FontError, struct.error):
+                        continue
+                    for family, face, weight, italic in faces:
+                        index.setdefault(family.lower(), []).append(
+                            (path, face, weight, italic)
+                        )
+        _font_index = index
+    return _font_index
+
+
+_faces = {}
+_warned = set()
+
+
+def find_face(name, bold=False):
+    """Return the installed face of family ``name`` closest to the weight.
+
+    Falls back to a standard font, with a warning, if the family is not
+    installed.  The returned face's ``bold`` attribute tells whether bold
+    still has to be synthesized.
+    """
+    key = (name.lower(), bold)
+    if key in _faces:
+        return _faces[key]
+    target = FW_BOLD if bold else FW_NORMAL
+    candidates = sorted(
+        font_index().get(name.lower(), ()),
+        key=lambda c: (c[3], abs(c[2] - target), c[0], c[1]),
+    )
+    face = None
+    for path, index, weight, italic in candidates:
+        try:
+            face = TrueTypeFace(path, index)
+            break
+        except (OSError, FontError, struct.error) as e:
+            print(f"Warning: cannot read font {path}: {e}")
+    if face is None:
+        face = standard_face(name, bold)
+        if name.lower() not in _warned:
+            _warned.add(name.lower())
+            print(f"Warning: font {name!r} not found; using {face.family}")
+    _faces[key] = face
+    return face
+
+
+def face_key(face):
+    """Return what identifies a face: (PostScript name, font file, index)."""
+    return (face.ps_name, getattr(face, "path", None), getattr(face, "index", 0))
+
+
+class ScaledFont:
+    """A Font (from a display list) at its size in a face."""
+
+    def __init__(self, font, face):
+        self.font = font
+        self.face = face
+        # GDI font heights are character cell heights, not em sizes
+        self.size = font.height * face.units_per_em / (face.ascent + face.descent)
+        self.scale = self.size / face.units_per_em
+        self.ascent = face.ascent * self.scale
+        self.hscale = 1.0
+        if font.width:
+            self.hscale = font.width / (face.avg_width * self.scale)
+        self.synthetic_bold = font.weight >= FW_BOLD and not face.bold
+
+    def measure(self, text):
+        """Return the width of ``text`` in mils."""
+        char_width = self.face.char_width
+        return sum(char_width(c) for c in text) * self.scale * self.hscale
+
+
+def wrap_text(text, width, measure):
+    """Break ``text`` into lines no wider than ``width`` like DT_WORDBREAK.
+
+    Lines break at newlines and between words; a single word wider than
+    ``width`` is left unbroken.  Spaces at a line break are dropped, while
+    runs of spaces inside a line are kept (calendar.ini quotes use them to
+    force breaks).  ``measure`` returns the width of a string.
+    """
+    lines = []
+    for paragraph in text.replace("\r\n", "\n").split("\n"):
+        line = ""
+        spaces = ""
+        for token in _TOKENS.findall(paragraph):
+            if token.isspace():
+                spaces += token
+                continue
+            candidate = line + spaces + token
+            if line and measure(candidate) > width:
+                lines.append(line)
+                line = token
+            else:
+                line = candidate
+            spaces = ""
+        lines.append(line)
+    return lines
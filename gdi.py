@@ -0,0 +1,676 @@
+"""Windows GDI printing backend.
+
+Replays display lists (see displaylist.py) onto a printer device context
+through the Win32 GDI and GDI+ APIs.
+"""
+
+import ctypes
+import functools
+from ctypes import (
+    Structure,
+    byref,
+    c_int,
+    c_short,
+    c_uint,
+    c_ulong,
+    c_ushort,
+    c_void_p,
+    c_wchar,
+    c_wchar_p,
+    sizeof,
+    wintypes,
+)
+
+from displaylist import ALIGN_CENTER, FW_NORMAL
+from imagecache import ImageCache
+
+
+@functools.lru_cache(maxsize=None)
+def _dll(name):
+    """Return the Windows DLL ``name``, loading it the first time it is used.
+
+    Nothing is loaded on import, so this module can be imported anywhere
+    (elsewhere DC needs to be given substitutes for the DLLs).
+    """
+    try:
+        return ctypes.WinDLL(name)
+    except AttributeError:
+        raise OSError(f"{name}.dll is only available on Windows") from None
+
+
+# Windows constants
+DM_ORIENTATION = 0x00000001
+DM_PAPERSIZE = 0x00000002
+DM_PAPERLENGTH = 0x00000004
+DM_PAPERWIDTH = 0x00000008
+DMORIENT_PORTRAIT = 1
+DMORIENT_LANDSCAPE = 2
+MM_HIENGLISH = 5
+TRANSPARENT = 1
+OPAQUE = 2
+
+# Paper size constants
+DMPAPER_LETTER = 1  # 8.5 x 11 inches
+DMPAPER_LEGAL = 5  # 8.5 x 14 inches
+DMPAPER_TABLOID = 3  # 11 x 17 inches
+DMPAPER_LEDGER = 4  # 17 x 11 inches
+DMPAPER_A3 = 8  # 297 x 420 mm
+DMPAPER_A4 = 9  # 210 x 297 mm
+DMPAPER_A5 = 11  # 148 x 210 mm
+
+# DrawText flags
+DT_LEFT = 0x00000000
+DT_CENTER = 0x00000001
+DT_NOCLIP = 0x00000100
+DT_WORDBREAK = 0x00000010
+DT_NOPREFIX = 0x00000800
+
+# How many fonts, pens and brushes a DC keeps before deleting unused ones;
+# long documents with many fitted font sizes would otherwise run out of GDI
+# handles (10000 per process)
+MAX_OBJECTS = 256
+
+# Pen styles
+PS_SOLID = 0
+
+# Brush styles
+BS_SOLID = 0
+
+# Raster operations
+SRCCOPY = 0x00CC0020
+
+# DIB constants
+BI_RGB = 0
+DIB_RGB_COLORS = 0
+
+# GDI+ constants
+ImageLockModeRead = 1
+PixelFormat24bppRGB = 0x00021808
+
+# GDI object types
+OBJ_PEN = 1
+OBJ_BRUSH = 2
+OBJ_FONT = 3
+
+
+# Structures
+class RECT(Structure):
+    _fields_ = [
+        ("left", wintypes.LONG),
+        ("top", wintypes.LONG),
+        ("right", wintypes.LONG),
+        ("bottom", wintypes.LONG),
+    ]
+
+
+class DOCINFO(Structure):
+    _fields_ = [
+        ("cbSize", c_int),
+        ("lpszDocName", c_wchar_p),
+        ("lpszOutput", c_wchar_p),
+        ("lpszDatatype", c_wchar_p),
+        ("fwType", wintypes.DWORD),
+    ]
+
+
+class DEVMODE(Structure):
+    _fields_ = [
+        ("dmDeviceName", c_wchar * 32),
+        ("dmSpecVersion", c_ushort),
+        ("dmDriverVersion", c_ushort),
+        ("dmSize", c_ushort),
+        ("dmDriverExtra", c_ushort),
+        ("dmFields", c_ulong),
+        ("dmOrientation", c_short),
+        ("dmPaperSize", c_short),
+        ("dmPaperLength", c_short),
+        ("dmPaperWidth", c_short),
+        ("dmScale", c_short),
+        ("dmCopies", c_short),
+        ("dmDefaultSource", c_short),
+        ("dmPrintQuality", c_short),
+        ("dmColor", c_short),
+        ("dmDuplex", c_short),
+        ("dmYResolution", c_short),
+        ("dmTTOption", c_short),
+        ("dmCollate", c_short),
+        ("dmFormName", c_wchar * 32),
+        ("dmLogPixels", c_ushort),
+        ("dmBitsPerPel", c_ulong),
+        ("dmPelsWidth", c_ulong),
+        ("dmPelsHeight", c_ulong),
+        ("dmDisplayFlags", c_ulong),
+        ("dmDisplayFrequency", c_ulong),
+        ("dmICMMethod", c_ulong),
+        ("dmICMIntent", c_ulong),
+        ("dmMediaType", c_ulong),
+        ("dmDitherType", c_ulong),
+        ("dmReserved1", c_ulong),
+        ("dmReserved2", c_ulong),
+        ("dmPanningWidth", c_ulong),
+        ("dmPanningHeight", c_ulong),
+        ("dmICMFlags", c_ulong),
+        ("dmNup", c_ulong),
+        ("dmDisplayOrientation", c_ulong),
+        ("dmDisplayFixedOutput", c_ulong),
+    ]
+
+
+class BITMAPINFOHEADER(Structure):
+    _fields_ = [
+        ("biSize", wintypes.DWORD),
+        ("biWidth", wintypes.LONG),
+        ("biHeight", wintypes.LONG),
+        ("biPlanes", wintypes.WORD),
+        ("biBitCount", wintypes.WORD),
+        ("biCompression", wintypes.DWORD),
+        ("biSizeImage", wintypes.DWORD),
+        ("biXPelsPerMeter", wintypes.LONG),
+        ("biYPelsPerMeter", wintypes.LONG),
+        ("biClrUsed", wintypes.DWORD),
+        ("biClrImportant", wintypes.DWORD),
+    ]
+
+
+class GpRect(Structure):
+    _fields_ = [
+        ("X", c_int),
+        ("Y", c_int),
+        ("Width", c_int),
+        ("Height", c_int),
+    ]
+
+
+class BitmapData(Structure):
+    _fields_ = [
+        ("Width", c_uint),
+        ("Height", c_uint),
+        ("Stride", c_int),
+        ("PixelFormat", c_int),
+        ("Scan0", c_void_p),
+        ("Reserved", c_void_p),
+    ]
+
+
+class GdiplusStartupInput(Structure):
+    _fields_ = [
+        ("GdiplusVersion", c_uint),
+        ("DebugEventCallback", c_void_p),
+        ("SuppressBackgroundThread", wintypes.BOOL),
+        ("SuppressExternalCodecs", wintypes.BOOL),
+    ]
+
+
+class DC:
+    """A device context.
+
+    Fonts, pens and brushes are created once per distinct set of parameters
+    and kept until Delete() (or until more than MAX_OBJECTS are kept, when
+    the ones not selected are deleted), and selecting the object or text color that is
+    already current is skipped.  The gdi32/user32 libraries can be passed in
+    (e.g. fakes for testing); they default to the Windows DLLs.
+    """
+
+    def __init__(self, hdc, gdi32=None, user32=None):
+        self.hdc = hdc
+        self.gdi32 = gdi32 if gdi32 is not None else _dll("gdi32")
+        self.user32 = user32 if user32 is not None else _dll("user32")
+        # (object type, parameters...) -> handle
+        self._objects = {}
+        # object type -> currently selected handle, and the DC's original one
+        self._selected = {}
+        self._original = {}
+        self._text_color = None
+        self.created = {OBJ_FONT: 0, OBJ_PEN: 0, OBJ_BRUSH: 0}
+
+    @staticmethod
+    def Create(driver, device, devmode=None, gdi32=None, user32=None):
+        dc = DC(None, gdi32, user32)
+        dc.hdc = dc.gdi32.CreateDCW(driver, device, None, devmode)
+        if not dc.hdc:
+            raise ctypes.WinError()
+        return dc
+
+    @staticmethod
+    def CreateCompatible(hdc, gdi32=None, user32=None):
+        dc = DC(None, gdi32, user32)
+        dc.hdc = dc.gdi32.CreateCompatibleDC(hdc)
+        if not dc.hdc:
+            raise ctypes.WinError()
+        return dc
+
+    def SetMapMode(self, mode):
+        self.gdi32.SetMapMode(self.hdc, mode)
+
+    def StartDoc(self, doc_name):
+        di = DOCINFO()
+        di.cbSize = sizeof(DOCINFO)
+        di.lpszDocName = doc_name
+        di.lpszOutput = None
+        di.lpszDatatype = None
+        di.fwType = 0
+        result = self.gdi32.StartDocW(self.hdc, byref(di))
+        if result <= 0:
+            raise ctypes.WinError()
+
+    def EndDoc(self):
+        self.gdi32.EndDoc(self.hdc)
+
+    def AbortDoc(self):
+        self.gdi32.AbortDoc(self.hdc)
+
+    def StartPage(self):
+        self.gdi32.StartPage(self.hdc)
+
+    def EndPage(self):
+        self.gdi32.EndPage(self.hdc)
+
+    def SetBkMode(self, transparent=False):
+        self.gdi32.SetBkMode(self.hdc, TRANSPARENT if transparent else OPAQUE)
+
+    def SetTextColor(self, color):
+        if color != self._text_color:
+            self.gdi32.SetTextColor(self.hdc, color)
+            self._text_color = color
+
+    def DrawText(self, left, top, right, bottom, text, flags):
+        rect = RECT(left, top, right, bottom)
+        self.user32.DrawTextW(self.hdc, text, -1, byref(rect), flags)
+
+    def DrawText2(self, left, top, width, height, text, flags):
+        rect = RECT(left, top, left + width, top + height)
+        self.user32.DrawTextW(self.hdc, text, -1, byref(rect), flags)
+
+    def _select_cached(self, objtype, key, create):
+        """Select the object for ``key``, creating it with ``create()`` once."""
+        handle = self._objects.get(key)
+        if handle is None:
+            if len(self._objects) >= MAX_OBJECTS:
+                self._delete_unselected()
+            handle = create()
+            if not handle:
+                raise ctypes.WinError()
+            self._objects[key] = handle
+            self.created[objtype] += 1
+        if self._selected.get(objtype) != handle:
+            old = self.gdi32.SelectObject(self.hdc, handle)
+            self._original.setdefault(objtype, old)
+            self._selected[objtype] = handle
+        return handle
+
+    def _delete_unselected(self):
+        selected = set(self._selected.values())
+        for key, handle in list(self._objects.items()):
+            if handle not in selected:
+                self.gdi32.DeleteObject(handle)
+                del self._objects[key]
+
+    def SetFont(self, name, height, width=0, underline=False, weight=FW_NORMAL):
+        return self._select_cached(
+            OBJ_FONT,
+            (OBJ_FONT, name, height, width, underline, weight),
+            lambda: self.gdi32.CreateFontW(
+                height,
+                width,
+                0,  # escapement
+                0,  # orientation
+                weight,
+                0,  # italic
+                1 if underline else 0,
+                0,  # strikeout
+                1,  # charset (DEFAULT_CHARSET)
+                0,  # output precision
+                0,  # clip precision
+                0,  # quality
+                0,  # pitch and family
+                name,
+            ),
+        )
+
+    def SetPen(self, width, color):
+        return self._select_cached(
+            OBJ_PEN,
+            (OBJ_PEN, width, color),
+            lambda: self.gdi32.CreatePen(PS_SOLID, width, color),
+        )
+
+    def SetBrush(self, color):
+        return self._select_cached(
+            OBJ_BRUSH,
+            (OBJ_BRUSH, color),
+            lambda: self.gdi32.CreateSolidBrush(color),
+        )
+
+    def Rectangle(self, left, top, right, bottom):
+        self.gdi32.Rectangle(self.hdc, left, top, right, bottom)
+
+    def MoveTo(self, x, y):
+        self.gdi32.MoveToEx(self.hdc, x, y, None)
+
+    def LineTo(self, x, y):
+        self.gdi32.LineTo(self.hdc, x, y)
+
+    def SelectObject(self, obj):
+        if isinstance(obj, int):
+            obj = c_void_p(obj)
+        old = self.gdi32.SelectObject(self.hdc, obj)
+        if not old:
+            raise ctypes.WinError()
+        return old
+
+    def GetClipBox(self):
+        rect = RECT()
+        self.gdi32.GetClipBox(self.hdc, byref(rect))
+        return (rect.left, rect.top, rect.right, rect.bottom)
+
+    def StretchBlt(
+        self, x, y, width, height, src_dc, src_x, src_y, src_width, src_height, rop
+    ):
+        self.gdi32.StretchBlt(
+            self.hdc,
+            x,
+            y,
+            width,
+            height,
+            src_dc,
+            src_x,
+            src_y,
+            src_width,
+            src_height,
+            rop,
+        )
+
+    def StretchDIBits(self, x, y, width, height, src_width, src_height, bits, rop):
+        """Paint 24-bit top-down BGR pixel rows (DWORD-aligned) onto the DC."""
+        header = BITMAPINFOHEADER()
+        header.biSize = sizeof(BITMAPINFOHEADER)
+        header.biWidth = src_width
+        header.biHeight = -src_height  # Top-down
+        header.biPlanes = 1
+        header.biBitCount = 24
+        header.biCompression = BI_RGB
+        self.gdi32.StretchDIBits(
+            self.hdc,
+            x,
+            y,
+            width,
+            height,
+            0,
+            0,
+            src_width,
+            src_height,
+            bits,
+            byref(header),
+            DIB_RGB_COLORS,
+            rop,
+        )
+
+    def Delete(self):
+        if self.hdc:
+            # Objects can't be deleted while selected into the DC
+            for old in self._original.values():
+                if old:
+                    self.gdi32.SelectObject(self.hdc, old)
+            for handle in self._objects.values():
+                self.gdi32.DeleteObject(handle)
+            self._objects.clear()
+            self._selected.clear()
+            self._original.clear()
+            self.gdi32.DeleteDC(self.hdc)
+            self.hdc = None
+
+
+def gdiplus_startup():
+    gdiplustartupinput = GdiplusStartupInput()
+    gdiplustartupinput.GdiplusVersion = 1
+    gdiplustartupinput.DebugEventCallback = None
+    gdiplustartupinput.SuppressBackgroundThread = False
+    gdiplustartupinput.SuppressExternalCodecs = False
+
+    token = c_void_p()
+    status = _dll("gdiplus").GdiplusStartup(
+        byref(token), byref(gdiplustartupinput), None
+    )
+    if status != 0:
+        raise RuntimeError(f"GdiplusStartup failed with status {status}")
+    return token
+
+
+def gdiplus_shutdown(token):
+    _dll("gdiplus").GdiplusShutdown(token)
+
+
+class Bitmap:
+    def __init__(self, gpbitmap):
+        self.gpbitmap = gpbitmap
+        self.gdiplus = _dll("gdiplus")
+
+    @staticmethod
+    def FromFile(filename):
+        gdiplus = _dll("gdiplus")
+        gpbitmap = c_void_p()
+        status = gdiplus.GdipCreateBitmapFromFile(filename, byref(gpbitmap))
+        if status != 0:
+            raise RuntimeError(f"GdipCreateBitmapFromFile failed with status {status}")
+        return Bitmap(gpbitmap)
+
+    def GetHBITMAP(self):
+        hbitmap = c_void_p()
+        status = self.gdiplus.GdipCreateHBITMAPFromBitmap(
+            self.gpbitmap, byref(hbitmap), 0
+        )
+        if status != 0:
+            raise RuntimeError(
+                f"GdipCreateHBITMAPFromBitmap failed with status {status}"
+            )
+        return hbitmap.value
+
+    def GetPixels(self):
+        """Return (width, height, RGB bytes) of the bitmap."""
+        width, height = c_uint(), c_uint()
+        self.gdiplus.GdipGetImageWidth(self.gpbitmap, byref(width))
+        self.gdiplus.GdipGetImageHeight(self.gpbitmap, byref(height))
+        rect = GpRect(0, 0, width.value, height.value)
+        data = BitmapData()
+        status = self.gdiplus.GdipBitmapLockBits(
+            self.gpbitmap,
+            byref(rect),
+            ImageLockModeRead,
+            PixelFormat24bppRGB,
+            byref(data),
+        )
+        if status != 0:
+            raise RuntimeError(f"GdipBitmapLockBits failed with status {status}")
+        try:
+            row_bytes = data.Width * 3
+            rows = []
+            for y in range(data.Height):
+                rows.append(ctypes.string_at(data.Scan0 + y * data.Stride, row_bytes))
+        finally:
+            self.gdiplus.GdipBitmapUnlockBits(self.gpbitmap, byref(data))
+        # GDI+ 24bpp pixels are stored in BGR order
+        pixels = bytearray(b"".join(rows))
+        pixels[0::3], pixels[2::3] = pixels[2::3], pixels[0::3]
+        return data.Width, data.Height, bytes(pixels)
+
+    def Dispose(self):
+        if self.gpbitmap:
+            self.gdiplus.GdipDisposeImage(self.gpbitmap)
+            self.gpbitmap = None
+
+
+def decode_image_gdiplus(path):
+    """Decode a picture file with GDI+, returning (width, height, RGB bytes)."""
+    token = gdiplus_startup()
+    try:
+        bitmap = Bitmap.FromFile(path)
+        try:
+            return bitmap.GetPixels()
+        finally:
+            bitmap.Dispose()
+    finally:
+        gdiplus_shutdown(token)
+
+
+def dib_rows(image):
+    """Return the pixels of a CachedImage as DWORD-aligned BGR rows."""
+    pixels = bytearray(image.pixels())
+    pixels[0::3], pixels[2::3] = pixels[2::3], pixels[0::3]
+    row_bytes = image.width * 3
+    padding = -row_bytes % 4
+    if not padding:
+        return bytes(pixels)
+    pad = b"\0" * padding
+    return b"".join(
+        pixels[y * row_bytes : (y + 1) * row_bytes] + pad for y in range(image.height)
+    )
+
+
+# Paper size codes for the standard paper sizes in compose.PAPER_SIZES
+PAPER_CODES = {
+    "LETTER": DMPAPER_LETTER,
+    "LEGAL": DMPAPER_LEGAL,
+    "TABLOID": DMPAPER_TABLOID,
+    "LEDGER": DMPAPER_LEDGER,
+    "A3": DMPAPER_A3,
+    "A4": DMPAPER_A4,
+    "A5": DMPAPER_A5,
+}
+
+
+def make_devmode(setup):
+    dm = DEVMODE()
+    dm.dmSize = sizeof(DEVMODE)
+    dm.dmFields = DM_ORIENTATION
+    if setup.paper is not None and setup.media_size == setup.size:
+        dm.dmOrientation = DMORIENT_LANDSCAPE if setup.landscape else DMORIENT_PORTRAIT
+        dm.dmFields |= DM_PAPERSIZE
+        dm.dmPaperSize = PAPER_CODES[setup.paper]
+    else:
+        # A custom paper size, which also makes room for the bleed and crop
+        # marks and for two pages side by side
+        width, height = setup.media_size
+        dm.dmOrientation = DMORIENT_LANDSCAPE if width > height else DMORIENT_PORTRAIT
+        dm.dmFields |= DM_PAPERLENGTH | DM_PAPERWIDTH
+        dm.dmPaperSize = 0  # Custom paper size
+        # In tenths of a millimeter
+        dm.dmPaperWidth = int(min(width, height) * 0.254)
+        dm.dmPaperLength = int(max(width, height) * 0.254)
+    return dm
+
+
+class GDIRenderer:
+    """Display list backend printing to a Windows printer."""
+
+    def __init__(self, printer, setup, images, gdi32=None, user32=None):
+        self.printer = printer
+        self.setup = setup
+        self.images = images
+        self.gdi32 = gdi32
+        self.user32 = user32
+        self.dc = None
+        self.pageno = 0
+        self.image_bytes = 0
+
+    @classmethod
+    def from_config(cls, cfg, setup, output=None, pages=None):
+        """Return the GDIRenderer set up in calendar.ini; see backends.py.
+
+        ``output`` is the name of the printer to use instead of the
+        configured one.
+        """
+        if output is None:
+            output = cfg.get("General", "Printer", fallback="Microsoft Print to PDF")
+        print(f"Using printer: {output}")
+        return cls(output, setup, ImageCache.from_config(cfg))
+
+    def start_document(self, title):
+        dm = make_devmode(self.setup)
+        self.dc = DC.Create(
+            "WINSPOOL", self.printer, byref(dm), self.gdi32, self.user32
+        )
+        self.dc.SetMapMode(MM_HIENGLISH)
+        self.dc.StartDoc(title)
+        self.dc.SetBkMode(transparent=True)
+
+    def trace_counters(self):
+        """Running totals for tracing.py."""
+        created = self.dc.created if self.dc is not None else {}
+        return {
+            "fonts_created": created.get(OBJ_FONT, 0),
+            "pens_created": created.get(OBJ_PEN, 0),
+            "brushes_created": created.get(OBJ_BRUSH, 0),
+            "image_bytes": self.image_bytes,
+            "image_cache_misses": self.images.misses,
+        }
+
+    def end_document(self):
+        print("Outputting...")
+        self.dc.EndDoc()
+        self.dc.Delete()
+        self.dc = None
+
+    def abort_document(self):
+        """Cancel the print job; see displaylist.document()."""
+        if self.dc is None:
+            return
+        self.dc.AbortDoc()
+        self.dc.Delete()
+        self.dc = None
+
+    def start_page(self, width, height):
+        self.dc.StartPage()
+        self.pageno += 1
+        print("Printing page", self.pageno)
+
+    def end_page(self):
+        self.dc.EndPage()
+
+    def set_font(self, font):
+        self.dc.SetFont(
+            name=font.name,
+            height=font.height,
+            width=font.width,
+            underline=font.underline,
+            weight=font.weight,
+        )
+
+    def set_text_color(self, color):
+        self.dc.SetTextColor(color)
+
+    def set_pen(self, width, color):
+        self.dc.SetPen(width=width, color=color)
+
+    def set_brush(self, color):
+        self.dc.SetBrush(color=color)
+
+    # MM_HIENGLISH has Y increasing upwards, so all Y coordinates are negated.
+
+    def text(self, left, top, right, bottom, text, align, clip):
+        flags = DT_CENTER if align == ALIGN_CENTER else DT_LEFT
+        flags |= DT_WORDBREAK | DT_NOPREFIX
+        if not clip:
+            flags |= DT_NOCLIP
+        self.dc.DrawText(left, -top, right, -bottom, text, flags)
+
+    def rectangle(self, left, top, right, bottom):
+        self.dc.Rectangle(left, -top, right, -bottom)
+
+    def line(self, x1, y1, x2, y2):
+        self.dc.MoveTo(x1, -y1)
+        self.dc.LineTo(x2, -y2)
+
+    def image(self, left, top, right, bottom, path):
+        image = self.images.get(path, right - left, bottom - top)
+        rows = dib_rows(image)
+        self.image_bytes += len(rows)
+        self.dc.StretchDIBits(
+            left,
+            -top,
+            right - left,
+            -(bottom - top),
+            image.width,
+            image.height,
+            rows,
+            SRCCOPY,
+        )
@@ -0,0 +1,111 @@
+"""Geometry of the day grids of the month pages.
+
+month_grids() works out, for every month of a year, which column the first
+day falls in, how many week rows the month needs and where each day's cell
+is, for a given first day of the week and grid area.  The result only
+depends on those arguments and is remembered, so it is computed once per
+year however many calendars are made.
+
+Weekdays are numbered like datetime.date.weekday(): Monday = 0 ... Sunday = 6.
+Coordinates are in mils from the top left of the page.
+"""
+
+import datetime
+import functools
+from collections import namedtuple
+
+MONDAY = 0
+SUNDAY = 6
+
+# Most week rows any month can need
+MAX_ROWS = 6
+
+
+class Cell(namedtuple("Cell", "day column row left top right bottom")):
+    __slots__ = ()
+
+
+class MonthGrid(
+    namedtuple(
+        "MonthGrid",
+        "year month first_column days rows left top cell_width cell_height"
+        " cells lines",
+    )
+):
+    """The day cells of one month.
+
+    ``cells`` has one Cell per day, in order; ``lines`` are the (x1, y1, x2,
+    y2) lines of the grid, including its outline.
+    """
+
+    __slots__ = ()
+
+    def date(self, cell):
+        return datetime.date(self.year, self.month, cell.day)
+
+
+def days_in_month(year, month):
+    if month == 12:
+        return 31
+    return (datetime.date(year, month + 1, 1) - datetime.date(year, month, 1)).days
+
+
+def rows_needed(first_column, days):
+    return (first_column + days + 6) // 7
+
+
+def _month_grid(year, month, week_start, box, fit_rows):
+    left, top, right, bottom = box
+    first_column = (datetime.date(year, month, 1).weekday() - week_start) % 7
+    days = days_in_month(year, month)
+    rows = rows_needed(first_column, days)
+    # Without fit_rows, every month has room for six rows, as printed
+    # calendars usually do; with it, the rows the month has fill the grid
+    grid_rows = rows if fit_rows else MAX_ROWS
+    cell_width = (right - left) // 7
+    cell_height = (bottom - top) // grid_rows
+    cells = []
+    for index in range(days):
+        row, column = divmod(first_column + index, 7)
+        x = left + column * cell_width
+        y = top + row * cell_height
+        cells.append(
+            Cell(index + 1, column, row, x, y, x + cell_width, y + cell_height)
+        )
+    grid_right = left + cell_width * 7
+    grid_bottom = top + cell_height * grid_rows
+    lines = tuple(
+        (x, top, x, grid_bottom) for x in range(left, grid_right + 1, cell_width)
+    ) + tuple(
+        (left, y, grid_right, y) for y in range(top, grid_bottom + 1, cell_height)
+    )
+    return MonthGrid(
+        year,
+        month,
+        first_column,
+        days,
+        rows,
+        left,
+        top,
+        cell_width,
+        cell_height,
+        tuple(cells),
+        lines,
+    )
+
+
+@functools.lru_cache(maxsize=64)
+def month_grids(year, week_start=SUNDAY, box=(0, 0, 7000, 6000), fit_rows=False):
+    """Return the MonthGrids of the twelve months of ``year``.
+
+    ``box`` is the (left, top, right, bottom) tuple of the grid area on the
+    page (a tuple, as the grids are cached by their arguments).
+    """
+    return tuple(
+        _month_grid(year, month, week_start, box, fit_rows) for month in range(1, 13)
+    )
+
+
+def month_grid(year, month, week_start=SUNDAY, box=(0, 0, 7000, 6000), fit_rows=False):
+    """Return the MonthGrid of one month; see month_grids()."""
+    return month_grids(year, week_start, tuple(box), fit_rows)[month - 1]
@@ -0,0 +1,178 @@
+"""Decoded, resampled pictures, cached on disk.
+
+Decoding a multi-megapixel JPEG and scaling it down is the slowest part of
+making a calendar, and the result only depends on the picture's content, the
+size of the box it is drawn in and the output resolution.  ImageCache keeps
+the resampled pixels, keyed by exactly those, in a FileCache so that repeat
+runs (and batch jobs sharing pictures) never decode the same picture twice.
+
+Pixels are 8-bit RGB, top row first, stored zlib-compressed so that the PDF
+writer can embed them as they are.
+"""
+
+import hashlib
+import os
+import struct
+import sys
+import zlib
+from collections import OrderedDict, namedtuple
+
+from filecache import MEGABYTE, FileCache, default_cache_dir, make_key
+
+# Header of cache entries: magic, width, height
+_HEADER = struct.Struct(">4sII")
+_MAGIC = b"RGB8"
+
+# How many recently used pictures to also keep in memory
+MEMORY_ITEMS = 4
+
+
+class CachedImage(namedtuple("CachedImage", "width height flate")):
+    """RGB pixels; ``flate`` is the zlib-compressed pixel data."""
+
+    __slots__ = ()
+
+    def pixels(self):
+        return zlib.decompress(self.flate)
+
+
+# How many file hashes to remember
+FILE_HASHES = 4096
+
+_file_hashes = OrderedDict()
+
+
+def file_hash(path):
+    """Return the SHA-256 of a file's content, remembered while it is unchanged."""
+    st = os.stat(path)
+    key = (os.path.realpath(path), st.st_size, st.st_mtime_ns)
+    digest = _file_hashes.get(key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(MEGABYTE), b""):
+                h.update(block)
+        digest = _file_hashes[key] = h.hexdigest()
+        if len(_file_hashes) > FILE_HASHES:
+            _file_hashes.popitem(last=False)
+    return digest
+
+
+def target_size(box_width, box_height, dpi):
+    """Return the pixel size of a box (in mils) at ``dpi``."""
+    return (
+        max(1, round(box_width * dpi / 1000)),
+        max(1, round(box_height * dpi / 1000)),
+    )
+
+
+def _decode_pillow(path, size):
+    from PIL import Image
+
+    with Image.open(path) as img:
+        # Let the JPEG decoder scale down by up to 8x while decoding
+        img.draft("RGB", size)
+        img = img.convert("RGB")
+        width = min(img.width, size[0])
+        height = min(img.height, size[1])
+        if (width, height) != img.size:
+            img = img.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+        return img.width, img.height, img.tobytes()
+
+
+def resample_nearest(width, height, pixels, new_width, new_height):
+    """Scale RGB pixels with nearest-neighbour sampling."""
+    stride = width * 3
+    columns = [(x * width // new_width) * 3 for x in range(new_width)]
+    rows = []
+    for y in range(new_height):
+        start = (y * height // new_height) * stride
+        row = pixels[start : start + stride]
+        rows.append(b"".join(row[c : c + 3] for c in columns))
+    return b"".join(rows)
+
+
+def decode_image(path, size):
+    """Decode a picture, scaled down to at most ``size`` (width, height) pixels.
+
+    Uses Pillow if it is installed, otherwise GDI+ on Windows.  Returns
+    (width, height, RGB bytes).
+    """
+    try:
+        return _decode_pillow(path, size)
+    except ImportError:
+        if sys.platform != "win32":
+            raise RuntimeError(
+                "Pillow is required to decode pictures on this system "
+                "(pip install Pillow), or set Skip-bitmaps = true"
+            ) from None
+    from gdi import decode_image_gdiplus
+
+    width, height, pixels = decode_image_gdiplus(path)
+    new_width, new_height = min(width, size[0]), min(height, size[1])
+    if (new_width, new_height) != (width, height):
+        pixels = resample_nearest(width, height, pixels, new_width, new_height)
+    return new_width, new_height, pixels
+
+
+# ImageCache.from_config() instances by their settings
+_shared = {}
+
+
+class ImageCache:
+    """Pictures resampled for boxes at a fixed resolution.
+
+    With no ``directory`` nothing is kept on disk, but each picture is still
+    only decoded once per box size for the lifetime of the object.
+    """
+
+    def __init__(self, dpi=300, directory=None, max_bytes=0):
+        self.dpi = dpi
+        self.files = (
+            FileCache(directory, max_bytes) if directory and max_bytes else None
+        )
+        self._memory = OrderedDict()
+        self.hits = self.misses = 0
+
+    @classmethod
+    def from_config(cls, cfg, dpi=None):
+        """Return the ImageCache set up in calendar.ini, optionally at ``dpi``.
+
+        The same settings give the same ImageCache, so a long-running process
+        keeps the pictures of one calendar in memory for the next.
+        """
+        if dpi is None:
+            dpi = cfg.getint("General", "Image-DPI", fallback=300)
+        directory = cfg.get("General", "Image-cache", fallback="").strip()
+        size = cfg.getint("General", "Image-cache-size", fallback=2000)
+        key = (cls, dpi, directory or default_cache_dir("images"), size * MEGABYTE)
+        cache = _shared.get(key)
+        if cache is None:
+            cache = _shared[key] = cls(*key[1:])
+        return cache
+
+    def get(self, path, box_width, box_height):
+        """Return the CachedImage of the picture ``path`` for a box (in mils)."""
+        size = target_size(box_width, box_height, self.dpi)
+        key = make_key("image", file_hash(path), size[0], size[1])
+        image = self._memory.get(key)
+        if image is not None:
+            self._memory.move_to_end(key)
+            return image
+        if self.files is not None:
+            data = self.files.get(key)
+            if data is not None and data[:4] == _MAGIC:
+                _, width, height = _HEADER.unpack_from(data)
+                image = CachedImage(width, height, data[_HEADER.size :])
+        if image is None:
+            self.misses += 1
+            width, height, pixels = decode_image(path, size)
+            image = CachedImage(width, height, zlib.compress(pixels))
+            if self.files is not None:
+                self.files.put(key, _HEADER.pack(_MAGIC, width, height) + image.flate)
+        else:
+            self.hits += 1
+        self._memory[key] = image
+        if len(self._memory) > MEMORY_ITEMS:
+            self._memory.popitem(last=False)
+        return image
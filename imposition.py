@@ -0,0 +1,59 @@
+"""Imposing pages for saddle-stitched printing.
+
+With ``Imposition = booklet`` in calendar.ini, the pages are printed two to
+a sheet side in the order that makes a booklet when the printed sheets are
+stacked, folded in the middle and stapled: the first sheet has the back and
+front covers on one side and the second and second-to-last pages on the
+other, and so on.  Print on both sides, flipping on the short edge.
+
+A booklet has a multiple of four pages; blank pages are added before the
+back cover to make up the count.  The composed pages are only placed side
+by side, not laid out again, but all of them are composed before the first
+sheet can be printed.
+"""
+
+from displaylist import DisplayList
+
+IMPOSITIONS = ("none", "booklet")
+
+
+def booklet_order(count):
+    """Return the (left, right) page numbers (from 0) of each sheet side.
+
+    ``count`` must be a multiple of four.
+    """
+    sides = []
+    for sheet in range(count // 4):
+        sides.append((count - 1 - 2 * sheet, 2 * sheet))
+        sides.append((2 * sheet + 1, count - 2 - 2 * sheet))
+    return sides
+
+
+def _place(out, page, dx):
+    # Start from the state a page starts in: black text, black hairline pen
+    # and white brush
+    out.set_text_color(0x000000)
+    out.set_pen(0, 0x000000)
+    out.set_brush(0xFFFFFF)
+    for op in page.ops:
+        if op.kind == "line":
+            op = op._replace(x1=op.x1 + dx, x2=op.x2 + dx)
+        elif op.kind in ("text", "rectangle", "image"):
+            op = op._replace(left=op.left + dx, right=op.right + dx)
+        out.ops.append(op)
+
+
+def impose_booklet(pages, width, height):
+    """Yield the booklet sheet sides of ``pages`` (``width`` x ``height``)."""
+    pages = list(pages)
+    blanks = -len(pages) % 4
+    if blanks:
+        back_cover = pages.pop() if len(pages) > 1 else None
+        pages += [DisplayList(width, height) for _ in range(blanks)]
+        if back_cover is not None:
+            pages.append(back_cover)
+    for left, right in booklet_order(len(pages)):
+        out = DisplayList(2 * width, height)
+        _place(out, pages[left], 0)
+        _place(out, pages[right], width)
+        yield out
@@ -0,0 +1,92 @@
+"""Reading the header of JPEG files without decoding them.
+
+Only the markers up to the start-of-frame are read, which is enough to know
+the picture's size and color format.
+"""
+
+import struct
+from collections import namedtuple
+
+# Start-of-frame markers (all except DHT, JPG and DAC in 0xC0-0xCF)
+SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Huffman-coded frames that PDF readers can decode (DCTDecode)
+DCT_MARKERS = frozenset((0xC0, 0xC1, 0xC2))
+SOS = 0xDA
+APP14 = 0xEE
+# Markers without a length field
+STANDALONE_MARKERS = frozenset(range(0xD0, 0xD8)) | {0x01}
+
+
+class JpegError(Exception):
+    pass
+
+
+class JpegInfo(
+    namedtuple("JpegInfo", "width height components bits marker adobe_transform")
+):
+    """What the header of a JPEG says about the picture.
+
+    ``marker`` is the start-of-frame marker (0xC0 = baseline, 0xC2 =
+    progressive, ...).  ``adobe_transform`` is the color transform from an
+    Adobe APP14 segment, or None if there is none.
+    """
+
+    __slots__ = ()
+
+    @property
+    def pdf_embeddable(self):
+        """Whether PDF readers can show the file as it is (DCTDecode)."""
+        return (
+            self.marker in DCT_MARKERS
+            and self.bits == 8
+            and self.components in (1, 3, 4)
+        )
+
+
+def read_jpeg_info(path):
+    """Return the JpegInfo of a file, or None if it is not a JPEG file.
+
+    Raises JpegError if the file is a broken JPEG file.
+    """
+    with open(path, "rb") as f:
+        if f.read(2) != b"\xff\xd8":
+            return None
+        adobe_transform = None
+        while True:
+            byte = f.read(1)
+            if not byte:
+                raise JpegError(f"{path}: no frame header found")
+            if byte != b"\xff":
+                raise JpegError(f"{path}: bad marker at byte {f.tell() - 1}")
+            marker = f.read(1)
+            while marker == b"\xff":  # Fill bytes
+                marker = f.read(1)
+            if not marker:
+                raise JpegError(f"{path}: truncated file")
+            marker = marker[0]
+            if marker in STANDALONE_MARKERS:
+                continue
+            header = f.read(2)
+            if len(header) < 2:
+                raise JpegError(f"{path}: truncated file")
+            (length,) = struct.unpack(">H", header)
+            if length < 2:
+                raise JpegError(f"{path}: bad segment length")
+            if marker in SOF_MARKERS:
+                segment = f.read(length - 2)
+                if len(segment) < 6:
+                    raise JpegError(f"{path}: truncated frame header")
+                bits, height, width, components = struct.unpack_from(">BHHB", segment)
+                if not (width and height and components):
+                    raise JpegError(f"{path}: bad frame header")
+                return JpegInfo(
+                    width, height, components, bits, marker, adobe_transform
+                )
+            if marker == SOS:
+                raise JpegError(f"{path}: scan data before frame header")
+            if marker == APP14:
+                segment = f.read(length - 2)
+                if segment[:5] == b"Adobe" and len(segment) >= 12:
+                    adobe_transform = segment[11]
+            else:
+                f.seek(length - 2, 1)
@@ -0,0 +1,52 @@
+"""Lengths and positions in calendar.ini, in mils (0.001 inch).
+
+Used by theme.py for the layout and by compose.py for the page setup.
+"""
+
+from collections import namedtuple
+
+
+class Point(namedtuple("Point", "x y")):
+    __slots__ = ()
+
+
+class Box(namedtuple("Box", "left top right bottom")):
+    __slots__ = ()
+
+
+def parse_length(val, dimension_size):
+    """Parse a layout value supporting percentages, units, and absolute values.
+
+    Percentages (e.g., "50%") are relative to page dimensions.
+    Units: "0.25in", "10mm", "2.5cm"
+    Absolute values (e.g., "500") are in mils (0.001 inch) as-is.
+    """
+    val = val.strip()
+    if val.endswith("%"):
+        # Percentage of page dimension
+        return int(float(val[:-1]) / 100.0 * dimension_size)
+    elif val.endswith("in"):
+        # Inches to mils (1 inch = 1000 mils)
+        return int(float(val[:-2]) * 1000)
+    elif val.endswith("mm"):
+        # Millimeters to mils (1 mm = 39.37 mils)
+        return int(float(val[:-2]) * 39.37)
+    elif val.endswith("cm"):
+        # Centimeters to mils (1 cm = 393.7 mils)
+        return int(float(val[:-2]) * 393.7)
+    else:
+        # Absolute value in mils
+        return int(val)
+
+
+def parse_layout(value, page_width, page_height):
+    """Parse a list of layout values, alternating horizontal and vertical."""
+    result = []
+    for i, val in enumerate(value.split(",")):
+        # Alternate between width (even indices) and height (odd indices)
+        result.append(parse_length(val, page_height if i % 2 else page_width))
+    if len(result) == 2:
+        return Point(*result)
+    if len(result) == 4:
+        return Box(*result)
+    return tuple(result)
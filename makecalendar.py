@@ -0,0 +1,91 @@
+"""Make the calendar described by calendar.ini.
+
+    python makecalendar.py                      # output as in calendar.ini
+    python makecalendar.py -o test.pdf          # a PDF file
+    python makecalendar.py -b png --pages 2-3   # previews of two pages
+    python makecalendar.py --check              # only check for problems
+
+Nothing but the command line is looked at before the options are read, and
+only the backend that is used is loaded (see backends.py), so --help and
+--check start right away.
+"""
+
+import argparse
+import os
+import sys
+
+from backends import BACKENDS, parse_pages
+
+
+def _pages(text):
+    try:
+        return parse_pages(text)
+    except ValueError as e:
+        # Shown by argparse
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "-c", "--config", default="calendar.ini", help="configuration file"
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="file (pdf), directory (png) or printer (printer) to output to",
+    )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        type=str.lower,
+        choices=sorted(BACKENDS),
+        help="what to output (default the Output setting)",
+    )
+    parser.add_argument(
+        "--pages", type=_pages, help='pages to output, e.g. "3-4,7" (default all)'
+    )
+    parser.add_argument(
+        "-p",
+        "--processes",
+        type=int,
+        help="draw pages in this many processes (0 = one per CPU)",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="check the configuration, data files and pictures, and output nothing",
+    )
+    args = parser.parse_args(argv)
+
+    from compose import Sources
+    from pipeline import check_calendar, load_config, make_calendar, output_backend
+
+    # The data files and pictures are next to calendar.ini
+    sources = Sources.in_directory(os.path.dirname(os.path.abspath(args.config)))
+
+    # Problems with calendar.ini, the data files and the pictures are all
+    # ValueErrors (like ThemeError and PreflightError)
+    try:
+        cfg = load_config(args.config)
+        if args.check:
+            check_calendar(cfg, sources)
+            print("No problems found")
+            return 0
+        make_calendar(
+            cfg,
+            sources,
+            output_file=args.output,
+            processes=args.processes,
+            backend=args.backend or output_backend(cfg),
+            pages=args.pages,
+        )
+    except (FileNotFoundError, ValueError) as e:
+        print(e)
+        return 1
+    print("Done")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+"""Holidays and other observances, from rules that work for any year.
+
+holidays.txt has one rule per line, "<date rule> [observed] <name>":
+
+    1/1 observed New Year's Day
+    1/3Mon Martin Luther King Jr. Day
+    5/lastMon Memorial Day
+    11/4Thu Thanksgiving
+    easter-2 Good Friday
+    easter Easter
+    12/25 observed-monday Christmas Day
+
+A date rule is a fixed date ("<month>/<day>"), the nth or last weekday of a
+month ("<month>/<n><weekday>" like "11/4Thu" for the fourth Thursday of
+November, or "<month>/last<weekday>", with weekdays as Mon, Tue, ...) or a
+number of days before or after (Western) Easter Sunday ("easter-2").
+Rules with "observed" are also shown, as "<name> (observed)", on the day
+off when they fall on a weekend: the Friday before a Saturday and the
+Monday after a Sunday, or with "observed-monday" the Monday after either.
+Lines starting with "#" are ignored.
+
+The rules of a file are compiled once (and kept for files with the same
+content, e.g. in renderservice.py), and each year's holidays are worked out
+once into a table by day.
+"""
+
+import datetime
+import functools
+from collections import namedtuple
+
+WEEKDAY_NAMES = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+LAST = -1
+
+OBSERVED = "observed"
+OBSERVED_MONDAY = "observed-monday"
+OBSERVED_POLICIES = (OBSERVED, OBSERVED_MONDAY)
+
+
+def easter(year):
+    """Return the date of Easter Sunday in ``year`` (Gregorian calendar)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7  # noqa: E741
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return datetime.date(year, month, day + 1)
+
+
+class FixedDate(namedtuple("FixedDate", "month day")):
+    __slots__ = ()
+
+    def date(self, year):
+        try:
+            return datetime.date(year, self.month, self.day)
+        except ValueError:
+            return None  # February 29 in other years
+
+
+class NthWeekday(namedtuple("NthWeekday", "month weekday n")):
+    """The ``n``th (or LAST) ``weekday`` (Monday = 0) of a month."""
+
+    __slots__ = ()
+
+    def date(self, year):
+        if self.n == LAST:
+            following = datetime.date(year + self.month // 12, self.month % 12 + 1, 1)
+            last = following - datetime.timedelta(days=1)
+            return last - datetime.timedelta(days=(last.weekday() - self.weekday) % 7)
+        first = datetime.date(year, self.month, 1)
+        day = first + datetime.timedelta(
+            days=(self.weekday - first.weekday()) % 7 + 7 * (self.n - 1)
+        )
+        return day if day.month == self.month else None
+
+
+class EasterOffset(namedtuple("EasterOffset", "days")):
+    __slots__ = ()
+
+    def date(self, year):
+        return easter(year) + datetime.timedelta(days=self.days)
+
+
+class Holiday(namedtuple("Holiday", "rule observed name")):
+    """A rule, its OBSERVED_POLICIES policy (or None) and its name."""
+
+    __slots__ = ()
+
+    def dates(self, year):
+        """Yield the (date, name) of the holiday in ``year`` and its day off."""
+        date = self.rule.date(year)
+        if date is None:
+            return
+        yield date, self.name
+        weekday = date.weekday()
+        if self.observed is None or weekday < 5:
+            return
+        if self.observed == OBSERVED and weekday == 5:
+            shift = -1
+        else:
+            shift = 7 - weekday
+        yield date + datetime.timedelta(days=shift), f"{self.name} (observed)"
+
+
+def parse_rule(text):
+    """Parse a date rule like "12/25", "11/4Thu" or "easter-2"."""
+    text = text.lower()
+    if text.startswith("easter"):
+        offset = text[len("easter") :]
+        if offset and not (offset[0] in "+-" and offset[1:].isdigit()):
+            raise ValueError("expected easter+<days> or easter-<days>")
+        return EasterOffset(int(offset) if offset else 0)
+    month, day = text.split("/")
+    month = int(month)
+    if not 1 <= month <= 12:
+        raise ValueError("no such month")
+    if day.isdigit():
+        day = int(day)
+        # Allows February 29 (shown in leap years)
+        datetime.date(2000, month, day)
+        return FixedDate(month, day)
+    n, weekday = day[:-3], day[-3:]
+    if weekday not in WEEKDAY_NAMES:
+        raise ValueError(f"unknown weekday {weekday!r}")
+    n = LAST if n == "last" else int(n)
+    if n != LAST and not 1 <= n <= 5:
+        raise ValueError("the week must be 1 to 5 or last")
+    return NthWeekday(month, WEEKDAY_NAMES.index(weekday), n)
+
+
+class HolidayRules:
+    """The compiled rules of a holidays file."""
+
+    def __init__(self, holidays):
+        self.holidays = tuple(holidays)
+        # year -> {(month, day): names}
+        self._tables = {}
+
+    def __len__(self):
+        return len(self.holidays)
+
+    def table(self, year):
+        """Return {(month, day): (names...)} of the holidays in ``year``."""
+        table = self._tables.get(year)
+        if table is None:
+            days = {}
+            # A day off can be in the year before or after the holiday
+            for holiday in self.holidays:
+                for rule_year in (year - 1, year, year + 1):
+                    for date, name in holiday.dates(rule_year):
+                        if date.year == year:
+                            days.setdefault((date.month, date.day), []).append(name)
+            table = self._tables[year] = {
+                day: tuple(names) for day, names in days.items()
+            }
+        return table
+
+    def on(self, month, day, year):
+        """Return the names of the holidays on a date, in file order."""
+        return self.table(year).get((month, day), ())
+
+
+@functools.lru_cache(maxsize=32)
+def compile_rules(text):
+    """Return the HolidayRules of the content of a holidays file.
+
+    Raises ValueError naming the line of the first bad rule.
+    """
+    holidays = []
+    for lineno, line in enumerate(text.splitlines(), start=1):
+        stripped = line.strip()
+        if not stripped or stripped[0] == "#":
+            continue
+        rule, _, name = stripped.partition(" ")
+        observed, _, rest = name.strip().partition(" ")
+        if observed.lower() in OBSERVED_POLICIES:
+            observed, name = observed.lower(), rest
+        else:
+            observed = None
+        name = name.strip()
+        try:
+            if not name:
+                raise ValueError("no name")
+            rule = parse_rule(rule)
+        except ValueError as e:
+            raise ValueError(
+                f"line {lineno}: expected <date rule> [observed] <name>,"
+                f" got {line.strip()!r} ({e})"
+            ) from None
+        holidays.append(Holiday(rule, observed, name.replace("\\n", "\n")))
+    return HolidayRules(holidays)
+
+
+def load_rules(path):
+    """Return the HolidayRules of a holidays file."""
+    with open(path) as f:
+        text = f.read()
+    try:
+        return compile_rules(text)
+    except ValueError as e:
+        raise ValueError(f"{path}: {e}") from None
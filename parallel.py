@@ -0,0 +1,71 @@
+"""Drawing the pages of a document in worker processes.
+
+Pages do not depend on each other once they are composed, so the slow part
+of drawing them (decoding and scaling pictures, laying out text, drawing
+pixels) can be spread over all the cores of the machine.  Backends that
+support this have two methods:
+
+    page_renderer()             return a picklable callable that draws a
+                                page on its own, called in worker
+                                processes as render_page(number, page) and
+                                returning a picklable fragment
+    merge_page(page, fragment)  add a fragment to the document
+
+render_parallel() sends the pages to the workers as they are composed and
+merges the fragments in page order, keeping only a few pages in flight.
+"""
+
+import os
+import sys
+from collections import deque
+
+from displaylist import document, render
+
+# How many pages per worker process are drawn ahead of the page being merged
+PAGES_AHEAD = 2
+
+_render_page = None
+
+
+def _start_worker(render_page):
+    global _render_page
+    _render_page = render_page
+    # Warnings (like missing fonts) are printed by the main process too
+    sys.stdout = open(os.devnull, "w")
+
+
+def _draw(number, page):
+    return _render_page(number, page)
+
+
+def render_parallel(pages, target, title="Calendar", processes=None):
+    """Like render(), drawing the pages in ``processes`` worker processes.
+
+    ``processes`` defaults to the number of CPUs.  Backends that cannot draw
+    pages apart from the document are rendered to as usual.
+    """
+    page_renderer = getattr(target, "page_renderer", None)
+    render_page = page_renderer() if page_renderer is not None else None
+    if render_page is None:
+        render(pages, target, title)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+
+    processes = processes or os.cpu_count() or 1
+    with document(target, title), ProcessPoolExecutor(
+        processes, initializer=_start_worker, initargs=(render_page,)
+    ) as pool:
+        pending = deque()
+        try:
+            for number, page in enumerate(pages, start=1):
+                pending.append((page, pool.submit(_draw, number, page)))
+                if len(pending) >= processes * PAGES_AHEAD:
+                    page, fragment = pending.popleft()
+                    target.merge_page(page, fragment.result())
+            while pending:
+                page, fragment = pending.popleft()
+                target.merge_page(page, fragment.result())
+        except BaseException:
+            # Don't draw the rest of the pages for nothing
+            pool.shutdown(cancel_futures=True)
+            raise
@@ -0,0 +1,706 @@
+"""Direct PDF output backend.
+
+Writes display lists (see displaylist.py) straight to a PDF file, without
+going through the Windows print spooler.  Each page is written out as soon
+as it is finished; only the small cross-reference table is kept until the
+end of the document.
+
+Page content is drawn in mils: every page starts by scaling user space from
+points to mils, and Y coordinates are flipped so (0, 0) is the top left.
+
+With a page cache, the content stream of each page is kept under a
+fingerprint of everything the page draws (its display list, the content of
+its pictures and the font files it is drawn with).  When a calendar is made again,
+pages whose fingerprint is unchanged are copied from the cache instead of
+being laid out again.  Resource names are derived from the fonts' and
+pictures' identities, so cached content streams are valid in any document.
+The same lets PageWriter lay pages out in worker processes (see parallel.py)
+for the PDFWriter to merge.
+"""
+
+import contextlib
+import datetime
+import json
+import os
+import zlib
+from collections import namedtuple
+
+from displaylist import ALIGN_CENTER, FW_BOLD, Font
+from filecache import MEGABYTE, FileCache, default_cache_dir, make_key
+from fonts import ScaledFont, face_key, find_face, wrap_text
+from imagecache import ImageCache, file_hash, target_size
+from jpeginfo import JpegError, read_jpeg_info
+
+PRODUCER = "Windows calendar creator"
+
+# Points per mil
+PT_PER_MIL = 72 / 1000
+
+# JPEG files up to this many times the target resolution are embedded as
+# they are; scaling them down would save little and cost a full decode
+PASSTHROUGH_LIMIT = 1.25
+
+COLOR_SPACES = {1: "/DeviceGray", 3: "/DeviceRGB", 4: "/DeviceCMYK"}
+
+# Change this when the content streams written for the same page change
+PAGE_FORMAT = 1
+
+
+def _num(value):
+    """Format a number compactly for a content stream."""
+    if value == int(value):
+        return str(int(value))
+    return ("%.3f" % value).rstrip("0").rstrip(".")
+
+
+def _color(color):
+    """Return the "r g b" operands for a COLORREF (0xBBGGRR) color."""
+    r, g, b = color & 0xFF, (color >> 8) & 0xFF, (color >> 16) & 0xFF
+    return " ".join(_num(round(c / 255, 3)) for c in (r, g, b))
+
+
+def _literal(data):
+    """Return ``data`` (bytes) as an ASCII PDF literal string."""
+    out = ["("]
+    for byte in data:
+        if byte in b"()\\":
+            out.append("\\" + chr(byte))
+        elif 32 <= byte <= 126:
+            out.append(chr(byte))
+        else:
+            out.append("\\%03o" % byte)
+    out.append(")")
+    return "".join(out)
+
+
+def _text_string(text):
+    """Return ``text`` as a PDF text string (for document metadata)."""
+    try:
+        return _literal(text.encode("latin-1"))
+    except UnicodeEncodeError:
+        return "<FEFF%s>" % text.encode("utf-16-be").hex().upper()
+
+
+class PDFFont(ScaledFont):
+    """A Font (from a display list) resolved to an installed face."""
+
+    def __init__(self, font, face, resource, object_id):
+        super().__init__(font, face)
+        self.resource = resource
+        self.object_id = object_id
+
+
+class PageFragment(namedtuple("PageFragment", "fonts content images reused")):
+    """A page laid out apart from the document (see parallel.py).
+
+    ``fonts`` are the Fonts it uses, ``content`` its compressed content
+    stream and ``images`` the pictures decoded for it, by (path, box width,
+    box height).  ``reused`` tells whether it came from the page cache.
+    """
+
+    __slots__ = ()
+
+
+def page_cache(cfg):
+    """Return the FileCache of PDF pages set up in calendar.ini, or None."""
+    directory = cfg.get("General", "Page-cache", fallback="").strip()
+    size = cfg.getint("General", "Page-cache-size", fallback=200)
+    if not size:
+        return None
+    return FileCache(directory or default_cache_dir("pages"), size * MEGABYTE)
+
+
+class PDFWriter:
+    """Display list backend writing a PDF file."""
+
+    def __init__(self, path, images, pages=None, margin=0, bleed=0):
+        self.path = path
+        self.images_cache = images
+        # FileCache of page content streams, or None
+        self.pages_cache = pages
+        # Pages are ``margin`` larger than the trimmed page on each side, with
+        # a bleed of ``bleed`` (see bleed.py)
+        self.margin = margin
+        self.bleed = bleed
+        self.file = None
+        self.reused = self.rendered = 0
+        self.image_bytes = 0
+
+    @classmethod
+    def from_config(cls, cfg, setup, output=None, pages=None):
+        """Return the PDFWriter set up in calendar.ini; see backends.py."""
+        if output is None:
+            output = cfg.get("General", "Output-file", fallback="calendar.pdf")
+        print(f"Writing PDF file: {output}")
+        return cls(
+            output,
+            ImageCache.from_config(cfg),
+            page_cache(cfg),
+            setup.margin,
+            setup.bleed,
+        )
+
+    ############################################################################
+    #   Low-level object output
+    ############################################################################
+
+    def _reserve(self):
+        """Allocate an object number, to be written later."""
+        self.next_id += 1
+        return self.next_id - 1
+
+    def _write_object(self, num, body):
+        self.offsets[num] = self.file.tell()
+        if isinstance(body, str):
+            body = body.encode("latin-1")
+        self.file.write(b"%i 0 obj\n" % num + body + b"\nendobj\n")
+
+    def _write_stream(self, num, entries, data, compress=True):
+        if compress:
+            data = zlib.compress(data)
+            entries += " /Filter /FlateDecode"
+        self._write_object(
+            num,
+            b"<< %s /Length %i >>\nstream\n" % (entries.encode("latin-1"), len(data))
+            + data
+            + b"\nendstream",
+        )
+
+    ############################################################################
+    #   Document and pages
+    ############################################################################
+
+    def start_document(self, title):
+        self.file = open(self.path, "wb")
+        self.file.write(b"%PDF-1.6\n%\xe2\xe3\xcf\xd3\n")
+        self.title = title
+        self.offsets = {}
+        self.next_id = 1
+        self.pages_id = self._reserve()
+        self.page_ids = []
+        # Font -> PDFFont, and face -> (resource name, object number)
+        self.fonts = {}
+        self.font_objects = {}
+        # image content key -> (resource name, object number)
+        self.images = {}
+        # Pictures already decoded by a worker process, see merge_page()
+        self.decoded = {}
+        self.page_key = None
+
+    def end_document(self):
+        kids = " ".join("%i 0 R" % num for num in self.page_ids)
+        self._write_object(
+            self.pages_id,
+            "<< /Type /Pages /Kids [%s] /Count %i >>" % (kids, len(self.page_ids)),
+        )
+        catalog_id = self._reserve()
+        self._write_object(
+            catalog_id, "<< /Type /Catalog /Pages %i 0 R >>" % self.pages_id
+        )
+        info_id = self._reserve()
+        now = datetime.datetime.now().strftime("D:%Y%m%d%H%M%S")
+        self._write_object(
+            info_id,
+            "<< /Title %s /Producer %s /CreationDate (%s) >>"
+            % (_text_string(self.title), _text_string(PRODUCER), now),
+        )
+        xref = self.file.tell()
+        lines = ["xref", "0 %i" % self.next_id, "0000000000 65535 f "]
+        for num in range(1, self.next_id):
+            lines.append("%010i 00000 n " % self.offsets[num])
+        lines.append("trailer")
+        lines.append(
+            "<< /Size %i /Root %i 0 R /Info %i 0 R >>"
+            % (self.next_id, catalog_id, info_id)
+        )
+        lines.append("startxref")
+        lines.append(str(xref))
+        lines.append("%%EOF\n")
+        self.file.write("\n".join(lines).encode("latin-1"))
+        self.file.close()
+        self.file = None
+        if self.pages_cache is not None:
+            print(
+                "Reused %i of %i pages from the page cache."
+                % (self.reused, self.reused + self.rendered)
+            )
+
+    def abort_document(self):
+        """Close and remove the partly written file; see displaylist.document()."""
+        if self.file is None:
+            return
+        self.file.close()
+        self.file = None
+        with contextlib.suppress(OSError):
+            os.remove(self.path)
+
+    def trace_counters(self):
+        """Running totals for tracing.py."""
+        return {
+            "fonts_written": len(self.font_objects),
+            "images_written": len(self.images),
+            "image_bytes": self.image_bytes,
+            "image_cache_misses": self.images_cache.misses,
+            "bytes_written": self.file.tell() if self.file is not None else 0,
+            "pages_reused": self.reused,
+        }
+
+    def start_page(self, width, height):
+        self.page_width = width
+        self.page_height = height
+        self.content = [
+            "%s 0 0 %s 0 0 cm 1 J 1 j" % (_num(PT_PER_MIL), _num(PT_PER_MIL))
+        ]
+        # Resource name -> object number, and the Fonts used on the page
+        self.page_fonts = {}
+        self.page_images = {}
+        self.page_font_list = {}
+        # GDI defaults: black text, black hairline pen, white brush
+        self.font = None
+        self.text_color = 0x000000
+        self.pen = (0, 0x000000)
+        self.brush = 0xFFFFFF
+        self._fill = self._stroke = self._line_width = None
+
+    def end_page(self):
+        content = zlib.compress("\n".join(self.content).encode("latin-1"))
+        self._write_page(content)
+        self.content = None
+        self.rendered += 1
+        if self.page_key is not None:
+            fonts = json.dumps(list(self.page_font_list)).encode("ascii")
+            self.pages_cache.put(self.page_key, fonts + b"\n" + content)
+            self.page_key = None
+
+    def _write_page(self, content):
+        """Write a page with a compressed content stream and its resources."""
+        content_id = self._reserve()
+        self._write_stream(content_id, "/Filter /FlateDecode", content, False)
+        resources = []
+        if self.page_fonts:
+            resources.append(
+                "/Font << %s >>"
+                % " ".join(
+                    "/%s %i 0 R" % item for item in sorted(self.page_fonts.items())
+                )
+            )
+        if self.page_images:
+            resources.append(
+                "/XObject << %s >>"
+                % " ".join(
+                    "/%s %i 0 R" % item for item in sorted(self.page_images.items())
+                )
+            )
+        boxes = "/MediaBox %s" % self._box(0)
+        if self.margin:
+            boxes += " /TrimBox %s" % self._box(self.margin)
+            boxes += " /BleedBox %s" % self._box(self.margin - self.bleed)
+        page_id = self._reserve()
+        self._write_object(
+            page_id,
+            "<< /Type /Page /Parent %i 0 R %s /Resources << %s >> /Contents %i 0 R >>"
+            % (self.pages_id, boxes, " ".join(resources), content_id),
+        )
+        self.page_ids.append(page_id)
+
+    def _box(self, inset):
+        """Return a PDF rectangle ``inset`` mils inside the page."""
+        return "[%s]" % " ".join(
+            _num(round(value * PT_PER_MIL, 3))
+            for value in (
+                inset,
+                inset,
+                self.page_width - inset,
+                self.page_height - inset,
+            )
+        )
+
+    def _page_fingerprint(self, page):
+        """Return the page cache key of a DisplayList."""
+        parts = ["pdf-page", PAGE_FORMAT, page.width, page.height]
+        parts.append(self.images_cache.dpi)
+        # face_key() -> the font file's content, as fonts can be updated in place
+        fonts = {}
+        for op in page.ops:
+            if op.kind == "image":
+                # By the picture's content, wherever the file is
+                parts.append(repr(op._replace(path=None)))
+                parts.append(file_hash(op.path))
+                continue
+            parts.append(repr(op))
+            if op.kind == "set_font":
+                face = find_face(op.font.name, bold=op.font.weight >= FW_BOLD)
+                key = face_key(face)
+                parts.append(repr(key))
+                if key not in fonts:
+                    path = getattr(face, "path", None)
+                    fonts[key] = file_hash(path) if path else "built-in"
+        parts.extend(fonts.values())
+        return make_key(*parts)
+
+    def reuse_page(self, page):
+        """Write a page from the page cache if it is there; see render()."""
+        if self.pages_cache is None:
+            return False
+        key = self._page_fingerprint(page)
+        data = self.pages_cache.get(key)
+        if data is None:
+            # Lay the page out as usual and keep it for next time
+            self.page_key = key
+            return False
+        fonts, content = data.split(b"\n", 1)
+        self._write_laid_out_page(
+            page, [Font(*font) for font in json.loads(fonts)], content
+        )
+        self.reused += 1
+        return True
+
+    def _write_laid_out_page(self, page, fonts, content):
+        """Write a page whose content stream was made before."""
+        self.start_page(page.width, page.height)
+        for font in fonts:
+            pdffont = self._pdf_font(font)
+            self.page_fonts[pdffont.resource] = pdffont.object_id
+        for op in page.ops:
+            if op.kind == "image":
+                name, num = self._image_object(
+                    op.path, op.right - op.left, op.bottom - op.top
+                )
+                self.page_images[name] = num
+        self._write_page(content)
+        self.content = None
+
+    def page_renderer(self):
+        """Return what lays out pages in worker processes; see parallel.py."""
+        return PageWriter(self.images_cache, self.pages_cache).lay_out
+
+    def merge_page(self, page, fragment):
+        """Write a page laid out by a PageWriter."""
+        self.decoded = fragment.images
+        try:
+            self._write_laid_out_page(page, fragment.fonts, fragment.content)
+        finally:
+            self.decoded = {}
+        if fragment.reused:
+            self.reused += 1
+        else:
+            self.rendered += 1
+
+    ############################################################################
+    #   Graphics state
+    ############################################################################
+
+    def set_font(self, font):
+        self.font = font
+
+    def set_text_color(self, color):
+        self.text_color = color
+
+    def set_pen(self, width, color):
+        self.pen = (width, color)
+
+    def set_brush(self, color):
+        self.brush = color
+
+    def _set_fill(self, color):
+        if self._fill != color:
+            self._fill = color
+            self.content.append(_color(color) + " rg")
+
+    def _set_stroke(self, width, color):
+        if self._stroke != color:
+            self._stroke = color
+            self.content.append(_color(color) + " RG")
+        if self._line_width != width:
+            self._line_width = width
+            self.content.append(_num(width) + " w")
+
+    ############################################################################
+    #   Drawing
+    ############################################################################
+
+    def _y(self, y):
+        return self.page_height - y
+
+    def rectangle(self, left, top, right, bottom):
+        self._set_stroke(*self.pen)
+        self._set_fill(self.brush)
+        self.content.append(
+            "%s %s %s %s re B"
+            % (
+                _num(left),
+                _num(self._y(bottom)),
+                _num(right - left),
+                _num(bottom - top),
+            )
+        )
+
+    def line(self, x1, y1, x2, y2):
+        self._set_stroke(*self.pen)
+        self.content.append(
+            "%s %s m %s %s l S"
+            % (_num(x1), _num(self._y(y1)), _num(x2), _num(self._y(y2)))
+        )
+
+    def text(self, left, top, right, bottom, text, align, clip):
+        pdffont = self._pdf_font(self.font)
+        self.page_fonts[pdffont.resource] = pdffont.object_id
+        self.page_font_list[self.font] = None
+        content = self.content
+        if clip:
+            content.append(
+                "q %s %s %s %s re W n"
+                % (
+                    _num(left),
+                    _num(self._y(bottom)),
+                    _num(right - left),
+                    _num(bottom - top),
+                )
+            )
+        self._set_fill(self.text_color)
+        if pdffont.synthetic_bold:
+            self._set_stroke(pdffont.size / 30, self.text_color)
+        font_op = "/%s %s Tf" % (pdffont.resource, _num(round(pdffont.size, 2)))
+        if pdffont.hscale != 1.0:
+            font_op += " %s Tz" % _num(round(pdffont.hscale * 100, 2))
+        if pdffont.synthetic_bold:
+            font_op += " 2 Tr"
+        y = top
+        for line in wrap_text(text, right - left, pdffont.measure):
+            if line:
+                x = left
+                if align == ALIGN_CENTER:
+                    x += (right - left - pdffont.measure(line)) / 2
+                baseline = y + pdffont.ascent
+                content.append(
+                    "BT %s %s %s Td %s Tj ET"
+                    % (
+                        font_op,
+                        _num(round(x, 1)),
+                        _num(round(self._y(baseline), 1)),
+                        _literal(line.encode("cp1252", errors="replace")),
+                    )
+                )
+                if self.font.underline:
+                    self._underline(pdffont, x, baseline, pdffont.measure(line))
+            y += self.font.height
+        if clip:
+            content.append("Q")
+            self._fill = self._stroke = self._line_width = None
+
+    def _underline(self, pdffont, x, baseline, width):
+        face = pdffont.face
+        thickness = face.underline_thickness * pdffont.scale
+        y = baseline - face.underline_position * pdffont.scale
+        self.content.append(
+            "%s %s %s %s re f"
+            % (
+                _num(round(x, 1)),
+                _num(round(self._y(y + thickness / 2), 1)),
+                _num(round(width, 1)),
+                _num(round(thickness, 1)),
+            )
+        )
+
+    def image(self, left, top, right, bottom, path):
+        name, num = self._image_object(path, right - left, bottom - top)
+        self.page_images[name] = num
+        self.content.append(
+            "q %s 0 0 %s %s %s cm /%s Do Q"
+            % (
+                _num(right - left),
+                _num(bottom - top),
+                _num(left),
+                _num(self._y(bottom)),
+                name,
+            )
+        )
+
+    ############################################################################
+    #   Resources
+    ############################################################################
+
+    def _image_object(self, path, box_width, box_height):
+        """Return the (resource name, object number) of a picture in a box.
+
+        Identical pictures are only written once, however often they are
+        used and whatever they are called.
+        """
+        size = target_size(box_width, box_height, self.images_cache.dpi)
+        try:
+            info = read_jpeg_info(path)
+        except JpegError:
+            info = None  # Let the image decoder report the problem
+        if (
+            info is not None
+            and info.pdf_embeddable
+            and info.width <= size[0] * PASSTHROUGH_LIMIT
+            and info.height <= size[1] * PASSTHROUGH_LIMIT
+        ):
+            key = ("jpeg", file_hash(path))
+            if key not in self.images:
+                num = self._write_jpeg(path, info)
+                self.images[key] = ("Im" + make_key(*key)[:16], num)
+        else:
+            key = ("pixels", file_hash(path), size)
+            if key not in self.images:
+                num = self._write_pixels(path, box_width, box_height)
+                self.images[key] = ("Im" + make_key(*key)[:16], num)
+        return self.images[key]
+
+    def _write_jpeg(self, path, info):
+        """Embed a JPEG file as it is, without decoding it."""
+        with open(path, "rb") as f:
+            data = f.read()
+        entries = (
+            "/Type /XObject /Subtype /Image /Width %i /Height %i"
+            " /ColorSpace %s /BitsPerComponent 8 /Filter /DCTDecode"
+            % (info.width, info.height, COLOR_SPACES[info.components])
+        )
+        if info.components == 4 and info.adobe_transform is not None:
+            # Adobe writes CMYK JPEG files inverted
+            entries += " /Decode [1 0 1 0 1 0 1 0]"
+        num = self._reserve()
+        self._write_stream(num, entries, data, compress=False)
+        self.image_bytes += len(data)
+        return num
+
+    def _write_pixels(self, path, box_width, box_height):
+        """Embed a picture decoded and scaled down to the output resolution."""
+        image = self.decoded.get((path, box_width, box_height))
+        if image is None:
+            image = self.images_cache.get(path, box_width, box_height)
+        self.image_bytes += len(image.flate)
+        num = self._reserve()
+        self._write_stream(
+            num,
+            "/Type /XObject /Subtype /Image /Width %i /Height %i"
+            " /ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /FlateDecode"
+            % (image.width, image.height),
+            image.flate,
+            compress=False,
+        )
+        return num
+
+    def _pdf_font(self, font):
+        if font is None:
+            raise ValueError("text drawn before any font was set")
+        pdffont = self.fonts.get(font)
+        if pdffont is None:
+            face = find_face(font.name, bold=font.weight >= FW_BOLD)
+            key = face_key(face)
+            if key not in self.font_objects:
+                resource = "F" + make_key(*key)[:16]
+                self.font_objects[key] = (resource, self._write_font(face))
+            pdffont = PDFFont(font, face, *self.font_objects[key])
+            self.fonts[font] = pdffont
+        return pdffont
+
+    def _write_font(self, face):
+        num = self._reserve()
+        if face.data is None:
+            # A standard font, which every PDF reader has built in
+            self._write_object(
+                num,
+                "<< /Type /Font /Subtype /Type1 /BaseFont /%s"
+                " /Encoding /WinAnsiEncoding >>" % face.ps_name,
+            )
+            return num
+        scale = 1000 / face.units_per_em
+        widths = []
+        for code in range(32, 256):
+            try:
+                char = bytes([code]).decode("cp1252")
+            except UnicodeDecodeError:
+                widths.append(0)
+            else:
+                widths.append(round(face.char_width(char) * scale))
+        flags = 32  # Nonsymbolic
+        if face.fixed_pitch:
+            flags |= 1
+        if face.italic:
+            flags |= 64
+        descriptor_id = self._reserve()
+        descriptor = (
+            "<< /Type /FontDescriptor /FontName /%s /Flags %i /FontBBox [%s]"
+            " /ItalicAngle %s /Ascent %i /Descent %i /CapHeight %i /StemV %i"
+            % (
+                face.ps_name,
+                flags,
+                " ".join(str(round(v * scale)) for v in face.bbox),
+                _num(round(face.italic_angle, 2)),
+                round(face.ascent * scale),
+                -round(face.descent * scale),
+                round(face.cap_height * scale),
+                120 if face.bold else 80,
+            )
+        )
+        if face.embeddable:
+            file_id = self._reserve()
+            data = face.data
+            if face.cff:
+                descriptor += " /FontFile3 %i 0 R" % file_id
+                self._write_stream(file_id, "/Subtype /OpenType", data)
+            else:
+                descriptor += " /FontFile2 %i 0 R" % file_id
+                self._write_stream(file_id, "/Length1 %i" % len(data), data)
+        self._write_object(descriptor_id, descriptor + " >>")
+        self._write_object(
+            num,
+            "<< /Type /Font /Subtype /TrueType /BaseFont /%s /FirstChar 32"
+            " /LastChar 255 /Widths [%s] /Encoding /WinAnsiEncoding"
+            " /FontDescriptor %i 0 R >>"
+            % (face.ps_name, " ".join(map(str, widths)), descriptor_id),
+        )
+        return num
+
+
+class PageWriter(PDFWriter):
+    """Lays out single pages for a PDFWriter, without writing a document.
+
+    This is the part of making a PDF file that can be done in parallel: the
+    content streams of pages and the decoding of their pictures.  Pages are
+    taken from and added to the page cache like PDFWriter does.
+    """
+
+    def __init__(self, images, pages=None):
+        super().__init__(None, images, pages)
+        self.fonts = {}
+        self.font_objects = {}
+
+    def lay_out(self, number, page):
+        """Return the PageFragment of a DisplayList."""
+        self.images = {}
+        self.decoded = {}
+        key = None
+        if self.pages_cache is not None:
+            key = self._page_fingerprint(page)
+            data = self.pages_cache.get(key)
+            if data is not None:
+                fonts, content = data.split(b"\n", 1)
+                fonts = [Font(*font) for font in json.loads(fonts)]
+                return PageFragment(fonts, content, {}, True)
+        self.start_page(page.width, page.height)
+        for op in page.ops:
+            getattr(self, op.kind)(*op)
+        content = zlib.compress("\n".join(self.content).encode("latin-1"))
+        fonts = list(self.page_font_list)
+        if key is not None:
+            self.pages_cache.put(
+                key, json.dumps(fonts).encode("ascii") + b"\n" + content
+            )
+        return PageFragment(fonts, content, self.decoded, False)
+
+    # Only resource names are needed; the PDFWriter writes the objects
+
+    def _write_font(self, face):
+        return None
+
+    def _write_jpeg(self, path, info):
+        return None
+
+    def _write_pixels(self, path, box_width, box_height):
+        self.decoded[path, box_width, box_height] = self.images_cache.get(
+            path, box_width, box_height
+        )
+        return None
@@ -0,0 +1,196 @@
+"""Producing a calendar document from its configuration and data files.
+
+This is what ``python makecalendar.py`` does, split into reusable steps so that
+other entry points (like batch.py) produce exactly the same documents.
+"""
+
+import configparser
+from collections import OrderedDict
+
+from addressbook import check_addresses
+from backends import check_selection, open_backend
+from bleed import add_bleed
+from compose import Sources, compose_pages, get_page_setup, load_events
+from displaylist import render
+from imposition import impose_booklet
+from parallel import render_parallel
+from preflight import preflight
+from resultcache import document_key, result_cache
+from theme import compile_theme
+from tracing import NULL_TRACER, Tracer
+
+
+def load_config(path="calendar.ini"):
+    """Read a calendar.ini file; unlike RawConfigParser.read(), fail if missing."""
+    cfg = configparser.RawConfigParser()
+    with open(path) as f:
+        cfg.read_file(f)
+    return cfg
+
+
+# Number of compiled themes kept for configurations seen before
+THEMES_KEPT = 32
+
+_themes = OrderedDict()
+
+
+def config_key(cfg):
+    """Return a hashable copy of everything set in calendar.ini contents."""
+    return tuple(
+        (section, tuple(sorted(cfg.items(section)))) for section in cfg.sections()
+    )
+
+
+def compiled_theme(cfg):
+    """Return the (PageSetup, Theme) of calendar.ini contents ``cfg``.
+
+    Both are immutable, so they are kept for the configurations last seen
+    and a long-running process (like renderservice.py) compiles each one
+    only once.
+    """
+    key = config_key(cfg)
+    compiled = _themes.get(key)
+    if compiled is None:
+        setup = get_page_setup(cfg)
+        compiled = _themes[key] = (setup, compile_theme(cfg, setup))
+        if len(_themes) > THEMES_KEPT:
+            _themes.popitem(last=False)
+    else:
+        _themes.move_to_end(key)
+    return compiled
+
+
+def output_backend(cfg):
+    """Return the name of the backend selected by the [General] Output setting."""
+    return cfg.get("General", "Output", fallback="Printer").strip().lower()
+
+
+def open_output(cfg, setup, output_file=None, backend=None, pages=None):
+    """Return the backend ``backend`` (see backends.py) set up for output.
+
+    The backend defaults to the configured output, or to a PDF file if
+    ``output_file`` is given.
+    """
+    if backend is None:
+        backend = "pdf" if output_file is not None else output_backend(cfg)
+    return open_backend(backend, cfg, setup, output_file, pages)
+
+
+def select_pages(pages, selected):
+    """Yield the pages whose numbers (counting from 1) are in ``selected``.
+
+    Raises ValueError after the last page if ``selected`` goes past it.
+    """
+    count = 0
+    for count, page in enumerate(pages, 1):
+        if count in selected:
+            yield page
+    check_selection(selected, count)
+
+
+def render_processes(cfg):
+    """Return the number of processes to draw pages in (0 = one per CPU)."""
+    return cfg.getint("General", "Render-processes", fallback=1)
+
+
+def min_picture_dpi(cfg):
+    return cfg.getint("General", "Min-picture-DPI", fallback=150)
+
+
+def check_calendar(cfg, sources=None):
+    """Check calendar.ini, the data files and the pictures without output.
+
+    Raises ThemeError, PreflightError or ValueError on the first problem
+    that would stop the calendar from being made.
+    """
+    if sources is None:
+        sources = Sources.in_directory()
+    _, theme = compiled_theme(cfg)
+    preflight(theme, sources.images, min_picture_dpi(cfg))
+    load_events(theme, sources)
+    check_addresses(sources.addresses, theme)
+    return theme
+
+
+def make_calendar(
+    cfg,
+    sources=None,
+    output_file=None,
+    target=None,
+    processes=None,
+    backend=None,
+    pages=None,
+):
+    """Lay out the calendar and send it to its output.
+
+    The pages are composed and drawn one at a time, so memory use does not
+    grow with the number of pages.  ``target`` is a backend to render to
+    instead of the configured output.  Unless ``processes`` is 1 (default:
+    the Render-processes setting), the pages are drawn in that many worker
+    processes where the output allows it (see parallel.py).
+    ``backend`` names the backend to output through instead of the
+    configured one, and ``pages`` is a set of the numbers of the pages to
+    output (default all of them).
+    The pictures are checked first (see preflight.py), raising
+    PreflightError if any can't be used.
+    A PDF file made before from the same files and settings is copied from
+    the result cache instead (see resultcache.py).
+    With [General] Trace-file set, a trace of the run is written there.
+    """
+    if sources is None:
+        sources = Sources.in_directory()
+    trace_file = cfg.get("General", "Trace-file", fallback="").strip()
+    tracer = Tracer() if trace_file else NULL_TRACER
+    with tracer.phase("theme"):
+        setup, theme = compiled_theme(cfg)
+    if target is None:
+        if backend is None:
+            backend = "pdf" if output_file is not None else output_backend(cfg)
+        if backend == "pdf" and output_file is None:
+            output_file = cfg.get("General", "Output-file", fallback="calendar.pdf")
+    results = result_cache(cfg) if target is None and backend == "pdf" else None
+    if results is not None:
+        with tracer.phase("result cache"):
+            key = document_key(cfg, theme, sources, pages)
+            document = results.get(key)
+        if document is not None:
+            with open(output_file, "wb") as f:
+                f.write(document)
+            print(f"Copied {output_file} from the result cache.")
+            _write_trace(tracer, trace_file)
+            return
+    if not theme.skip_bitmaps and cfg.getboolean("General", "Preflight", fallback=True):
+        with tracer.phase("preflight"):
+            preflight(theme, sources.images, min_picture_dpi(cfg))
+    with tracer.phase("birthdays"):
+        events = load_events(theme, sources)
+    # Before anything is output, as the address book is made last
+    with tracer.phase("addresses"):
+        check_addresses(sources.addresses, theme)
+    if target is None:
+        target = open_output(cfg, setup, output_file, backend, pages)
+    if processes is None:
+        processes = render_processes(cfg)
+    selected = pages
+    pages = compose_pages(theme, sources, events, tracer)
+    if setup.imposition == "booklet":
+        pages = impose_booklet(pages, *setup.size)
+    if setup.margin:
+        pages = (add_bleed(page, setup.bleed, setup.crop_marks) for page in pages)
+    if selected is not None and not getattr(target, "selects_pages", False):
+        pages = select_pages(pages, selected)
+    with tracer.phase("compose and render"):
+        if processes == 1:
+            render(pages, tracer.wrap(target), "Calendar")
+        else:
+            render_parallel(pages, tracer.wrap(target), "Calendar", processes)
+    if results is not None:
+        with open(output_file, "rb") as f:
+            results.put(key, f.read())
+    _write_trace(tracer, trace_file)
+
+
+def _write_trace(tracer, trace_file):
+    if trace_file:
+        tracer.write(trace_file)
+        print(f"Wrote trace: {trace_file}")
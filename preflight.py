@@ -0,0 +1,176 @@
+"""Checking the pictures of a calendar before any page is made.
+
+Only the headers of the picture files are read, all at once in a pool of
+threads, so checking every picture takes a fraction of a second instead of
+waiting for a broken picture to turn up halfway through printing.  For each
+picture the calendar uses, preflight() reports:
+
+    missing          there is no such file (the page is left without it)
+    unreadable       the file is broken or not a picture
+    stretched        its proportions differ from its box on the page
+    low resolution   it has fewer pixels per inch of its box than
+                     Min-picture-DPI in calendar.ini
+
+Unreadable pictures are errors that stop the calendar from being made; the
+others are warnings.
+"""
+
+import os
+import sys
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from compose import find_picture, month_picture_names
+from jpeginfo import JpegError, read_jpeg_info
+
+# Proportions may differ from their box by this much before it is reported
+ASPECT_TOLERANCE = 0.02
+
+ERROR = "error"
+WARNING = "warning"
+
+
+class PreflightError(ValueError):
+    """Pictures are unusable; ``problems`` lists all Problems found."""
+
+    def __init__(self, problems):
+        self.problems = problems
+        errors = [str(problem) for problem in problems if problem.severity == ERROR]
+        super().__init__(
+            "%i picture(s) can't be used:\n  %s" % (len(errors), "\n  ".join(errors))
+        )
+
+
+class Problem(namedtuple("Problem", "severity name message")):
+    __slots__ = ()
+
+    def __str__(self):
+        return f"{self.name}: {self.message}"
+
+
+class PictureInfo(namedtuple("PictureInfo", "name path box width height")):
+    """A picture the calendar uses and its size in pixels (None if unknown)."""
+
+    __slots__ = ()
+
+    @property
+    def dpi(self):
+        """The pixels per inch of the picture stretched over its box."""
+        left, top, right, bottom = self.box
+        return min(
+            self.width * 1000 / max(1, right - left),
+            self.height * 1000 / max(1, bottom - top),
+        )
+
+
+def expected_pictures(theme):
+    """Return the (file names, box) of every picture the calendar uses.
+
+    A picture is the first file found of its names.
+    """
+    layout = theme.layout
+    pictures = [(("front-cover.jpg",), layout.front_cover_image)]
+    for month in theme.months:
+        pictures.append((month_picture_names(month), layout.month_image))
+    pictures.append((("in-memory.jpg",), layout.deaths_image))
+    return pictures
+
+
+def picture_size(path):
+    """Return the (width, height) in pixels of a picture file from its header.
+
+    Raises ValueError if the file can't be used as a picture.
+    """
+    try:
+        info = read_jpeg_info(path)
+    except JpegError as e:
+        raise ValueError(f"broken JPEG file ({e})") from None
+    if info is not None:
+        return info.width, info.height
+    try:
+        from PIL import Image
+    except ImportError:
+        if sys.platform == "win32":
+            return None, None  # Left to GDI+
+        raise ValueError("not a JPEG file, and Pillow is not installed") from None
+    try:
+        # Only reads the header
+        with Image.open(path) as img:
+            return img.size
+    except Exception as e:
+        raise ValueError(f"not a picture ({e})") from None
+
+
+def _check(names, box, directory, min_dpi):
+    path = find_picture(directory, names)
+    if path is None:
+        return None, [Problem(WARNING, " or ".join(names), "missing")]
+    name = os.path.basename(path)
+    try:
+        width, height = picture_size(path)
+    except (OSError, ValueError) as e:
+        return None, [Problem(ERROR, name, f"unreadable: {e}")]
+    picture = PictureInfo(name, path, box, width, height)
+    if width is None:
+        return picture, []
+    problems = []
+    left, top, right, bottom = box
+    box_aspect = (right - left) / max(1, bottom - top)
+    stretch = (width / height) / box_aspect - 1
+    if abs(stretch) > ASPECT_TOLERANCE:
+        problems.append(
+            Problem(
+                WARNING,
+                name,
+                "stretched %s by %i%% to fit its box (%i x %i pixels)"
+                % (
+                    "narrower" if stretch > 0 else "wider",
+                    abs(stretch) * 100,
+                    width,
+                    height,
+                ),
+            )
+        )
+    if picture.dpi < min_dpi:
+        problems.append(
+            Problem(
+                WARNING,
+                name,
+                "low resolution: %i dpi (%i x %i pixels) in its %.1f x %.1f inch box"
+                % (
+                    picture.dpi,
+                    width,
+                    height,
+                    (right - left) / 1000,
+                    (bottom - top) / 1000,
+                ),
+            )
+        )
+    return picture, problems
+
+
+def check_pictures(theme, directory, min_dpi=0):
+    """Check the pictures in ``directory``; returns (PictureInfos, Problems)."""
+    pictures = expected_pictures(theme)
+    with ThreadPoolExecutor(min(16, len(pictures))) as pool:
+        results = list(
+            pool.map(lambda picture: _check(*picture, directory, min_dpi), pictures)
+        )
+    found = [picture for picture, _ in results if picture is not None]
+    problems = [problem for _, found_problems in results for problem in found_problems]
+    return found, problems
+
+
+def preflight(theme, directory, min_dpi=0):
+    """Check the pictures, print the problems and raise PreflightError on errors."""
+    found, problems = check_pictures(theme, directory, min_dpi)
+    print(f"Checked {len(found)} pictures.")
+    missing = [problem.name for problem in problems if problem.message == "missing"]
+    if missing:
+        print("Missing pictures (left out): " + ", ".join(missing))
+    for problem in problems:
+        if problem.message != "missing":
+            print(f"{problem.severity.capitalize()}: {problem}")
+    if any(problem.severity == ERROR for problem in problems):
+        raise PreflightError(problems)
+    return found
@@ -0,0 +1,727 @@
+"""Raster (PNG) preview backend.
+
+Draws pages into PNG files without Windows, a printer or any library, for
+looking at a few pages while working on the layout:
+
+    python raster.py --pages 2-3             # January's picture and grid
+    python raster.py --thumbnail             # every page, small and fast
+    python raster.py --pages 4 --dpi 300     # one page at print resolution
+
+Text is placed with the same fonts, metrics and word wrapping as the PDF
+writer, so previews match the printed calendar.  Glyphs are filled from the
+fonts' TrueType outlines; text too small to read, and fonts without TrueType
+outlines, are drawn as boxes.  Pages are drawn in bands of rows, each
+replaying only the ops that reach its rows, by a pool of threads, and each
+band is compressed on its own (the threads overlap the compression; drawing
+holds the GIL).  With --processes, several pages are drawn at once in worker
+processes.
+"""
+
+import argparse
+import math
+import os
+import struct
+import sys
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from backends import check_selection
+from displaylist import ALIGN_CENTER, FW_BOLD, DisplayList
+from fonts import ScaledFont, find_face, wrap_text
+from imagecache import ImageCache, resample_nearest
+
+THUMBNAIL_DPI = 24
+PREVIEW_DPI = 100
+
+# Text with a cell height of fewer pixels than this is drawn as boxes
+GREEK_BELOW = 8
+# Sub-scanlines per pixel row when filling outlines
+OVERSAMPLE = 4
+# Height of the bands pages are drawn in, in pixels
+BAND_HEIGHT = 256
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+_WHITE = b"\xff\xff\xff"
+
+
+def _rgb(color):
+    """Return the RGB bytes of a COLORREF (0xBBGGRR) color."""
+    return bytes((color & 0xFF, (color >> 8) & 0xFF, (color >> 16) & 0xFF))
+
+
+def _px(mils, dpi):
+    return round(mils * dpi / 1000)
+
+
+def _mix(rgb, other, amount):
+    return bytes(round(a + (b - a) * amount) for a, b in zip(rgb, other))
+
+
+################################################################################
+#   Filling outlines
+################################################################################
+
+
+def _coverage(polygons, width, height):
+    """Return the anti-aliased coverage of polygons as alpha bytes.
+
+    ``polygons`` are lists of (x, y) points, in pixels from the top left of a
+    ``width`` x ``height`` mask, filled with the nonzero winding rule.
+    """
+    edges = []
+    for points in polygons:
+        for (x0, y0), (x1, y1) in zip(points, points[1:] + points[:1]):
+            if y0 == y1:
+                continue
+            winding = 1
+            if y0 > y1:
+                x0, y0, x1, y1 = x1, y1, x0, y0
+                winding = -1
+            edges.append((y0, y1, x0, (x1 - x0) / (y1 - y0), winding))
+    edges.sort()
+    coverage = [0.0] * (width * height)
+    step = 1 / OVERSAMPLE
+    for row in range(height):
+        base = row * width
+        for sub in range(OVERSAMPLE):
+            y = row + (sub + 0.5) * step
+            crossings = sorted(
+                (x0 + (y - y0) * dxdy, winding)
+                for y0, y1, x0, dxdy, winding in edges
+                if y0 <= y < y1
+            )
+            wind = 0
+            start = 0.0
+            for x, winding in crossings:
+                if wind == 0:
+                    start = x
+                wind += winding
+                if wind != 0:
+                    continue
+                # A span from start to x is inside
+                xa, xb = max(start, 0.0), min(x, float(width))
+                if xa >= xb:
+                    continue
+                ia, ib = int(xa), int(xb)
+                if ia == ib:
+                    coverage[base + ia] += (xb - xa) * step
+                    continue
+                coverage[base + ia] += (ia + 1 - xa) * step
+                for i in range(base + ia + 1, base + ib):
+                    coverage[i] += step
+                if ib < width:
+                    coverage[base + ib] += (xb - ib) * step
+    return bytes(min(255, int(a * 255 + 0.5)) for a in coverage)
+
+
+def _flatten(contour, transform, steps):
+    """Turn a TrueType contour into a polygon, in transformed coordinates."""
+    points = []
+    # Off-curve points next to each other have an on-curve point between them
+    for i, (x, y, on) in enumerate(contour):
+        px, py, pon = contour[i - 1]
+        if not on and not pon:
+            points.append(((x + px) / 2, (y + py) / 2, True))
+        points.append((x, y, on))
+    starts = [i for i, point in enumerate(points) if point[2]]
+    if not starts:
+        return []
+    points = points[starts[0] :] + points[: starts[0]]
+    x0, y0, _ = points[0]
+    polygon = [transform(x0, y0)]
+    i = 1
+    count = len(points)
+    while i <= count:
+        x, y, on = points[i % count]
+        if on:
+            polygon.append(transform(x, y))
+            x0, y0 = x, y
+            i += 1
+            continue
+        x2, y2, _ = points[(i + 1) % count]
+        for n in range(1, steps + 1):
+            t = n / steps
+            u = 1 - t
+            polygon.append(
+                transform(
+                    u * u * x0 + 2 * u * t * x + t * t * x2,
+                    u * u * y0 + 2 * u * t * y + t * t * y2,
+                )
+            )
+        x0, y0 = x2, y2
+        i += 2
+    return polygon
+
+
+def _mask(polygons):
+    """Return (left, top, width, height, alpha) covering pixel polygons."""
+    xs = [x for polygon in polygons for x, _ in polygon]
+    ys = [y for polygon in polygons for _, y in polygon]
+    if not xs:
+        return None
+    left, top = math.floor(min(xs)), math.floor(min(ys))
+    width = math.ceil(max(xs)) - left
+    height = math.ceil(max(ys)) - top
+    if width <= 0 or height <= 0:
+        return None
+    shifted = [[(x - left, y - top) for x, y in polygon] for polygon in polygons]
+    return left, top, width, height, _coverage(shifted, width, height)
+
+
+# (face, glyph, pixels per unit, horizontal scale) -> mask or None
+_glyph_masks = {}
+
+
+def _glyph_mask(face, glyph, ppu, hscale):
+    """Return the mask of a glyph relative to its origin on the baseline."""
+    key = (id(face), glyph, round(ppu, 5), round(hscale, 3))
+    mask = _glyph_masks.get(key, False)
+    if mask is False:
+        xscale = ppu * hscale
+
+        def transform(x, y):
+            return x * xscale, -y * ppu
+
+        size = (face.ascent + face.descent) * ppu
+        steps = 2 if size < 24 else 4 if size < 96 else 8
+        polygons = [
+            _flatten(contour, transform, steps) for contour in face.glyph_outline(glyph)
+        ]
+        mask = _mask([p for p in polygons if len(p) > 2])
+        _glyph_masks[key] = mask
+    return mask
+
+
+################################################################################
+#   Drawing
+################################################################################
+
+
+class Canvas:
+    """RGB pixels of the rows ``top`` to ``bottom`` of a page ``width`` wide."""
+
+    def __init__(self, width, top, bottom):
+        self.width = width
+        self.top = top
+        self.bottom = bottom
+        self.pixels = bytearray(_WHITE) * (width * (bottom - top))
+
+    def _clip(self, x0, y0, x1, y1, clip):
+        x0, y0 = max(x0, 0), max(y0, self.top)
+        x1, y1 = min(x1, self.width), min(y1, self.bottom)
+        if clip is not None:
+            x0, y0 = max(x0, clip[0]), max(y0, clip[1])
+            x1, y1 = min(x1, clip[2]), min(y1, clip[3])
+        return x0, y0, x1, y1
+
+    def fill(self, x0, y0, x1, y1, rgb, clip=None):
+        """Fill the pixels x0 <= x < x1, y0 <= y < y1."""
+        x0, y0, x1, y1 = self._clip(x0, y0, x1, y1, clip)
+        if x0 >= x1 or y0 >= y1:
+            return
+        run = rgb * (x1 - x0)
+        pixels = self.pixels
+        for y in range(y0, y1):
+            start = ((y - self.top) * self.width + x0) * 3
+            pixels[start : start + len(run)] = run
+
+    def blend(self, mask, x, y, rgb, clip=None):
+        """Paint ``rgb`` through a mask placed with its origin at (x, y)."""
+        left, top, width, height, alpha = mask
+        left += x
+        top += y
+        x0, y0, x1, y1 = self._clip(left, top, left + width, top + height, clip)
+        if x0 >= x1 or y0 >= y1:
+            return
+        pixels = self.pixels
+        r, g, b = rgb
+        for py in range(y0, y1):
+            row = (py - top) * width - left
+            start = ((py - self.top) * self.width) * 3
+            for px in range(x0, x1):
+                a = alpha[row + px]
+                if not a:
+                    continue
+                i = start + px * 3
+                if a == 255:
+                    pixels[i : i + 3] = rgb
+                else:
+                    pixels[i] += (r - pixels[i]) * a // 255
+                    pixels[i + 1] += (g - pixels[i + 1]) * a // 255
+                    pixels[i + 2] += (b - pixels[i + 2]) * a // 255
+
+    def paste(self, x, y, width, height, rgb_pixels, clip=None):
+        """Copy a block of RGB pixels with its top left at (x, y)."""
+        x0, y0, x1, y1 = self._clip(x, y, x + width, y + height, clip)
+        if x0 >= x1 or y0 >= y1:
+            return
+        stride = width * 3
+        for py in range(y0, y1):
+            src = (py - y) * stride + (x0 - x) * 3
+            dst = ((py - self.top) * self.width + x0) * 3
+            self.pixels[dst : dst + (x1 - x0) * 3] = rgb_pixels[
+                src : src + (x1 - x0) * 3
+            ]
+
+    def png_rows(self):
+        """Return the rows as PNG scanlines (with filter type 0)."""
+        stride = self.width * 3
+        pixels = bytes(self.pixels)
+        return b"".join(
+            b"\0" + pixels[start : start + stride]
+            for start in range(0, len(pixels), stride)
+        )
+
+
+class Painter:
+    """Replays display list ops onto a Canvas at ``dpi``."""
+
+    def __init__(self, canvas, dpi, pictures):
+        self.canvas = canvas
+        self.dpi = dpi
+        # (path, width, height) in pixels -> RGB pixels, prepared beforehand
+        self.pictures = pictures
+        # GDI defaults: black text, black hairline pen, white brush
+        self.font = None
+        self.text_color = 0x000000
+        self.pen = (0, 0x000000)
+        self.brush = 0xFFFFFF
+
+    def px(self, mils):
+        return _px(mils, self.dpi)
+
+    def set_font(self, font):
+        self.font = font
+
+    def set_text_color(self, color):
+        self.text_color = color
+
+    def set_pen(self, width, color):
+        self.pen = (width, color)
+
+    def set_brush(self, color):
+        self.brush = color
+
+    def _pen_pixels(self):
+        return max(1, self.px(self.pen[0]))
+
+    def rectangle(self, left, top, right, bottom):
+        px = self.px
+        self.canvas.fill(px(left), px(top), px(right), px(bottom), _rgb(self.brush))
+        width = self._pen_pixels()
+        for x1, y1, x2, y2 in (
+            (left, top, right, top),
+            (right, top, right, bottom),
+            (left, bottom, right, bottom),
+            (left, top, left, bottom),
+        ):
+            self._line(px(x1), px(y1), px(x2), px(y2), width)
+
+    def line(self, x1, y1, x2, y2):
+        px = self.px
+        self._line(px(x1), px(y1), px(x2), px(y2), self._pen_pixels())
+
+    def _line(self, x1, y1, x2, y2, width):
+        rgb = _rgb(self.pen[1])
+        half = width // 2
+        if x1 == x2 or y1 == y2:
+            x1, x2 = sorted((x1, x2))
+            y1, y2 = sorted((y1, y2))
+            self.canvas.fill(
+                x1 - half, y1 - half, x2 - half + width, y2 - half + width, rgb
+            )
+            return
+        dx, dy = x2 - x1, y2 - y1
+        length = math.hypot(dx, dy)
+        nx, ny = -dy / length * width / 2, dx / length * width / 2
+        mask = _mask(
+            [
+                [
+                    (x1 + nx, y1 + ny),
+                    (x2 + nx, y2 + ny),
+                    (x2 - nx, y2 - ny),
+                    (x1 - nx, y1 - ny),
+                ]
+            ]
+        )
+        if mask is not None:
+            self.canvas.blend(mask, 0, 0, rgb)
+
+    def image(self, left, top, right, bottom, path):
+        px = self.px
+        x, y = px(left), px(top)
+        width, height = px(right) - x, px(bottom) - y
+        pixels = self.pictures.get((path, width, height))
+        if pixels is not None:
+            self.canvas.paste(x, y, width, height, pixels)
+
+    def text(self, left, top, right, bottom, text, align, clip):
+        if self.font is None:
+            raise ValueError("text drawn before any font was set")
+        font = self.font
+        scaled = ScaledFont(font, find_face(font.name, bold=font.weight >= FW_BOLD))
+        px = self.px
+        clip_box = (px(left), px(top), px(right), px(bottom)) if clip else None
+        rgb = _rgb(self.text_color)
+        ppu = scaled.scale * self.dpi / 1000
+        outlines = getattr(scaled.face, "glyph_outline", None)
+        greek = outlines is None or font.height * self.dpi / 1000 < GREEK_BELOW
+        y = top
+        for line in wrap_text(text, right - left, scaled.measure):
+            if line:
+                x = left
+                if align == ALIGN_CENTER:
+                    x += (right - left - scaled.measure(line)) / 2
+                baseline = y + scaled.ascent
+                if greek:
+                    self._greek(scaled, line, x, baseline, rgb, clip_box)
+                else:
+                    self._glyphs(scaled, ppu, line, x, baseline, rgb, clip_box)
+                if font.underline:
+                    face = scaled.face
+                    thickness = max(1, px(face.underline_thickness * scaled.scale))
+                    uy = px(baseline - face.underline_position * scaled.scale)
+                    self.canvas.fill(
+                        px(x),
+                        uy - thickness // 2,
+                        px(x + scaled.measure(line)),
+                        uy - thickness // 2 + thickness,
+                        rgb,
+                        clip_box,
+                    )
+            y += font.height
+
+    def _glyphs(self, scaled, ppu, line, x, baseline, rgb, clip):
+        face = scaled.face
+        advance_scale = scaled.scale * scaled.hscale
+        bold = max(1, round(scaled.size * self.dpi / 1000 / 30))
+        y = self.px(baseline)
+        for char in line:
+            glyph = face.glyph_index(char)
+            if not char.isspace():
+                mask = _glyph_mask(face, glyph, ppu, scaled.hscale)
+                if mask is not None:
+                    self.canvas.blend(mask, self.px(x), y, rgb, clip)
+                    if scaled.synthetic_bold:
+                        self.canvas.blend(mask, self.px(x) + bold, y, rgb, clip)
+            x += face.glyph_advance(glyph) * advance_scale
+
+    def _greek(self, scaled, line, x, baseline, rgb, clip):
+        """Draw the words of a line as boxes."""
+        px = self.px
+        rgb = _mix(rgb, _WHITE, 0.4)
+        top = px(baseline - scaled.face.cap_height * scaled.scale * 0.8)
+        bottom = max(px(baseline), top + 1)
+        for word in line.split(" "):
+            width = scaled.measure(word)
+            if word:
+                self.canvas.fill(
+                    px(x), top, max(px(x + width), px(x) + 1), bottom, rgb, clip
+                )
+            x += width + scaled.measure(" ")
+
+
+################################################################################
+#   PNG files
+################################################################################
+
+
+def _chunk(kind, data):
+    return (
+        struct.pack(">I", len(data))
+        + kind
+        + data
+        + struct.pack(">I", zlib.crc32(kind + data))
+    )
+
+
+# Ops that change the drawing state instead of drawing
+STATE_OPS = frozenset(("set_font", "set_text_color", "set_pen", "set_brush"))
+
+
+def _op_rows(op, dpi, font, pen_width):
+    """Return the pixel rows (first, end) an op can draw into, or None for all."""
+    margin = max(1, _px(pen_width, dpi)) + 1
+    if op.kind == "line":
+        top, bottom = sorted((op.y1, op.y2))
+        return _px(top, dpi) - margin, _px(bottom, dpi) + margin
+    if op.kind == "rectangle":
+        return _px(op.top, dpi) - margin, _px(op.bottom, dpi) + margin
+    if op.kind == "image":
+        return _px(op.top, dpi), _px(op.bottom, dpi)
+    if op.kind == "text" and font is not None:
+        if op.clip:
+            return _px(op.top, dpi), _px(op.bottom, dpi) + 1
+        scaled = ScaledFont(font, find_face(font.name, bold=font.weight >= FW_BOLD))
+        lines = len(wrap_text(op.text, op.right - op.left, scaled.measure))
+        # A line's glyphs and underline stay within a line height around it
+        return (
+            _px(op.top - font.height, dpi),
+            _px(op.top + (lines + 1) * font.height, dpi) + 1,
+        )
+    return None
+
+
+def band_ops(page, dpi, band_height, height):
+    """Split the ops of a page among bands of ``band_height`` pixel rows.
+
+    Each band gets the drawing ops that can reach its rows, each preceded by
+    the state ops in effect for it that the band has not had yet, so drawing
+    a page in many bands replays its ops about once instead of once per band.
+    """
+    count = max(1, -(-height // band_height))
+    bands = [[] for _ in range(count)]
+    # kind -> current state op, and per band the state ops it has had
+    state = {}
+    band_state = [{} for _ in range(count)]
+    font, pen_width = None, 0
+    for op in page.ops:
+        kind = op.kind
+        if kind in STATE_OPS:
+            state[kind] = op
+            if kind == "set_font":
+                font = op.font
+            elif kind == "set_pen":
+                pen_width = op.width
+            continue
+        rows = _op_rows(op, dpi, font, pen_width)
+        if rows is None:
+            first, last = 0, count - 1
+        else:
+            first = max(0, rows[0] // band_height)
+            last = min(count - 1, (rows[1] - 1) // band_height)
+        for index in range(first, last + 1):
+            ops, had = bands[index], band_state[index]
+            for state_kind, state_op in state.items():
+                if had.get(state_kind) is not state_op:
+                    ops.append(state_op)
+                    had[state_kind] = state_op
+            ops.append(op)
+    return bands
+
+
+def _draw_band(ops, dpi, width, top, bottom, pictures, last):
+    """Draw rows ``top`` to ``bottom`` of a page; returns (rows, deflated).
+
+    ``ops`` are the page's ops that can reach those rows (see band_ops()).
+    """
+    canvas = Canvas(width, top, bottom)
+    painter = Painter(canvas, dpi, pictures)
+    for op in ops:
+        getattr(painter, op.kind)(*op)
+    rows = canvas.png_rows()
+    # Raw deflate data, flushed to a byte boundary so bands can be joined
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    data = compressor.compress(rows)
+    data += compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+    return rows, data
+
+
+class RasterRenderer:
+    """Display list backend writing each page to a PNG file.
+
+    ``pages`` is a set of page numbers (counting from 1) to draw, or None for
+    all of them.  ``images`` is the ImageCache pictures are taken from; its
+    resolution should be ``dpi``.
+    """
+
+    # Skips the pages not selected itself, so the files keep their numbers
+    selects_pages = True
+
+    def __init__(self, directory, images, dpi=PREVIEW_DPI, pages=None, threads=None):
+        self.directory = directory
+        self.images = images
+        self.dpi = dpi
+        self.selected = pages
+        self.threads = threads or os.cpu_count() or 1
+        self.page = None
+        self.paths = []
+        self.image_bytes = 0
+
+    @classmethod
+    def from_config(cls, cfg, setup, output=None, pages=None, dpi=PREVIEW_DPI):
+        """Return a RasterRenderer writing to ``output`` (default "preview")."""
+        return cls(output or "preview", ImageCache.from_config(cfg, dpi), dpi, pages)
+
+    def start_document(self, title):
+        os.makedirs(self.directory, exist_ok=True)
+        self.page_number = 0
+        self.paths = []
+
+    def end_document(self):
+        check_selection(self.selected, self.page_number)
+        print(f"Wrote {len(self.paths)} page(s) to {self.directory}")
+
+    def trace_counters(self):
+        """Running totals for tracing.py."""
+        return {
+            "image_bytes": self.image_bytes,
+            "image_cache_misses": self.images.misses,
+            "glyphs_drawn": len(_glyph_masks),
+        }
+
+    def reuse_page(self, page):
+        """Skip pages that are not selected; see render()."""
+        if self.selected is None or self.page_number + 1 in self.selected:
+            return False
+        self.page_number += 1
+        return True
+
+    def start_page(self, width, height):
+        self.page_number += 1
+        self.page = DisplayList(width, height)
+
+    def end_page(self):
+        page, self.page = self.page, None
+        self._write(self.draw(page))
+
+    def _write(self, png):
+        path = os.path.join(self.directory, "page-%02i.png" % self.page_number)
+        with open(path, "wb") as f:
+            f.write(png)
+        self.paths.append(path)
+
+    def page_renderer(self):
+        """Return what draws pages in worker processes; see parallel.py."""
+        drawer = RasterRenderer(self.directory, self.images, self.dpi, self.selected, 1)
+        return drawer.draw_selected
+
+    def draw_selected(self, number, page):
+        """Return the PNG file data of page ``number``, or None if not selected."""
+        if self.selected is not None and number not in self.selected:
+            return None
+        return self.draw(page)
+
+    def merge_page(self, page, png):
+        """Write a page drawn by draw_selected()."""
+        self.page_number += 1
+        if png is not None:
+            self._write(png)
+
+    def set_font(self, font):
+        self.page.set_font(font)
+
+    def set_text_color(self, color):
+        self.page.set_text_color(color)
+
+    def set_pen(self, width, color):
+        self.page.set_pen(width, color)
+
+    def set_brush(self, color):
+        self.page.set_brush(color)
+
+    def text(self, left, top, right, bottom, text, align, clip):
+        self.page.text(left, top, right, bottom, text, align, clip)
+
+    def rectangle(self, left, top, right, bottom):
+        self.page.rectangle(left, top, right, bottom)
+
+    def line(self, x1, y1, x2, y2):
+        self.page.line(x1, y1, x2, y2)
+
+    def image(self, left, top, right, bottom, path):
+        self.page.image(left, top, right, bottom, path)
+
+    def _pictures(self, page):
+        """Return the page's pictures scaled to their boxes in pixels."""
+        pictures = {}
+        dpi = self.dpi
+        for op in page.ops:
+            if op.kind != "image":
+                continue
+            width = _px(op.right, dpi) - _px(op.left, dpi)
+            height = _px(op.bottom, dpi) - _px(op.top, dpi)
+            if (op.path, width, height) in pictures or width <= 0 or height <= 0:
+                continue
+            image = self.images.get(op.path, op.right - op.left, op.bottom - op.top)
+            pixels = image.pixels()
+            if (image.width, image.height) != (width, height):
+                pixels = resample_nearest(
+                    image.width, image.height, pixels, width, height
+                )
+            pictures[op.path, width, height] = pixels
+            self.image_bytes += len(pixels)
+        return pictures
+
+    def draw(self, page):
+        """Return the PNG file data of a DisplayList."""
+        width = max(1, math.ceil(page.width * self.dpi / 1000))
+        height = max(1, math.ceil(page.height * self.dpi / 1000))
+        pictures = self._pictures(page)
+        jobs = []
+        for index, ops in enumerate(band_ops(page, self.dpi, BAND_HEIGHT, height)):
+            top = index * BAND_HEIGHT
+            bottom = min(top + BAND_HEIGHT, height)
+            jobs.append((ops, self.dpi, width, top, bottom, pictures, bottom == height))
+        if self.threads > 1 and len(jobs) > 1:
+            with ThreadPoolExecutor(min(self.threads, len(jobs))) as pool:
+                results = list(pool.map(lambda job: _draw_band(*job), jobs))
+        else:
+            results = [_draw_band(*job) for job in jobs]
+        checksum = 1
+        for rows, _ in results:
+            checksum = zlib.adler32(rows, checksum)
+        idat = (
+            b"\x78\x9c"
+            + b"".join(data for _, data in results)
+            + struct.pack(">I", checksum)
+        )
+        return (
+            PNG_SIGNATURE
+            + _chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + _chunk(b"pHYs", struct.pack(">IIB", *([round(self.dpi / 0.0254)] * 2), 1))
+            + _chunk(b"IDAT", idat)
+            + _chunk(b"IEND", b"")
+        )
+
+
+################################################################################
+#   Command line
+################################################################################
+
+
+def main(argv=None):
+    from backends import parse_pages
+    from compose import Sources
+    from pipeline import load_config, make_calendar
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--config", default="calendar.ini")
+    parser.add_argument(
+        "--pages", type=parse_pages, help='pages to draw, e.g. "3-4,7" (default all)'
+    )
+    parser.add_argument("--dpi", type=int, help=f"resolution (default {PREVIEW_DPI})")
+    parser.add_argument(
+        "--thumbnail",
+        action="store_true",
+        help=f"draw small pages quickly ({THUMBNAIL_DPI} dpi)",
+    )
+    parser.add_argument("-j", "--threads", type=int, help="threads per page")
+    parser.add_argument(
+        "-p",
+        "--processes",
+        type=int,
+        help="draw pages in this many processes (0 = one per CPU)",
+    )
+    parser.add_argument("-o", "--output", default="preview", help="output directory")
+    args = parser.parse_args(argv)
+    dpi = args.dpi or (THUMBNAIL_DPI if args.thumbnail else PREVIEW_DPI)
+
+    # Problems with calendar.ini, the data files and the pictures are all
+    # ValueErrors (like ThemeError and PreflightError), as in makecalendar.py
+    try:
+        cfg = load_config(args.config)
+        renderer = RasterRenderer(
+            args.output, ImageCache.from_config(cfg, dpi), dpi, args.pages, args.threads
+        )
+        sources = Sources.in_directory(os.path.dirname(os.path.abspath(args.config)))
+        make_calendar(cfg, sources, target=renderer, processes=args.processes)
+    except (FileNotFoundError, ValueError) as e:
+        print(e)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
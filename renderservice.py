@@ -0,0 +1,391 @@
+"""A long-running service that makes calendars over HTTP.
+
+    python renderservice.py --port 8750 --jobs 2
+
+A job is a zip archive of a calendar's files, laid out as in the project
+folder: calendar.ini, birthdays.txt, the other data files and the pictures
+(at the top of the archive, or in one folder).  Send it to the service and
+get the PDF back:
+
+    curl --data-binary @doe.zip -o doe.pdf http://localhost:8750/render
+    curl --data-binary @doe.zip -o doe.pdf "http://localhost:8750/render?pages=1-3"
+
+Problems with the job (a broken archive, calendar.ini or pictures) are
+answered with "400 Bad Request" and what the calendar printed while it was
+being made; GET /status returns the number of jobs running, waiting and done
+as JSON.
+
+Calendars are made in a pool of ``--jobs`` worker processes that keep
+running between jobs, so interpreter startup and loading the modules are
+paid for once, and each worker keeps what it has loaded for the next job:
+the font index and parsed fonts, text measurements, compiled themes (see
+pipeline.compiled_theme()) and the image caches.  At most ``--queue`` more
+jobs wait for a worker; beyond that jobs are refused with "503 Service
+Unavailable" until some are done.
+
+The settings of calendar.ini that name files or processes on the server
+(the output, the caches and the trace file) are the service's, not the
+job's.  LocalClient sends jobs to a service in the same process, without
+HTTP, for tests.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import traceback
+import zipfile
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from backends import parse_pages
+from compose import Sources
+from filecache import MEGABYTE
+from fonts import font_index
+from pipeline import load_config, make_calendar
+
+DEFAULT_PORT = 8750
+
+# Largest job archive accepted, and largest total size of the files in it
+MAX_JOB_BYTES = 200 * MEGABYTE
+MAX_UNPACKED_BYTES = 1000 * MEGABYTE
+
+# [General] settings of calendar.ini set by the service, not by jobs
+SERVICE_SETTINGS = (
+    "Output",
+    "Output-file",
+    "Image-cache",
+    "Image-cache-size",
+    "Page-cache",
+    "Page-cache-size",
+    "Result-cache",
+    "Result-cache-size",
+    "Trace-file",
+    "Render-processes",
+)
+
+TEXT = "text/plain; charset=utf-8"
+
+
+class JobError(ValueError):
+    """A job archive that can't be made into a calendar."""
+
+
+class Reply(namedtuple("Reply", "status content_type body")):
+    """An answer to a request: HTTP status code, content type and bytes."""
+
+    __slots__ = ()
+
+    @classmethod
+    def text(cls, status, text):
+        return cls(status, TEXT, text.encode("utf-8"))
+
+
+################################################################################
+#   Jobs
+################################################################################
+
+
+def pack_job(directory):
+    """Return a job archive of the calendar in ``directory``.
+
+    Contains calendar.ini, the data files and the pictures (all .jpg, .jpeg
+    and .png files).
+    """
+    data_files = {"calendar.ini"} | {
+        os.path.basename(path) for path in Sources.in_directory(directory).data_files
+    }
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if not os.path.isfile(path):
+                continue
+            if name in data_files:
+                zf.write(path, name, zipfile.ZIP_DEFLATED)
+            elif name.lower().endswith((".jpg", ".jpeg", ".png")):
+                # Already compressed
+                zf.write(path, name, zipfile.ZIP_STORED)
+    return archive.getvalue()
+
+
+def unpack_job(archive, directory):
+    """Unpack a job archive into ``directory``; returns the calendar's folder."""
+    try:
+        zf = zipfile.ZipFile(io.BytesIO(archive))
+    except zipfile.BadZipFile as e:
+        raise JobError(f"Not a zip archive: {e}") from None
+    with zf:
+        members = zf.infolist()
+        if sum(member.file_size for member in members) > MAX_UNPACKED_BYTES:
+            raise JobError("The files in the archive are too large")
+        configs = sorted(
+            (member.filename for member in members if not member.is_dir()),
+            key=lambda name: (name.count("/"), name),
+        )
+        configs = [name for name in configs if name.split("/")[-1] == "calendar.ini"]
+        if not configs or configs[0].count("/") > 1:
+            raise JobError("No calendar.ini at the top of the archive or in a folder")
+        try:
+            # Leaves out absolute paths and ".." in member names
+            zf.extractall(directory)
+        except (zipfile.BadZipFile, OSError) as e:
+            raise JobError(f"Broken zip archive: {e}") from None
+    return os.path.join(directory, os.path.dirname(configs[0]))
+
+
+def job_config(path, cache_dir=None):
+    """Read a job's calendar.ini, with the service's settings in place."""
+    cfg = load_config(path)
+    if not cfg.has_section("General"):
+        raise JobError("calendar.ini has no [General] section")
+    for key in SERVICE_SETTINGS:
+        cfg.remove_option("General", key)
+    if cache_dir is not None:
+        cfg.set("General", "Image-cache", os.path.join(cache_dir, "images"))
+        cfg.set("General", "Page-cache", os.path.join(cache_dir, "pages"))
+        cfg.set("General", "Result-cache", os.path.join(cache_dir, "results"))
+    return cfg
+
+
+def render_job(archive, pages=None, cache_dir=None):
+    """Make the calendar of a job archive into a PDF; returns a Reply.
+
+    Never raises, as it runs in worker processes.
+    """
+    log = io.StringIO()
+    try:
+        with tempfile.TemporaryDirectory(prefix="calendar-job-") as directory:
+            with contextlib.redirect_stdout(log):
+                folder = unpack_job(archive, os.path.join(directory, "job"))
+                cfg = job_config(os.path.join(folder, "calendar.ini"), cache_dir)
+                output = os.path.join(directory, "calendar.pdf")
+                make_calendar(
+                    cfg,
+                    Sources.in_directory(folder),
+                    output,
+                    processes=1,
+                    backend="pdf",
+                    pages=pages,
+                )
+            with open(output, "rb") as f:
+                return Reply(200, "application/pdf", f.read())
+    except (FileNotFoundError, ValueError) as e:
+        # Also ThemeError, PreflightError and JobError
+        return Reply.text(400, f"{log.getvalue()}{e}\n")
+    except Exception:
+        return Reply.text(500, log.getvalue() + traceback.format_exc())
+
+
+def _start_worker():
+    # Load the font index before the first job instead of during it
+    with contextlib.redirect_stdout(io.StringIO()):
+        font_index()
+
+
+################################################################################
+#   Service
+################################################################################
+
+
+class RenderService:
+    """Makes calendars in ``jobs`` worker processes, with ``queue`` waiting.
+
+    With ``jobs`` = 0 they are made one at a time in the calling process
+    instead.  ``cache_dir`` is the directory for the picture, page and
+    result caches (default the usual per-user cache directories).
+    """
+
+    def __init__(self, jobs=1, queue=16, cache_dir=None):
+        self.jobs = jobs
+        self.queue = queue
+        self.cache_dir = cache_dir
+        self.pool = self._new_pool() if jobs else None
+        self._slots = threading.BoundedSemaphore(max(1, jobs) + queue)
+        # Serializes jobs made in this process, whose output is redirected
+        self._in_process = threading.Lock()
+        self._lock = threading.Lock()
+        self.counts = Counter()
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(self.jobs, initializer=_start_worker)
+
+    def _count(self, name, change=1):
+        with self._lock:
+            self.counts[name] += change
+
+    def render(self, archive, pages=None):
+        """Make the calendar of a job archive; returns a Reply."""
+        if len(archive) > MAX_JOB_BYTES:
+            return Reply.text(413, "The job archive is too large\n")
+        if not self._slots.acquire(blocking=False):
+            self._count("refused")
+            return Reply.text(503, "Too many jobs waiting; try again later\n")
+        self._count("in_progress")
+        try:
+            if self.pool is None:
+                with self._in_process:
+                    reply = render_job(archive, pages, self.cache_dir)
+            else:
+                reply = self._render_in_worker(archive, pages)
+        finally:
+            self._count("in_progress", -1)
+            self._slots.release()
+        self._count("done" if reply.status == 200 else "failed")
+        return reply
+
+    def _render_in_worker(self, archive, pages):
+        pool = self.pool
+        try:
+            return pool.submit(render_job, archive, pages, self.cache_dir).result()
+        except BrokenProcessPool:
+            # Start new workers for the next jobs
+            with self._lock:
+                if self.pool is pool:
+                    self.pool = self._new_pool()
+            pool.shutdown(wait=False)
+            return Reply.text(500, "The worker process died\n")
+
+    def status(self):
+        """Return the numbers of jobs running, waiting, done etc."""
+        with self._lock:
+            counts = dict(self.counts)
+        in_progress = counts.pop("in_progress", 0)
+        workers = max(1, self.jobs)
+        return {
+            "workers": workers,
+            "running": min(in_progress, workers),
+            "waiting": max(0, in_progress - workers),
+            "queue": self.queue,
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "refused": counts.get("refused", 0),
+        }
+
+    def handle(self, method, target, body=b""):
+        """Answer the request ``method`` (e.g. "POST") for the URL ``target``."""
+        url = urlsplit(target)
+        if url.path == "/render":
+            if method != "POST":
+                return Reply.text(405, "Send the job archive with POST\n")
+            pages = parse_qs(url.query).get("pages")
+            try:
+                pages = parse_pages(pages[-1]) if pages else None
+            except ValueError as e:
+                self._count("failed")
+                return Reply.text(400, f"pages: {e}\n")
+            return self.render(body, pages)
+        if url.path == "/status":
+            if method != "GET":
+                return Reply.text(405, "Use GET\n")
+            return Reply(200, "application/json", json.dumps(self.status()).encode())
+        return Reply.text(404, f"No such page: {url.path}\n")
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+
+class LocalClient:
+    """Sends requests to a RenderService in this process, without HTTP.
+
+    By default the service makes the calendars in this process too.
+    """
+
+    def __init__(self, service=None):
+        self.service = service if service is not None else RenderService(jobs=0)
+
+    def render(self, archive, pages=None):
+        """Return the Reply to a job archive; ``pages`` is e.g. "1-3"."""
+        target = "/render" if pages is None else f"/render?pages={pages}"
+        return self.service.handle("POST", target, archive)
+
+    def render_directory(self, directory, pages=None):
+        """Return the Reply to a job of the calendar in ``directory``."""
+        return self.render(pack_job(directory), pages)
+
+    def status(self):
+        return json.loads(self.service.handle("GET", "/status").body)
+
+
+################################################################################
+#   HTTP server
+################################################################################
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    server_version = "CalendarRenderService/1.0"
+    # Answers "Expect: 100-continue", which clients like curl send before a
+    # large job archive, instead of making them wait before sending it
+    protocol_version = "HTTP/1.1"
+    # Set on the subclass made by serve()
+    service = None
+
+    def _reply(self, reply):
+        self.send_response(reply.status)
+        self.send_header("Content-Type", reply.content_type)
+        self.send_header("Content-Length", str(len(reply.body)))
+        self.end_headers()
+        self.wfile.write(reply.body)
+
+    def do_GET(self):
+        self._reply(self.service.handle("GET", self.path))
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            self._reply(Reply.text(411, "Content-Length is required\n"))
+            return
+        if length > MAX_JOB_BYTES:
+            self.close_connection = True
+            self._reply(Reply.text(413, "The job archive is too large\n"))
+            return
+        self._reply(self.service.handle("POST", self.path, self.rfile.read(length)))
+
+
+def serve(service, host="127.0.0.1", port=DEFAULT_PORT):
+    """Answer HTTP requests with ``service`` until interrupted."""
+    handler = type("Handler", (RequestHandler,), {"service": service})
+    with ThreadingHTTPServer((host, port), handler) as server:
+        print(f"Serving calendars on http://{host}:{server.server_port}/render")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="calendars made at the same time (default: one per CPU)",
+    )
+    parser.add_argument(
+        "--queue", type=int, default=16, help="jobs that may wait for a worker"
+    )
+    parser.add_argument("--cache-dir", help="directory for the picture and page caches")
+    args = parser.parse_args(argv)
+
+    service = RenderService(max(1, args.jobs), args.queue, args.cache_dir)
+    try:
+        serve(service, args.host, args.port)
+    finally:
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
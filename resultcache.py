@@ -0,0 +1,116 @@
+"""Finished PDF files, kept under a fingerprint of everything they are made of.
+
+The fingerprint covers the settings of calendar.ini that change the
+document (not where it is written or how it is cached), the content of the
+data files and of the pictures it uses, the fonts, the selected pages and
+the program's own source code.  Making a calendar whose fingerprint is in
+the result cache (see ``Result-cache`` in calendar.ini) copies the document
+from there instead of making it, so ordering the same calendar again, or a
+batch of mostly unchanged calendars, costs little more than reading the
+files.  Changing anything makes a new fingerprint, and the pages that did
+not change still come from the page cache (see pdfwriter.py).
+"""
+
+import functools
+import os
+
+from compose import find_picture
+from displaylist import FW_BOLD
+from filecache import MEGABYTE, FileCache, default_cache_dir, make_key
+from fonts import face_key, find_face
+from imagecache import file_hash
+from preflight import expected_pictures
+
+# Changes whenever the cached documents would be made differently
+RESULT_FORMAT = 1
+
+# [General] settings that don't change the document
+IGNORED_SETTINGS = frozenset(
+    key.lower()
+    for key in (
+        "Output",
+        "Output-file",
+        "Printer",
+        "Preflight",
+        "Min-picture-DPI",
+        "Image-cache",
+        "Image-cache-size",
+        "Page-cache",
+        "Page-cache-size",
+        "Result-cache",
+        "Result-cache-size",
+        "Trace-file",
+        "Render-processes",
+    )
+)
+
+
+def result_cache(cfg):
+    """Return the FileCache of finished documents set up in calendar.ini, or None."""
+    directory = cfg.get("General", "Result-cache", fallback="").strip()
+    size = cfg.getint("General", "Result-cache-size", fallback=500)
+    if not size:
+        return None
+    return FileCache(directory or default_cache_dir("results"), size * MEGABYTE)
+
+
+@functools.lru_cache(maxsize=None)
+def code_version():
+    """Return a hash of the source files of the program."""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    names = sorted(name for name in os.listdir(directory) if name.endswith(".py"))
+    return make_key(
+        *(
+            part
+            for name in names
+            for part in (name, file_hash(os.path.join(directory, name)))
+        )
+    )
+
+
+def normalized_config(cfg):
+    """Return the settings of calendar.ini contents that change the document.
+
+    The order of sections and settings, the case of setting names and
+    comments make no difference.
+    """
+    return repr(
+        sorted(
+            (
+                section,
+                sorted(
+                    (key, value.strip())
+                    for key, value in cfg.items(section)
+                    if section != "General" or key not in IGNORED_SETTINGS
+                ),
+            )
+            for section in cfg.sections()
+        )
+    )
+
+
+def _content(path):
+    if path is None or not os.path.isfile(path):
+        return "missing"
+    return file_hash(path)
+
+
+def document_key(cfg, theme, sources, pages=None):
+    """Return the fingerprint of the PDF file of a calendar.
+
+    ``pages`` is the set of the numbers of the pages output, or None for all.
+    """
+    parts = ["pdf-document", RESULT_FORMAT, code_version(), normalized_config(cfg)]
+    parts.append(repr(sorted(pages)) if pages is not None else "all pages")
+    for path in sources.data_files:
+        parts.append(_content(path))
+    if not theme.skip_bitmaps:
+        for names, _ in expected_pictures(theme):
+            parts.append(_content(find_picture(sources.images, names)))
+    for style in theme.styles:
+        face = find_face(style.font.name, bold=style.font.weight >= FW_BOLD)
+        parts.append(repr(face_key(face)))
+        # By content too, as font files can be updated in place
+        path = getattr(face, "path", None)
+        parts.append(file_hash(path) if path else "built-in")
+    return make_key(*parts)
@@ -0,0 +1,121 @@
+"""Tests of the address book layout: splitting, pagination and balancing."""
+
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from addressbook import (
+    Entry,
+    _columns,
+    balance,
+    check_addresses,
+    paginate,
+    read_entries,
+)
+from displaylist import Font
+from theme import TextStyle
+
+LINE = 200
+
+
+class FakeTheme:
+    """The Addresses, Addresses-name and Addresses-email styles."""
+
+    def __init__(self):
+        font = Font("Helvetica", LINE, 0, 400, False)
+        self._styles = {
+            name: TextStyle(font, 0)
+            for name in ("addresses", "addresses-name", "addresses-email")
+        }
+        self.styles = SimpleNamespace(addresses=self._styles["addresses"])
+
+    def style(self, name):
+        return self._styles.get(name.lower())
+
+
+def generated_entries(count, seed):
+    """Entries of 1 to 9 lines, told apart by their ``lines``."""
+    rng = random.Random(seed)
+    return [
+        Entry((n,), 0 if n == 0 else rng.choice((0, LINE)), rng.randint(1, 9) * LINE)
+        for n in range(count)
+    ]
+
+
+def column_height(column):
+    return sum(entry.height + (entry.gap if i else 0) for i, entry in enumerate(column))
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("columns", [1, 2, 3])
+def test_paginate_keeps_every_entry_once(seed, columns):
+    height = 20 * LINE
+    entries = generated_entries(300, seed)
+    pages = list(paginate(iter(entries), columns, height))
+    assert len(pages) > 1
+    laid_out = [entry for page in pages for column in page for entry in column]
+    assert laid_out == entries
+    for page in pages:
+        assert 1 <= len(page) <= columns
+        for column in page:
+            assert column and column_height(column) <= height
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_columns_are_balanced(seed):
+    height = 40 * LINE
+    for page in paginate(iter(generated_entries(200, seed)), 3, height):
+        entries = [entry for column in page for entry in column]
+        longest = max(column_height(column) for column in page)
+        # No shorter column length would fit the page's entries
+        assert len(_columns(entries, longest - 1)) > 3 or longest == max(
+            entry.height for entry in entries
+        )
+
+
+def test_balance_spreads_evenly():
+    entries = [Entry((n,), 0, LINE) for n in range(9)]
+    assert [len(column) for column in balance(entries, 3, 100 * LINE)] == [3, 3, 3]
+
+
+def test_no_entries():
+    # One page, without any entries
+    (page,) = paginate(iter([]), 2, 1000)
+    assert not any(page)
+
+
+def test_tall_entries_are_split():
+    theme = FakeTheme()
+    lines = ["@name:Big family\n"] + [f"Line {n}\n" for n in range(25)] + ["\n"]
+    lines += ["@name:Small\n", "1 Street\n"]
+    entries = list(read_entries(lines, theme, 5000, 10 * LINE))
+    assert [len(entry.lines) for entry in entries] == [10, 10, 6, 2]
+    assert all(entry.height <= 10 * LINE for entry in entries)
+    # Pieces after the first go at the top of their column
+    assert [entry.gap for entry in entries] == [0, 0, 0, LINE]
+    texts = [line.text for entry in entries[:3] for line in entry.lines]
+    assert texts == ["Big family"] + [f"Line {n}" for n in range(25)]
+
+
+def test_lines_wrap_to_the_column():
+    theme = FakeTheme()
+    (entry,) = read_entries(["@name:" + "Long name " * 30], theme, 2000, 100 * LINE)
+    assert entry.height == entry.lines[0].height > LINE
+
+
+def test_check_addresses(tmp_path):
+    theme = FakeTheme()
+    path = tmp_path / "addresses.txt"
+    path.write_text("@name:Doe\n1 Main St\n@comment:left out\n@email:a@b.c\n")
+    check_addresses(str(path), theme)
+    check_addresses(str(tmp_path / "missing.txt"), theme)
+
+    path.write_text("@name:Doe\n@phone:555\n")
+    with pytest.raises(
+        ValueError, match=r"addresses.txt:2: No font for 'Addresses-phone'"
+    ):
+        check_addresses(str(path), theme)
+    path.write_text("@name Doe\n")
+    with pytest.raises(ValueError, match=r"addresses.txt:1: Expected @<tag>:<text>"):
+        check_addresses(str(path), theme)
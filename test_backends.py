@@ -0,0 +1,35 @@
+"""Tests of page selections."""
+
+import pytest
+
+from backends import MAX_PAGES, backend_class, check_selection, parse_pages
+
+
+def test_parse_pages():
+    assert parse_pages("3-4,7") == {3, 4, 7}
+    assert parse_pages(" 2 , 2-3 ") == {2, 3}
+    assert len(parse_pages(f"1-{MAX_PAGES}")) == MAX_PAGES
+
+
+@pytest.mark.parametrize(
+    "text", ["0", "4-3", "0-2", "x", "-2", "", f"1-{MAX_PAGES + 1}", "1-1000000000"]
+)
+def test_bad_page_ranges(text):
+    with pytest.raises(ValueError):
+        parse_pages(text)
+
+
+def test_check_selection():
+    check_selection(None, 28)
+    check_selection({1, 28}, 28)
+    with pytest.raises(ValueError, match="Page 30 was selected"):
+        check_selection({2, 30}, 28)
+
+
+def test_printer_only_on_windows(monkeypatch):
+    monkeypatch.setattr("sys.platform", "linux")
+    with pytest.raises(ValueError, match="only available on Windows"):
+        backend_class("printer")
+    assert backend_class("pdf").__name__ == "PDFWriter"
+    with pytest.raises(ValueError, match="Unknown output"):
+        backend_class("fax")
@@ -0,0 +1,105 @@
+"""Tests of the birthday store: leap days, orders and repeated lookups."""
+
+import pytest
+
+from events import ANNIVERSARY, BIRTHDAY, HOLIDAY, EventStore
+from observances import compile_rules
+
+LINES = [
+    "# Comments and blank lines are ignored",
+    "",
+    "2/29/1996 Leap",
+    "2/28/1990 Zoe",
+    "3/1/1950 Adam",
+    "7/4/1980 Mary & John",
+    "7/4/1940 bob",
+    "7/4/1960 Carol",
+]
+
+
+def names(events):
+    return [event.name for event in events]
+
+
+def store(**kwargs):
+    events = EventStore(**kwargs)
+    assert events.load_lines(LINES) == 6
+    return events
+
+
+@pytest.mark.parametrize(
+    "policy, feb28, mar1",
+    [
+        ("feb28", ["Leap", "Zoe"], ["Adam"]),
+        ("mar1", ["Zoe"], ["Leap", "Adam"]),
+        ("skip", ["Zoe"], ["Adam"]),
+    ],
+)
+def test_leap_day_in_other_years(policy, feb28, mar1):
+    events = store(leap_day=policy)
+    for year in (2023, 2025, 1900, 2100):
+        assert names(events.on(2, 28, year)) == feb28
+        assert names(events.on(3, 1, year)) == mar1
+
+
+@pytest.mark.parametrize("policy", ["feb28", "mar1", "skip"])
+def test_leap_day_in_leap_years(policy):
+    events = store(leap_day=policy)
+    for year in (2024, 2000):
+        assert names(events.on(2, 28, year)) == ["Zoe"]
+        assert names(events.on(2, 29, year)) == ["Leap"]
+        assert names(events.on(3, 1, year)) == ["Adam"]
+    # Without a year, only the day's own events
+    assert names(events.on(2, 28)) == ["Zoe"]
+
+
+@pytest.mark.parametrize(
+    "order, expected",
+    [
+        ("file", ["Mary & John", "bob", "Carol"]),
+        ("age", ["bob", "Carol", "Mary & John"]),
+        ("name", ["bob", "Carol", "Mary & John"]),
+    ],
+)
+def test_orders(order, expected):
+    events = store(order=order)
+    assert names(events.on(7, 4, 2025)) == expected
+
+
+def test_order_of_added_events():
+    events = store(order="age")
+    assert names(events.on(7, 4, 2025))[0] == "bob"
+    events.load_lines(["7/4/1930 Old"])
+    assert names(events.on(7, 4, 2025)) == ["Old", "bob", "Carol", "Mary & John"]
+    assert len(events) == 7
+
+
+def test_repeated_lookups():
+    events = store()
+    first = events.on(7, 4, 2025)
+    assert events.on(7, 4, 2025) == first == events.on(7, 4, 1999)
+    assert events.on(12, 25, 2025) == ()
+    assert names(events.in_month(7)) == ["Mary & John", "bob", "Carol"]
+    kinds = {event.name: event.kind for event in first}
+    assert kinds["Mary & John"] == ANNIVERSARY and kinds["bob"] == BIRTHDAY
+
+
+def test_holidays_come_first():
+    events = store(holidays=compile_rules("7/4 Independence Day\n"))
+    on = events.on(7, 4, 2025)
+    assert names(on)[0] == "Independence Day" and on[0].kind == HOLIDAY
+    assert len(on) == 4
+    assert names(events.on(7, 4)) == ["Mary & John", "bob", "Carol"]
+
+
+@pytest.mark.parametrize(
+    "kwargs", [{"leap_day": "mar2"}, {"order": "height"}], ids=["leap", "order"]
+)
+def test_unknown_settings(kwargs):
+    with pytest.raises(ValueError):
+        EventStore(**kwargs)
+
+
+def test_bad_line():
+    with pytest.raises(ValueError, match="birthdays.txt:2:"):
+        EventStore().load_lines(["1/1/2000 A", "13-1-2000 B"], "birthdays.txt")
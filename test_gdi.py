@@ -0,0 +1,132 @@
+"""Tests of gdi.DC's object cache, against a fake gdi32 (runs anywhere)."""
+
+import gdi
+from gdi import DC, OBJ_BRUSH, OBJ_FONT, OBJ_PEN
+
+HDC = 1
+# The DC's own font, pen and brush, selected before any of ours
+ORIGINAL = {"font": 11, "pen": 12, "brush": 13}
+
+
+class FakeGdi32:
+    """Records the calls made and hands out new handles."""
+
+    def __init__(self):
+        self.calls = []
+        self.next_handle = 100
+        self.kinds = {handle: kind for kind, handle in ORIGINAL.items()}
+        self.live = set()
+        self.selected = dict(ORIGINAL)
+
+    def _create(self, kind):
+        self.next_handle += 1
+        self.kinds[self.next_handle] = kind
+        self.live.add(self.next_handle)
+        return self.next_handle
+
+    def CreateFontW(self, *args):
+        self.calls.append(("CreateFontW",) + args)
+        return self._create("font")
+
+    def CreatePen(self, *args):
+        self.calls.append(("CreatePen",) + args)
+        return self._create("pen")
+
+    def CreateSolidBrush(self, *args):
+        self.calls.append(("CreateSolidBrush",) + args)
+        return self._create("brush")
+
+    def SelectObject(self, hdc, handle):
+        self.calls.append(("SelectObject", hdc, handle))
+        kind = self.kinds[handle]
+        old, self.selected[kind] = self.selected[kind], handle
+        return old
+
+    def DeleteObject(self, handle):
+        self.calls.append(("DeleteObject", handle))
+        assert handle not in self.selected.values(), "deleted while selected"
+        self.live.remove(handle)
+
+    def SetTextColor(self, hdc, color):
+        self.calls.append(("SetTextColor", hdc, color))
+
+    def DeleteDC(self, hdc):
+        self.calls.append(("DeleteDC", hdc))
+
+    def count(self, name):
+        return sum(1 for call in self.calls if call[0] == name)
+
+
+def make_dc():
+    gdi32 = FakeGdi32()
+    return DC(HDC, gdi32, user32=object()), gdi32
+
+
+def test_repeated_objects_are_created_once():
+    dc, gdi32 = make_dc()
+    for _ in range(3):
+        dc.SetFont("Arial", 200)
+        dc.SetFont("Arial", 300, weight=700)
+        dc.SetPen(10, 0x000000)
+        dc.SetBrush(0xFF0000)
+    assert gdi32.count("CreateFontW") == 2
+    assert gdi32.count("CreatePen") == 1
+    assert gdi32.count("CreateSolidBrush") == 1
+    assert dc.created == {OBJ_FONT: 2, OBJ_PEN: 1, OBJ_BRUSH: 1}
+    assert dc.SetFont("Arial", 200) == dc.SetFont("Arial", 200)
+
+
+def test_redundant_state_changes_are_skipped():
+    dc, gdi32 = make_dc()
+    dc.SetFont("Arial", 200)
+    dc.SetFont("Arial", 200)
+    dc.SetPen(10, 0)
+    dc.SetPen(10, 0)
+    dc.SetTextColor(0x0000FF)
+    dc.SetTextColor(0x0000FF)
+    assert gdi32.count("SelectObject") == 2
+    assert gdi32.count("SetTextColor") == 1
+
+    dc.SetFont("Arial", 300)
+    dc.SetFont("Arial", 200)
+    dc.SetTextColor(0)
+    assert gdi32.count("SelectObject") == 4
+    assert gdi32.count("SetTextColor") == 2
+
+
+def test_delete_restores_originals_and_deletes_handles():
+    dc, gdi32 = make_dc()
+    dc.SetFont("Arial", 200)
+    dc.SetFont("Arial", 300)
+    dc.SetPen(10, 0)
+    dc.SetBrush(0xFFFFFF)
+    assert len(gdi32.live) == 4
+    dc.Delete()
+    assert gdi32.selected == ORIGINAL
+    assert not gdi32.live
+    assert gdi32.calls[-1] == ("DeleteDC", HDC)
+    assert dc.hdc is None
+    # A second Delete() does nothing
+    calls = len(gdi32.calls)
+    dc.Delete()
+    assert len(gdi32.calls) == calls
+
+
+def test_unselected_objects_are_evicted_at_max_objects(monkeypatch):
+    monkeypatch.setattr(gdi, "MAX_OBJECTS", 4)
+    dc, gdi32 = make_dc()
+    pen = dc.SetPen(10, 0)
+    for height in (100, 200, 300):
+        dc.SetFont("Arial", height)
+    assert gdi32.count("DeleteObject") == 0
+
+    # The fifth object makes room by deleting all but the selected font and pen
+    dc.SetBrush(0xFFFFFF)
+    assert gdi32.count("DeleteObject") == 2
+    assert len(gdi32.live) == 3
+    assert pen in gdi32.live
+    # The selected font was kept; an evicted one is created again
+    dc.SetFont("Arial", 300)
+    assert gdi32.count("CreateFontW") == 3
+    dc.SetFont("Arial", 100)
+    assert gdi32.count("CreateFontW") == 4
@@ -0,0 +1,72 @@
+"""Tests of the month grid geometry: week start, row counts and Fit-rows."""
+
+import datetime
+
+import pytest
+
+from grid import MAX_ROWS, MONDAY, SUNDAY, month_grid, month_grids
+
+BOX = (100, 200, 7100, 6200)
+
+
+@pytest.mark.parametrize(
+    "year, month, week_start, rows",
+    [
+        (2015, 2, SUNDAY, 4),  # 28 days from a Sunday
+        (2015, 2, MONDAY, 5),
+        (2015, 8, SUNDAY, 6),  # 31 days from a Saturday
+        (2025, 3, SUNDAY, 6),
+        (2025, 3, MONDAY, 6),
+        (2021, 2, MONDAY, 4),  # 28 days from a Monday
+        (2024, 2, SUNDAY, 5),  # Leap year
+    ],
+)
+def test_rows(year, month, week_start, rows):
+    grid = month_grid(year, month, week_start, BOX)
+    assert grid.rows == rows
+    assert max(cell.row for cell in grid.cells) == rows - 1
+
+
+@pytest.mark.parametrize(
+    "year, month, sunday_start, monday_start",
+    [
+        (2025, 9, 1, 0),  # September 1, 2025 is a Monday
+        (2025, 6, 0, 6),  # June 1, 2025 is a Sunday
+        (2015, 8, 6, 5),  # August 1, 2015 is a Saturday
+    ],
+)
+def test_first_column(year, month, sunday_start, monday_start):
+    assert month_grid(year, month, SUNDAY, BOX).first_column == sunday_start
+    assert month_grid(year, month, MONDAY, BOX).first_column == monday_start
+
+
+@pytest.mark.parametrize("week_start", [SUNDAY, MONDAY])
+def test_cells_follow_weekdays(week_start):
+    for grid in month_grids(2026, week_start, BOX):
+        assert len(grid.cells) == grid.days
+        for cell in grid.cells:
+            weekday = grid.date(cell).weekday()
+            assert cell.column == (weekday - week_start) % 7
+
+
+def test_fit_rows():
+    left, top, right, bottom = BOX
+    february = month_grid(2015, 2, SUNDAY, BOX)
+    assert february.cell_height == (bottom - top) // MAX_ROWS
+    # The grid keeps room for six rows, of which the month uses four
+    assert february.lines[-1][1] == top + MAX_ROWS * february.cell_height
+
+    fitted = month_grid(2015, 2, SUNDAY, BOX, fit_rows=True)
+    assert fitted.rows == 4
+    assert fitted.cell_height == (bottom - top) // 4
+    assert fitted.cells[-1].bottom == top + 4 * fitted.cell_height <= bottom
+    assert fitted.cell_width == february.cell_width == (right - left) // 7
+    # Eight vertical lines and five horizontal ones, outline included
+    assert len(fitted.lines) == 8 + 5
+
+
+def test_grids_are_remembered():
+    assert month_grids(2026, MONDAY, BOX) is month_grids(2026, MONDAY, BOX)
+    assert month_grid(2026, 1, MONDAY, list(BOX)) == month_grids(2026, MONDAY, BOX)[0]
+    first = month_grid(2026, 1).cells[0]
+    assert month_grid(2026, 1).date(first) == datetime.date(2026, 1, 1)
@@ -0,0 +1,108 @@
+"""Tests of JPEG header reading and of when pdfwriter embeds JPEG files as they are."""
+
+import struct
+
+import pytest
+
+from jpeginfo import JpegError, read_jpeg_info
+from pdfwriter import PASSTHROUGH_LIMIT, PDFWriter
+
+BASELINE, PROGRESSIVE, ARITHMETIC = 0xC0, 0xC2, 0xC9
+
+
+def _segment(marker, data):
+    return b"\xff" + bytes([marker]) + struct.pack(">H", len(data) + 2) + data
+
+
+def jpeg_header(width, height, components=3, marker=BASELINE, bits=8, adobe=None):
+    """Return the markers of a JPEG file up to its frame header (no scan data)."""
+    data = b"\xff\xd8" + _segment(0xE0, b"JFIF\0\1\1\0\0\1\0\1\0\0")
+    if adobe is not None:
+        data += _segment(0xEE, b"Adobe\0\x64\0\0\0\0" + bytes([adobe]))
+    frame = struct.pack(">BHHB", bits, height, width, components)
+    frame += b"".join(bytes([i + 1, 0x11, 0]) for i in range(components))
+    return data + _segment(marker, frame)
+
+
+@pytest.fixture
+def write(tmp_path):
+    def write(data, name="picture.jpg"):
+        path = tmp_path / name
+        path.write_bytes(data)
+        return str(path)
+
+    return write
+
+
+def test_baseline_rgb(write):
+    info = read_jpeg_info(write(jpeg_header(640, 480)))
+    assert (info.width, info.height, info.components, info.bits) == (640, 480, 3, 8)
+    assert info.marker == BASELINE and info.adobe_transform is None
+    assert info.pdf_embeddable
+
+
+def test_cmyk(write):
+    info = read_jpeg_info(write(jpeg_header(100, 50, components=4, adobe=2)))
+    assert info.components == 4
+    assert info.adobe_transform == 2
+    assert info.pdf_embeddable
+
+
+def test_progressive_is_embeddable(write):
+    # DCTDecode (PDF 1.3 and later) decodes progressive Huffman-coded files
+    assert read_jpeg_info(write(jpeg_header(10, 10, marker=PROGRESSIVE))).pdf_embeddable
+
+
+@pytest.mark.parametrize(
+    "header",
+    [
+        jpeg_header(10, 10, marker=ARITHMETIC),
+        jpeg_header(10, 10, bits=12),
+        jpeg_header(10, 10, components=2),
+    ],
+)
+def test_not_embeddable(write, header):
+    assert not read_jpeg_info(write(header)).pdf_embeddable
+
+
+def test_not_a_jpeg(write):
+    assert read_jpeg_info(write(b"\x89PNG\r\n\x1a\n")) is None
+
+
+@pytest.mark.parametrize("cut", [3, 6, 25, -12])
+def test_truncated(write, cut):
+    with pytest.raises(JpegError):
+        read_jpeg_info(write(jpeg_header(640, 480)[:cut]))
+
+
+def test_scan_before_frame(write):
+    with pytest.raises(JpegError):
+        read_jpeg_info(write(b"\xff\xd8" + _segment(0xDA, b"\0" * 6)))
+
+
+class FakeImages:
+    dpi = 100
+
+
+@pytest.mark.parametrize(
+    "width, header, embedded",
+    [
+        # The box is 100 x 100 pixels at 100 dpi
+        (100, jpeg_header(100, 100), True),
+        (125, jpeg_header(125, 125), True),
+        (126, jpeg_header(126, 126), False),
+        (100, jpeg_header(100, 100, marker=ARITHMETIC), False),
+    ],
+)
+def test_passthrough_limit(write, tmp_path, monkeypatch, width, header, embedded):
+    assert PASSTHROUGH_LIMIT == 1.25
+    written = []
+    writer = PDFWriter(str(tmp_path / "out.pdf"), FakeImages())
+    monkeypatch.setattr(writer, "_write_jpeg", lambda *args: written.append("jpeg"))
+    monkeypatch.setattr(writer, "_write_pixels", lambda *args: written.append("px"))
+    writer.start_document("Test")
+    try:
+        writer._image_object(write(header, f"{width}.jpg"), 1000, 1000)
+    finally:
+        writer.abort_document()
+    assert written == ["jpeg" if embedded else "px"]
@@ -0,0 +1,46 @@
+"""Tests of the makecalendar.py command line."""
+
+import os
+import shutil
+
+import pytest
+
+from makecalendar import main
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture
+def calendar_dir(tmp_path):
+    """A calendar without pictures, in its own folder."""
+    directory = tmp_path / "calendar"
+    directory.mkdir()
+    for name in ("calendar.ini", "birthdays.txt", "holidays.txt", "addresses.txt"):
+        shutil.copy(os.path.join(HERE, name), directory)
+    return directory
+
+
+def test_data_files_next_to_the_config(calendar_dir, tmp_path, monkeypatch, capsys):
+    (calendar_dir / "birthdays.txt").write_text("1/2/2000 Only one\n")
+    monkeypatch.chdir(tmp_path)
+    config = str(calendar_dir / "calendar.ini")
+    assert main(["-c", config, "--check"]) == 0
+    assert "Loaded 1 birthdays." in capsys.readouterr().out
+
+    os.remove(calendar_dir / "birthdays.txt")
+    assert main(["-c", config, "--check"]) == 1
+    assert "birthdays.txt" in capsys.readouterr().out
+
+
+def test_png_pages_past_the_end(calendar_dir, tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(calendar_dir)
+    output = str(tmp_path / "preview")
+    assert main(["-b", "png", "-o", output, "--pages", "300-301"]) == 1
+    assert "Page 301 was selected" in capsys.readouterr().out
+
+
+def test_printer_off_windows(calendar_dir, monkeypatch, capsys):
+    monkeypatch.chdir(calendar_dir)
+    monkeypatch.setattr("sys.platform", "linux")
+    assert main(["-b", "printer"]) == 1
+    assert "only available on Windows" in capsys.readouterr().out
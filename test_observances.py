@@ -0,0 +1,143 @@
+"""Tests of holiday rules against known US holiday dates."""
+
+import datetime
+
+import pytest
+
+from observances import (
+    LAST,
+    EasterOffset,
+    FixedDate,
+    NthWeekday,
+    compile_rules,
+    easter,
+    load_rules,
+    parse_rule,
+)
+
+US_HOLIDAYS = """\
+# Federal holidays, and Easter
+1/1 observed New Year's Day
+1/3Mon Martin Luther King Jr. Day
+5/lastMon Memorial Day
+7/4 observed Independence Day
+9/1Mon Labor Day
+11/4Thu Thanksgiving
+easter-2 Good Friday
+easter Easter
+12/25 observed Christmas Day
+"""
+
+
+@pytest.mark.parametrize(
+    "year, date",
+    [
+        (1818, (3, 22)),
+        (2000, (4, 23)),
+        (2019, (4, 21)),
+        (2024, (3, 31)),
+        (2025, (4, 20)),
+        (2026, (4, 5)),
+        (2038, (4, 25)),
+        (2285, (3, 22)),
+    ],
+)
+def test_easter(year, date):
+    assert easter(year) == datetime.date(year, *date)
+
+
+@pytest.mark.parametrize(
+    "rule, parsed",
+    [
+        ("12/25", FixedDate(12, 25)),
+        ("2/29", FixedDate(2, 29)),
+        ("11/4Thu", NthWeekday(11, 3, 4)),
+        ("5/lastMon", NthWeekday(5, 0, LAST)),
+        ("easter", EasterOffset(0)),
+        ("Easter-2", EasterOffset(-2)),
+        ("easter+49", EasterOffset(49)),
+    ],
+)
+def test_parse_rule(rule, parsed):
+    assert parse_rule(rule) == parsed
+
+
+@pytest.mark.parametrize(
+    "rule", ["13/1", "2/30", "11/6Thu", "11/4Thx", "easter*2", "12-25", "x/1"]
+)
+def test_bad_rules(rule):
+    with pytest.raises(ValueError):
+        parse_rule(rule)
+
+
+@pytest.mark.parametrize(
+    "year, name, date",
+    [
+        (2024, "Martin Luther King Jr. Day", (1, 15)),
+        (2025, "Martin Luther King Jr. Day", (1, 20)),
+        (2021, "Memorial Day", (5, 31)),
+        (2024, "Memorial Day", (5, 27)),
+        (2026, "Memorial Day", (5, 25)),
+        (2025, "Labor Day", (9, 1)),
+        (2023, "Thanksgiving", (11, 23)),
+        (2024, "Thanksgiving", (11, 28)),
+        (2026, "Thanksgiving", (11, 26)),
+        (2024, "Good Friday", (3, 29)),
+        (2025, "Easter", (4, 20)),
+        (2026, "Independence Day", (7, 4)),
+        (2026, "Independence Day (observed)", (7, 3)),
+        (2021, "Independence Day (observed)", (7, 5)),
+        (2022, "Christmas Day (observed)", (12, 26)),
+        (2021, "Christmas Day (observed)", (12, 24)),
+    ],
+)
+def test_us_holidays(year, name, date):
+    rules = compile_rules(US_HOLIDAYS)
+    assert name in rules.on(*date, year)
+    days = [day for day, names in rules.table(year).items() if name in names]
+    assert days == [date]
+
+
+def test_days_off_across_the_new_year():
+    rules = compile_rules(US_HOLIDAYS)
+    # January 1, 2022 is a Saturday: the day off is December 31, 2021
+    assert rules.on(12, 31, 2021) == ("New Year's Day (observed)",)
+    assert rules.on(1, 1, 2022) == ("New Year's Day",)
+    assert "New Year's Day (observed)" not in [
+        name for names in rules.table(2022).values() for name in names
+    ]
+    # January 1, 2023 is a Sunday: the day off is Monday, January 2
+    assert rules.on(1, 2, 2023) == ("New Year's Day (observed)",)
+
+
+def test_observed_monday():
+    rules = compile_rules("12/25 observed-monday Christmas Day\n")
+    # Saturday, December 25, 2021 and Sunday, December 25, 2022
+    assert rules.on(12, 27, 2021) == ("Christmas Day (observed)",)
+    assert rules.on(12, 24, 2021) == ()
+    assert rules.on(12, 26, 2022) == ("Christmas Day (observed)",)
+    # Weekdays have no day off
+    assert len(rules.table(2024)) == 1
+
+
+def test_missing_dates():
+    rules = compile_rules("2/29 Leap Day\n2/5Mon Fifth Monday\n")
+    assert rules.on(2, 29, 2024) == ("Leap Day",)
+    assert rules.table(2025) == {}
+    # February 2027 has no fifth Monday, February 2016 has
+    assert rules.on(2, 29, 2016) == ("Leap Day", "Fifth Monday")
+
+
+def test_same_day_in_file_order():
+    rules = compile_rules("easter+39 Ascension Day\n5/1 May Day\n")
+    # Easter 2008 was on March 23, so Ascension Day was on May 1
+    assert rules.on(5, 1, 2008) == ("Ascension Day", "May Day")
+
+
+def test_bad_line_names_the_line(tmp_path):
+    path = tmp_path / "holidays.txt"
+    path.write_text("1/1 New Year's Day\n\n13/1 Nothing\n")
+    with pytest.raises(ValueError, match=r"holidays.txt: line 3: .*no such month"):
+        load_rules(str(path))
+    with pytest.raises(ValueError, match="no name"):
+        compile_rules("1/1 observed\n")
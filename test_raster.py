@@ -0,0 +1,84 @@
+"""Tests of the PNG preview backend: bands and page selection."""
+
+import os
+import struct
+import zlib
+
+import pytest
+
+import raster
+from displaylist import ALIGN_CENTER, ALIGN_LEFT, DisplayList, Font, render
+from raster import RasterRenderer, band_ops
+
+DPI = 100
+
+
+class NoPictures:
+    misses = 0
+
+
+def pixels(png):
+    """Return the decompressed scanlines of a PNG file made by RasterRenderer."""
+    data, pos = b"", 8
+    while pos < len(png):
+        (length,) = struct.unpack_from(">I", png, pos)
+        if png[pos + 4 : pos + 8] == b"IDAT":
+            data += png[pos + 8 : pos + 8 + length]
+        pos += length + 12
+    return zlib.decompress(data)
+
+
+def sample_page():
+    page = DisplayList(3000, 2000)
+    page.set_pen(10, 0x000000)
+    page.set_brush(0x00FFFF)
+    page.rectangle(100, 100, 2900, 1900)
+    page.set_brush(0xFF0000)
+    for y in range(200, 1800, 150):
+        page.rectangle(200, y, 600, y + 100)
+    page.line(100, 100, 2900, 1900)
+    page.set_font(Font("Helvetica", 120, 0, 400, True))
+    page.set_text_color(0x0000FF)
+    page.text(700, 300, 2800, 300, "Some words wrapped " * 20, ALIGN_LEFT, False)
+    page.text(
+        700, 1500, 2800, 1700, "Clipped\nto its box\nand more", ALIGN_CENTER, True
+    )
+    return page
+
+
+def test_bands_get_only_their_ops():
+    page = sample_page()
+    bands = band_ops(page, DPI, 20, 200)
+    assert len(bands) == 10
+    drawing = [op for op in page.ops if op.kind not in raster.STATE_OPS]
+    replayed = [op for ops in bands for op in ops if op.kind not in raster.STATE_OPS]
+    assert set(replayed) == set(drawing)
+    # Far fewer than every op in every band
+    assert len(replayed) < len(drawing) * len(bands) // 2
+    # A band gets the state in effect for its ops
+    last = bands[-1]
+    assert last[0].kind.startswith("set_")
+
+
+@pytest.mark.parametrize("band_height", [7, 20, 64])
+def test_bands_draw_like_one_band(monkeypatch, band_height):
+    page = sample_page()
+    renderer = RasterRenderer("unused", NoPictures(), DPI, threads=1)
+    monkeypatch.setattr(raster, "BAND_HEIGHT", 10**6)
+    whole = pixels(renderer.draw(page))
+    monkeypatch.setattr(raster, "BAND_HEIGHT", band_height)
+    assert pixels(renderer.draw(page)) == whole
+    renderer.threads = 3
+    assert pixels(renderer.draw(page)) == whole
+
+
+def test_selected_pages(tmp_path):
+    renderer = RasterRenderer(str(tmp_path), NoPictures(), 10, pages={2, 3})
+    render([DisplayList(1000, 1000) for _ in range(3)], renderer)
+    assert sorted(os.listdir(tmp_path)) == ["page-02.png", "page-03.png"]
+
+
+def test_selected_pages_past_the_end(tmp_path):
+    renderer = RasterRenderer(str(tmp_path), NoPictures(), 10, pages={3, 4})
+    with pytest.raises(ValueError, match="Page 4 was selected"):
+        render([DisplayList(1000, 1000) for _ in range(3)], renderer)
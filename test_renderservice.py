@@ -0,0 +1,64 @@
+"""Tests of the render service through LocalClient (no HTTP, no workers)."""
+
+import os
+import shutil
+
+import pytest
+
+from renderservice import LocalClient, RenderService
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture
+def job(tmp_path):
+    """A calendar without pictures (they are left out), to make quickly."""
+    directory = tmp_path / "job"
+    directory.mkdir()
+    for name in ("calendar.ini", "birthdays.txt", "holidays.txt", "addresses.txt"):
+        shutil.copy(os.path.join(HERE, name), directory)
+    return str(directory)
+
+
+@pytest.fixture
+def client(tmp_path):
+    return LocalClient(RenderService(jobs=0, cache_dir=str(tmp_path / "cache")))
+
+
+def test_render_and_status(client, job):
+    reply = client.render_directory(job)
+    assert reply.status == 200
+    assert reply.content_type == "application/pdf"
+    assert reply.body.startswith(b"%PDF-")
+
+    reply = client.render_directory(job, pages="1-2")
+    assert reply.status == 200
+    assert b"/Type /Pages" in reply.body and b"/Count 2 >>" in reply.body
+
+    status = client.status()
+    assert status["done"] == 2
+    assert status["failed"] == status["refused"] == 0
+    assert status["running"] == status["waiting"] == 0
+
+
+def test_bad_upload(client):
+    reply = client.render(b"not a zip archive")
+    assert reply.status == 400
+    assert b"Not a zip archive" in reply.body
+    assert client.status()["failed"] == 1
+
+
+@pytest.mark.parametrize("pages", ["1-1000000000", "3-1", "x"])
+def test_bad_page_selection(client, job, pages):
+    reply = client.render_directory(job, pages=pages)
+    assert reply.status == 400
+    assert reply.body.startswith(b"pages: bad page range")
+    assert client.status()["failed"] == 1
+
+
+def test_pages_past_the_end(client, job):
+    reply = client.render_directory(job, pages="2,500")
+    assert reply.status == 400
+    assert b"Page 500 was selected" in reply.body
+    status = client.status()
+    assert status["done"] == 0 and status["failed"] == 1
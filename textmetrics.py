@@ -0,0 +1,142 @@
+"""Measuring, wrapping and fitting text during page composition.
+
+The pages are laid out before any backend sees them, so the layout has to
+know how much room text takes without asking GDI.  TextMetrics measures
+text in a Font with the same faces and word wrapping as the PDF writer,
+caching the advance of every character it has seen and the width of every
+word, so measuring the same names over and over again costs little.
+
+fit_stack() fits a stack of texts (the birthdays of a day) into a box by
+condensing and/or shrinking their fonts until they are short enough.
+"""
+
+import functools
+from collections import namedtuple
+
+from displaylist import FW_BOLD
+from fonts import ScaledFont, find_face, wrap_text
+
+# How text that does not fit its box is made to fit:
+#   none = leave it as it is, shrink = make the font smaller,
+#   condense = make the font narrower, then smaller if that is not enough
+FIT_MODES = ("none", "shrink", "condense")
+
+# Fonts are made smaller or narrower in steps of STEP down to these factors
+MIN_SCALE = 0.6
+MIN_CONDENSE = 0.75
+STEP = 0.05
+
+# Widths of at most this many distinct strings are remembered per font
+MAX_REMEMBERED = 10000
+
+
+class TextMetrics:
+    """Measures text set in one Font; widths are in mils."""
+
+    def __init__(self, font):
+        self.font = font
+        self.scaled = ScaledFont(
+            font, find_face(font.name, bold=font.weight >= FW_BOLD)
+        )
+        self.line_height = font.height
+        self._advances = {}
+        self._widths = {}
+
+    @property
+    def natural_width(self):
+        """The average character width of the font when it is not condensed."""
+        return self.scaled.face.avg_width * self.scaled.scale
+
+    def advance(self, char):
+        advance = self._advances.get(char)
+        if advance is None:
+            scaled = self.scaled
+            advance = scaled.face.char_width(char) * scaled.scale * scaled.hscale
+            self._advances[char] = advance
+        return advance
+
+    def measure(self, text):
+        width = self._widths.get(text)
+        if width is None:
+            advances = self._advances
+            width = 0
+            for char in text:
+                advance = advances.get(char)
+                if advance is None:
+                    advance = self.advance(char)
+                width += advance
+            if len(self._widths) < MAX_REMEMBERED:
+                self._widths[text] = width
+        return width
+
+    def wrap(self, text, width):
+        """Return the lines ``text`` is broken into in a box ``width`` wide."""
+        return wrap_text(text, width, self.measure)
+
+    def height(self, text, width):
+        return len(self.wrap(text, width)) * self.line_height
+
+
+@functools.lru_cache(maxsize=512)
+def text_metrics(font):
+    """Return the (shared) TextMetrics of a Font."""
+    return TextMetrics(font)
+
+
+def scale_font(font, scale=1.0, condense=1.0):
+    """Return ``font`` made ``scale`` times smaller and ``condense`` narrower."""
+    if scale == 1.0 and condense == 1.0:
+        return font
+    width = font.width
+    if condense != 1.0 and not width:
+        width = text_metrics(font).natural_width
+    return font._replace(
+        height=max(1, round(font.height * scale)),
+        width=max(1, round(width * scale * condense)) if width else 0,
+    )
+
+
+class FittedText(namedtuple("FittedText", "font text lines height")):
+    """A text of a stack, with the font it fits with and its wrapped lines."""
+
+    __slots__ = ()
+
+
+def _layout(items, width, scale, condense):
+    fitted = []
+    for font, text in items:
+        font = scale_font(font, scale, condense)
+        lines = text_metrics(font).wrap(text, width)
+        fitted.append(FittedText(font, text, lines, len(lines) * font.height))
+    return fitted
+
+
+def _steps(start, stop):
+    value = start
+    while value > stop + 1e-9:
+        value = round(value - STEP, 4)
+        yield max(value, stop)
+
+
+def fit_stack(items, width, height, mode="shrink"):
+    """Fit texts stacked on top of each other into a box.
+
+    ``items`` are (Font, text) pairs.  Returns (a list of FittedText, whether
+    they fit); if they cannot be made to fit, they are returned as small and
+    narrow as they are allowed to get.
+    """
+    items = tuple(items)
+    fitted = _layout(items, width, 1.0, 1.0)
+    if sum(f.height for f in fitted) <= height or mode == "none":
+        return fitted, sum(f.height for f in fitted) <= height
+    condense = 1.0
+    if mode == "condense":
+        for condense in _steps(1.0, MIN_CONDENSE):
+            fitted = _layout(items, width, 1.0, condense)
+            if sum(f.height for f in fitted) <= height:
+                return fitted, True
+    for scale in _steps(1.0, MIN_SCALE):
+        fitted = _layout(items, width, scale, condense)
+        if sum(f.height for f in fitted) <= height:
+            return fitted, True
+    return fitted, False
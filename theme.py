@@ -0,0 +1,340 @@
+"""The compiled form of calendar.ini.
+
+compile_theme() reads and checks everything the page composition needs from
+calendar.ini once, resolving layout values to mils against the page size and
+parsing fonts, colors and pens into small immutable records.  All problems
+are reported together in one ThemeError, before any page is made.
+
+Records have one attribute per calendar.ini key, named in lower case with
+underscores ("Front-cover-text" -> front_cover_text); get() looks entries up
+by their calendar.ini name, ignoring case like configparser does.
+"""
+
+from collections import namedtuple
+
+from compose import MONTHS, WEEKDAYS
+from displaylist import FW_BOLD, FW_NORMAL, Font
+from events import EVENT_ORDERS, LEAP_DAY_POLICIES
+from grid import SUNDAY
+from lengths import parse_layout
+from textmetrics import FIT_MODES
+
+
+class ThemeError(ValueError):
+    """calendar.ini has errors; ``errors`` lists all of them."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(
+            "calendar.ini has %i error(s):\n  %s" % (len(errors), "\n  ".join(errors))
+        )
+
+
+class TextStyle(namedtuple("TextStyle", "font color")):
+    __slots__ = ()
+
+
+class Pen(namedtuple("Pen", "width color")):
+    __slots__ = ()
+
+
+class MonthTheme(namedtuple("MonthTheme", "number name year quote box_color")):
+    __slots__ = ()
+
+
+def attribute_name(key):
+    return key.strip().lower().replace("-", "_").replace(" ", "_")
+
+
+def make_record(typename, entries):
+    """Return an immutable record of ``entries`` ({calendar.ini name: value})."""
+    names = {attribute_name(key): key for key in entries}
+    cls = namedtuple(typename, names, rename=True)
+    by_name = {key.lower(): value for key, value in entries.items()}
+
+    def get(self, key, default=None):
+        return by_name.get(key.lower(), default)
+
+    record_cls = type(typename, (cls,), {"__slots__": (), "get": get})
+    return record_cls(**{attr: entries[key] for attr, key in names.items()})
+
+
+# What the pages need from each section, and the number of layout values
+REQUIRED_GENERAL = (
+    "Front-cover-text",
+    "Deaths-title",
+    "Addresses-title",
+    "Credits-title",
+    "Birthday-format",
+)
+REQUIRED_LAYOUT = {
+    "Front-cover-text": 2,
+    "Front-cover-year": 2,
+    "Front-cover-image": 4,
+    "Month-image": 4,
+    "Month": 2,
+    "Year": 2,
+    "Quote": 4,
+    "Weekdays": 1,
+    "Day": 2,
+    "Box": 4,
+    "Grid-margins": 4,
+    "Birthday": 2,
+    "Deaths-image": 4,
+    "Deaths-title": 2,
+    "Deaths": 2,
+    "Addresses-title": 2,
+    "Addresses": 2,
+    "Addresses-wrap": 2,
+    "Credits-title": 2,
+    "Credits": 2,
+}
+REQUIRED_STYLES = (
+    "Front-cover",
+    "Month",
+    "Year",
+    "Quote",
+    "Weekdays",
+    "Day",
+    "Birthday",
+    "Anniversary",
+    "Deaths-title",
+    "Deaths",
+    "Addresses-title",
+    "Addresses",
+    "Credits-title",
+    "Credits",
+)
+REQUIRED_PENS = ("Box-outline", "Grid")
+
+# Layout defaults for keys that older calendar.ini files don't have
+LAYOUT_DEFAULTS = {"Year": "500, 860"}
+
+
+def parse_font(value):
+    """Parse "<font name>, <height>(:<width>)(, bold)(, underline)"."""
+    name, height, *other = value.split(",")
+    other = tuple(o.strip().lower() for o in other)
+    for flag in other:
+        if flag not in ("bold", "underline"):
+            raise ValueError(f"unknown font option {flag!r}")
+    if ":" in height:
+        height, width = height.split(":", 1)
+        width = int(width.strip())
+    else:
+        width = 0
+    return Font(
+        name=name.strip(),
+        height=int(height.strip()),
+        width=width,
+        weight=(FW_BOLD if "bold" in other else FW_NORMAL),
+        underline=("underline" in other),
+    )
+
+
+def parse_color(value):
+    """Parse a hexadecimal BBGGRR (or AABBGGRR) color."""
+    return int(value.strip(), 16)
+
+
+def parse_month(value):
+    """Parse "<month name or number> [<year>]" into (month number, year or None)."""
+    parts = value.split()
+    if not 1 <= len(parts) <= 2:
+        raise ValueError("expected a month and optionally a year")
+    names = [name.lower() for name in MONTHS]
+    if parts[0].lower() in names:
+        month = names.index(parts[0].lower()) + 1
+    else:
+        month = int(parts[0])
+        if not 1 <= month <= 12:
+            raise ValueError("no such month")
+    return month, int(parts[1]) if len(parts) == 2 else None
+
+
+def parse_count(value):
+    count = int(value)
+    if count < 1:
+        raise ValueError("must be at least 1")
+    return count
+
+
+def parse_pen(value):
+    """Parse "<width-in-mils>, <color>"."""
+    width, color = value.split(",")
+    return Pen(int(width.strip()), parse_color(color))
+
+
+class Theme:
+    """Everything the page composition reads from calendar.ini."""
+
+    __slots__ = (
+        "page_width",
+        "page_height",
+        "year",
+        "year_label",
+        "skip_bitmaps",
+        "front_cover_text",
+        "deaths_title",
+        "addresses_title",
+        "credits_title",
+        "birthday_format",
+        "birthday_order",
+        "birthday_fit",
+        "leap_day",
+        "week_start",
+        "fit_rows",
+        "layout",
+        "styles",
+        "pens",
+        "months",
+    )
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            object.__setattr__(self, name, values[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Theme is immutable")
+
+    def style(self, name):
+        """Return the TextStyle called ``name`` in calendar.ini, or None."""
+        return self.styles.get(name)
+
+
+def compile_theme(cfg, setup):
+    """Build the Theme for calendar.ini contents ``cfg`` and a PageSetup."""
+    page_width, page_height = setup.size
+    errors = []
+
+    def get(section, key, parse=str, fallback=None):
+        if not cfg.has_option(section, key):
+            if fallback is None:
+                errors.append(f"[{section}] {key}: missing")
+            return fallback
+        value = cfg.get(section, key)
+        try:
+            return parse(value)
+        except (ValueError, TypeError) as e:
+            errors.append(f"[{section}] {key} = {value}: {e}")
+            return fallback
+
+    def parse_bool(value):
+        value = value.strip().lower()
+        if value not in cfg.BOOLEAN_STATES:
+            raise ValueError("not a boolean")
+        return cfg.BOOLEAN_STATES[value]
+
+    general = {key: get("General", key) for key in REQUIRED_GENERAL}
+    start_month, start_year = get(
+        "General", "Start-month", parse_month, fallback=(1, None)
+    )
+    month_count = get("General", "Month-count", parse_count, fallback=12)
+    # The year is only needed if the start month doesn't say which year
+    year = get("General", "Year", int, fallback=start_year)
+    if start_year is None:
+        start_year = year
+    skip_bitmaps = get("General", "Skip-bitmaps", parse_bool, fallback=False)
+
+    def parse_choice(choices):
+        def parse(value):
+            value = value.strip().lower()
+            if value not in choices:
+                raise ValueError("expected one of " + ", ".join(choices))
+            return value
+
+        return parse
+
+    birthday_order = get(
+        "General", "Birthday-order", parse_choice(EVENT_ORDERS), fallback="file"
+    )
+    birthday_fit = get(
+        "General", "Birthday-fit", parse_choice(FIT_MODES), fallback="shrink"
+    )
+    leap_day = get(
+        "General", "Leap-day", parse_choice(LEAP_DAY_POLICIES), fallback="feb28"
+    )
+
+    def parse_weekday(value):
+        names = [name.lower() for name in WEEKDAYS]
+        # WEEKDAYS starts on Sunday; weekday numbers start on Monday
+        return (names.index(parse_choice(names)(value)) - 1) % 7
+
+    week_start = get("General", "Week-start", parse_weekday, fallback=SUNDAY)
+    fit_rows = get("General", "Fit-rows", parse_bool, fallback=False)
+    for key, sample in (
+        ("Front-cover-text", {"year": year, "nl": "\n"}),
+        ("Birthday-format", dict(name="", year=2000, shortyear="00", month=1, day=1)),
+    ):
+        if general[key] is not None:
+            try:
+                general[key].format(**sample)
+            except (KeyError, IndexError, ValueError) as e:
+                errors.append(f"[General] {key} = {general[key]}: bad format ({e})")
+
+    layout = {}
+    for key, count in REQUIRED_LAYOUT.items():
+        value = get(
+            "Layout",
+            key,
+            lambda v: parse_layout(v, page_width, page_height),
+            LAYOUT_DEFAULTS.get(key),
+        )
+        if isinstance(value, str):
+            value = parse_layout(value, page_width, page_height)
+        if value is not None and len(value) != count:
+            errors.append(f"[Layout] {key}: expected {count} values, got {len(value)}")
+        layout[key] = value
+
+    styles = {}
+    names = {key.lower(): key for key in REQUIRED_STYLES}
+    if cfg.has_section("Fonts"):
+        for key in cfg.options("Fonts"):
+            names.setdefault(key, key)
+    names = names.values()
+    for key in sorted(names, key=str.lower):
+        font = get("Fonts", key, parse_font)
+        color = get("Fill-colors", key, parse_color)
+        styles[key] = TextStyle(font, color)
+
+    pens = {key: get("Lines", key, parse_pen) for key in REQUIRED_PENS}
+
+    # The months from the start month on; each month's settings are in a
+    # section named after the month and year ("September 2026"), or else
+    # after the month ("September")
+    months = []
+    for i in range(month_count if start_year is not None else 0):
+        month_year, index = divmod(start_year * 12 + start_month - 1 + i, 12)
+        name = MONTHS[index]
+        section = f"{name} {month_year}"
+        if not cfg.has_section(section):
+            section = name
+        quote = get(section, "Quote")
+        box_color = get(section, "Box-color", parse_color)
+        months.append(MonthTheme(index + 1, name, month_year, quote, box_color))
+
+    if errors:
+        raise ThemeError(errors)
+    first, last = months[0].year, months[-1].year
+    year_label = str(first) if first == last else f"{first}\u2013{last}"
+    return Theme(
+        page_width=page_width,
+        page_height=page_height,
+        year=months[0].year,
+        year_label=year_label,
+        skip_bitmaps=skip_bitmaps,
+        front_cover_text=general["Front-cover-text"],
+        deaths_title=general["Deaths-title"],
+        addresses_title=general["Addresses-title"],
+        credits_title=general["Credits-title"],
+        birthday_format=general["Birthday-format"],
+        birthday_order=birthday_order,
+        birthday_fit=birthday_fit,
+        leap_day=leap_day,
+        week_start=week_start,
+        fit_rows=fit_rows,
+        layout=make_record("Layout", layout),
+        styles=make_record("Styles", styles),
+        pens=make_record("Pens", pens),
+        months=tuple(months),
+    )
@@ -0,0 +1,298 @@
+"""Timing and resource instrumentation, written as a Chrome trace.
+
+With ``Trace-file`` set in calendar.ini, making a calendar records how long
+each phase (reading the theme, loading birthdays, composing each section,
+rendering) and each page takes, and writes it to that file in the Chrome
+trace event format; open it in chrome://tracing or https://ui.perfetto.dev.
+
+Page events tell the time spent drawing text, pictures and lines and
+setting fonts, pens and brushes, how many of each operation there were, and
+the backend's own counters for the page (fonts, pens and brushes created,
+bytes of picture data handled, ...).  A "memory" counter tracks the peak
+resident set size of the process after every page.
+"""
+
+import contextlib
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+# What each drawing operation is accounted as
+CATEGORIES = {
+    "set_font": "state",
+    "set_text_color": "state",
+    "set_pen": "state",
+    "set_brush": "state",
+    "text": "text",
+    "rectangle": "vector",
+    "line": "vector",
+    "image": "image",
+}
+
+
+def peak_rss():
+    """Return the peak resident set size of this process in bytes, or None."""
+    try:
+        import resource
+    except ImportError:
+        pass
+    else:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak if sys.platform == "darwin" else peak * 1024
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(
+            process, ctypes.byref(counters), counters.cb
+        ):
+            return counters.PeakWorkingSetSize
+    return None
+
+
+class NullTracer:
+    """A tracer that records nothing, for when tracing is off."""
+
+    def phase(self, name, **args):
+        return contextlib.nullcontext()
+
+    def wrap(self, target):
+        return target
+
+
+NULL_TRACER = NullTracer()
+
+
+class Tracer:
+    """Records trace events; ``write()`` saves them as a Chrome trace."""
+
+    def __init__(self):
+        self.events = []
+        self.pid = os.getpid()
+        self.start = time.perf_counter()
+
+    def _us(self, seconds):
+        return round((seconds - self.start) * 1e6, 1)
+
+    def complete(self, name, start, end=None, cat="phase", **args):
+        """Record something that took from ``start`` to ``end`` (perf_counter)."""
+        if end is None:
+            end = time.perf_counter()
+        self.events.append(
+            {
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": self._us(start),
+                "dur": round((end - start) * 1e6, 1),
+                "pid": self.pid,
+                "tid": 0,
+                "args": args,
+            }
+        )
+
+    def counter(self, name, **values):
+        self.events.append(
+            {
+                "name": name,
+                "ph": "C",
+                "ts": self._us(time.perf_counter()),
+                "pid": self.pid,
+                "tid": 0,
+                "args": values,
+            }
+        )
+
+    def memory(self):
+        rss = peak_rss()
+        if rss is not None:
+            self.counter("memory", peak_rss_mb=round(rss / 1024 / 1024, 1))
+
+    @contextlib.contextmanager
+    def phase(self, name, **args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.complete(name, start, **args)
+
+    def wrap(self, target):
+        """Return a backend recording page events while drawing on ``target``."""
+        return TracingBackend(target, self)
+
+    def summary(self):
+        """Return totals over all pages."""
+        totals = Counter()
+        pages = 0
+        for event in self.events:
+            if event.get("cat") != "page":
+                continue
+            pages += 1
+            for key, value in event["args"].items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    totals[key] += value
+        summary = {"pages": pages}
+        summary.update((key, round(value, 3)) for key, value in sorted(totals.items()))
+        rss = peak_rss()
+        if rss is not None:
+            summary["peak_rss_mb"] = round(rss / 1024 / 1024, 1)
+        return summary
+
+    def write(self, path):
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "traceEvents": self.events,
+                    "displayTimeUnit": "ms",
+                    "otherData": self.summary(),
+                },
+                f,
+            )
+
+
+class TracingBackend:
+    """Forwards drawing to a backend, recording an event for every page.
+
+    Backends may have a ``trace_counters()`` method returning running totals
+    ({name: number}); page events include how much they grew on the page.
+    Pages drawn in worker processes (see parallel.py) are only timed while
+    they are merged into the document.
+    """
+
+    def __init__(self, target, tracer):
+        self.target = target
+        self.tracer = tracer
+        self.pageno = 0
+
+    def _counters(self):
+        counters = getattr(self.target, "trace_counters", None)
+        return counters() if counters is not None else {}
+
+    def start_document(self, title):
+        with self.tracer.phase("start document"):
+            self.target.start_document(title)
+
+    def end_document(self):
+        with self.tracer.phase("end document", **self._counters()):
+            self.target.end_document()
+        self.tracer.memory()
+
+    def abort_document(self):
+        abort_document = getattr(self.target, "abort_document", None)
+        if abort_document is not None:
+            abort_document()
+
+    def reuse_page(self, page):
+        reuse_page = getattr(self.target, "reuse_page", None)
+        if reuse_page is None:
+            return False
+        start = time.perf_counter()
+        before = self._counters()
+        if not reuse_page(page):
+            return False
+        self.pageno += 1
+        args = {"replayed": False, "ops": len(page)}
+        args.update(self._grown(before))
+        self.tracer.complete("page %i" % self.pageno, start, cat="page", **args)
+        return True
+
+    def page_renderer(self):
+        page_renderer = getattr(self.target, "page_renderer", None)
+        return page_renderer() if page_renderer is not None else None
+
+    def merge_page(self, page, fragment):
+        start = time.perf_counter()
+        before = self._counters()
+        self.target.merge_page(page, fragment)
+        self.pageno += 1
+        args = {"merged": True, "ops": len(page)}
+        args.update(self._grown(before))
+        self.tracer.complete("page %i" % self.pageno, start, cat="page", **args)
+        self.tracer.memory()
+
+    def _grown(self, before):
+        return {
+            key: value - before.get(key, 0)
+            for key, value in self._counters().items()
+            if value != before.get(key, 0)
+        }
+
+    def start_page(self, width, height):
+        self.pageno += 1
+        self.page_start = time.perf_counter()
+        self.page_counters = self._counters()
+        self.times = Counter()
+        self.ops = Counter()
+        self.target.start_page(width, height)
+
+    def end_page(self):
+        self.target.end_page()
+        args = {
+            "%s_ms" % category: round(seconds * 1000, 3)
+            for category, seconds in sorted(self.times.items())
+        }
+        args.update(("%s_ops" % kind, n) for kind, n in sorted(self.ops.items()))
+        args.update(self._grown(self.page_counters))
+        self.tracer.complete(
+            "page %i" % self.pageno, self.page_start, cat="page", **args
+        )
+        self.tracer.memory()
+
+    def _draw(self, kind, *args):
+        start = time.perf_counter()
+        getattr(self.target, kind)(*args)
+        self.times[CATEGORIES[kind]] += time.perf_counter() - start
+        self.ops[kind] += 1
+
+    def set_font(self, font):
+        self._draw("set_font", font)
+
+    def set_text_color(self, color):
+        self._draw("set_text_color", color)
+
+    def set_pen(self, width, color):
+        self._draw("set_pen", width, color)
+
+    def set_brush(self, color):
+        self._draw("set_brush", color)
+
+    def text(self, left, top, right, bottom, text, align, clip):
+        self._draw("text", left, top, right, bottom, text, align, clip)
+
+    def rectangle(self, left, top, right, bottom):
+        self._draw("rectangle", left, top, right, bottom)
+
+    def line(self, x1, y1, x2, y2):
+        self._draw("line", x1, y1, x2, y2)
+
+    def image(self, left, top, right, bottom, path):
+        start = time.perf_counter()
+        before = self._counters()
+        self._draw("image", left, top, right, bottom, path)
+        self.tracer.complete(
+            "image",
+            start,
+            cat="image",
+            path=os.path.basename(path),
+            **self._grown(before),
+        )